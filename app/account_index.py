@@ -0,0 +1,151 @@
+import threading
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+
+from app.config import ACCOUNT_INDEX_MARGIN, ACCOUNT_INDEX_SYNC_SECONDS
+from app.models.accounts import Account
+from app.models.imports import ImportCheckpoint
+
+
+class AccountIndex:
+    """
+    The existing account numbers of one worker, as a dense bitmap.
+
+    Account numbers are allocated upwards per shard (by autoincrement, or as
+    ``ticket * shard_count + shard_id``) and never deleted, so below the highest
+    number loaded from a shard a missing bit means the account does not exist.
+    The last `margin` numbers of each shard are not trusted, since their
+    transactions may still commit out of order, and neither is anything above
+    them: both fall back to the database. A daemon thread loads numbers above
+    the trusted range every `sync_seconds`; accounts created by this worker are
+    added at once. Until the first load every number falls back to the database.
+    A bulk import writes historical numbers below the trusted range, so a shard
+    whose latest import checkpoint changed is reloaded from the start.
+    """
+
+    def __init__(self, margin: int = ACCOUNT_INDEX_MARGIN, sync_seconds: float = ACCOUNT_INDEX_SYNC_SECONDS):
+        self.margin = margin
+        self.sync_seconds = sync_seconds
+        self._bits = bytearray()
+        # Highest trusted account number per shard; empty until loaded.
+        self._trusted: list[int] = []
+        # Latest import checkpoint seen per shard when it was last loaded.
+        self._imported: list = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.rejections = 0
+
+    def might_exist(self, account_number: int) -> bool:
+        """
+        False only if the account certainly does not exist.
+        """
+        trusted = self._trusted
+        if not trusted:
+            return True
+        if account_number > trusted[account_number % len(trusted)]:
+            return True
+
+        if account_number in self:
+            return True
+
+        self.rejections += 1
+        return False
+
+    def __contains__(self, account_number: int) -> bool:
+        """
+        Whether the account number was loaded or added, regardless of the trusted range.
+        """
+        bits = self._bits
+        byte = account_number >> 3
+        return account_number > 0 and byte < len(bits) and bool(bits[byte] & (1 << (account_number & 7)))
+
+    def add(self, account_number: int) -> None:
+        with self._lock:
+            self._set(account_number)
+
+    def sync(self, engines: list[Engine], chunk_size: int = 10_000) -> int:
+        """
+        Load the account numbers above each shard's trusted range and move the
+        range up to `margin` below the highest number found. Shards imported
+        into since the last sync are loaded from the start.
+
+        Args:
+            engines (list[Engine]): One engine per shard, in shard order.
+            chunk_size (int): Rows fetched per round trip.
+
+        Returns:
+            int: The number of account numbers read.
+        """
+        trusted = list(self._trusted) or [0] * len(engines)
+        imported = list(self._imported) or [None] * len(engines)
+        read = 0
+        for shard_id, shard_engine in enumerate(engines):
+            # Read before the numbers, so an import committing meanwhile is seen next time.
+            with shard_engine.connect() as conn:
+                latest_import = conn.execute(select(func.max(ImportCheckpoint.updated_at))).scalar()
+            if latest_import != imported[shard_id]:
+                trusted[shard_id] = 0
+                imported[shard_id] = latest_import
+            query = select(Account.account_number).where(Account.account_number > trusted[shard_id])
+            highest = None
+            with shard_engine.connect() as conn:
+                result = conn.execution_options(yield_per=chunk_size).execute(query)
+                for partition in result.partitions():
+                    numbers = [n for (n,) in partition]
+                    with self._lock:
+                        for account_number in numbers:
+                            self._set(account_number)
+                    highest = max([highest or 0, *numbers])
+                    read += len(numbers)
+            if highest is not None:
+                # Sharded numbers step by the shard count; keep `margin` allocations back.
+                trusted[shard_id] = max(trusted[shard_id], highest - self.margin * len(engines))
+
+        self._trusted = trusted
+        self._imported = imported
+        return read
+
+    def start(self, engines: list[Engine]) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(engines,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._bits = bytearray()
+            self._trusted = []
+            self._imported = []
+        self.rejections = 0
+
+    def stats(self) -> dict:
+        return {
+            "loaded": bool(self._trusted),
+            "trusted_up_to": list(self._trusted),
+            "bitmap_bytes": len(self._bits),
+            "rejections": self.rejections,
+        }
+
+    def _set(self, account_number: int) -> None:
+        byte = account_number >> 3
+        if byte >= len(self._bits):
+            # Readers never lock, so a grown bitmap replaces the old one whole.
+            grown = bytearray(max(byte + 1, 2 * len(self._bits)))
+            grown[: len(self._bits)] = self._bits
+            self._bits = grown
+        self._bits[byte] |= 1 << (account_number & 7)
+
+    def _run(self, engines: list[Engine]) -> None:
+        while not self._stop.wait(self.sync_seconds):
+            try:
+                self.sync(engines)
+            except Exception:
+                # Keep the index we have; the next round retries.
+                pass
+
+
+account_index = AccountIndex()
@@ -0,0 +1,334 @@
+"""
+Audit log of API actions: who did what, to what, with which outcome.
+
+Handlers only append a small record to a bounded in-memory queue; a writer
+thread stores them in batches, so auditing adds no query or commit to a
+request. Everything queued is written by `stop()` at shutdown.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, NamedTuple, Protocol
+
+from fastapi import Depends, Request
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app.authentication.oauth import get_current_user
+from app.config import (AUDIT_BATCH_SIZE, AUDIT_ENQUEUE_TIMEOUT_SECONDS, AUDIT_FLUSH_SECONDS, AUDIT_LOG_BACKUPS,
+                        AUDIT_LOG_MAX_BYTES, AUDIT_QUEUE_FULL_POLICY, AUDIT_QUEUE_SIZE, TIMEZONE)
+from app.models.audit import AuditRecord
+
+# Attempts to write the remaining records at shutdown before giving up on them.
+SHUTDOWN_WRITE_ATTEMPTS = 3
+# Key of the request's AuditEntry in the ASGI scope state.
+AUDIT_STATE_KEY = "audit_entry"
+
+
+class AuditEvent(NamedTuple):
+    at: float
+    subject: str
+    action: str
+    resource: str | None
+    status_code: int
+
+
+class Sink(Protocol):
+    def write(self, events: list[AuditEvent]) -> None:
+        ...
+
+
+class DatabaseAuditSink:
+    """
+    Insert batches into the append-only audit_log table, one transaction per batch.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def write(self, events: list[AuditEvent]) -> None:
+        rows = [
+            {
+                "occurred_at": datetime.fromtimestamp(e.at, TIMEZONE).replace(tzinfo=None),
+                "subject": e.subject,
+                "action": e.action,
+                "resource": e.resource,
+                "status_code": e.status_code,
+            }
+            for e in events
+        ]
+        with self.engine.begin() as conn:
+            conn.execute(insert(AuditRecord), rows)
+
+
+class FileAuditSink:
+    """
+    Append batches to a JSON lines file, rotated to `path.1` ... `path.<backups>`
+    once it would grow past `max_bytes`.
+    """
+
+    def __init__(self, path: str, max_bytes: int = AUDIT_LOG_MAX_BYTES, backups: int = AUDIT_LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def write(self, events: list[AuditEvent]) -> None:
+        data = "".join(json.dumps(e._asdict()) + "\n" for e in events)
+        if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+class AuditLog:
+    """
+    Bounded queue of audit records and the thread writing them in batches.
+
+    The writer takes up to `batch_size` records whenever that many are queued
+    or `flush_seconds` have passed. A failed batch is put back and retried
+    after `flush_seconds`; meanwhile the queue fills up and the `policy`
+    decides: "block" makes handlers wait up to `enqueue_timeout` for room and
+    then drop their record, "drop" drops it at once. Drops are counted.
+    Callers on the event loop pass `block=False`: waiting there would stall
+    every request of the worker, so they always drop.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = AUDIT_QUEUE_SIZE,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_seconds: float = AUDIT_FLUSH_SECONDS,
+        policy: str = AUDIT_QUEUE_FULL_POLICY,
+        enqueue_timeout: float = AUDIT_ENQUEUE_TIMEOUT_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.policy = policy
+        self.enqueue_timeout = enqueue_timeout
+        self.clock = clock
+        self.sink: Sink | None = None
+        self._queue: deque[AuditEvent] = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._writing_since: float | None = None
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+        self.enqueued = self.written = self.dropped = self.write_errors = 0
+
+    def record(
+        self, subject: str, action: str, resource: str | None = None, status_code: int = 200, block: bool = True
+    ) -> bool:
+        """
+        Queue a record for writing.
+
+        Args:
+            subject (str): Who acted.
+            action (str): The action name, e.g. "transfer.create".
+            resource (str | None): What was acted on.
+            status_code (int): The outcome.
+            block (bool): Whether a full queue may make the caller wait under the "block" policy.
+
+        Returns:
+            bool: False if the queue stayed full and the record was dropped.
+        """
+        event = AuditEvent(self.clock(), subject, action, resource, status_code)
+        with self._cond:
+            if len(self._queue) >= self.max_queue and block and self.policy == "block":
+                self._cond.wait_for(lambda: len(self._queue) < self.max_queue, self.enqueue_timeout)
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return False
+            self._queue.append(event)
+            self.enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+        return True
+
+    def flush(self) -> int:
+        """
+        Write queued records in the calling thread until the queue is empty or a write fails.
+
+        Returns:
+            int: The number of records written.
+        """
+        written = 0
+        while True:
+            count = self._write_batch()
+            if count <= 0:
+                return written
+            written += count
+
+    def start(self, sink: Sink) -> None:
+        self.sink = sink
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the writer after it has written every queued record.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for _ in range(SHUTDOWN_WRITE_ATTEMPTS):
+            self.flush()
+            if not self._queue:
+                break
+
+    def reset(self) -> None:
+        with self._cond:
+            self._queue.clear()
+            self._cond.notify_all()
+        self.enqueued = self.written = self.dropped = self.write_errors = 0
+
+    def stats(self) -> dict:
+        with self._cond:
+            depth = len(self._queue)
+            oldest = [t for t in (self._writing_since, self._queue[0].at if depth else None) if t is not None]
+        return {
+            "queue_depth": depth,
+            "queue_capacity": self.max_queue,
+            # Age of the oldest record not yet written: how far behind the writer is.
+            "lag_seconds": round(self.clock() - min(oldest), 3) if oldest else 0.0,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "policy": self.policy,
+        }
+
+    def _write_batch(self) -> int:
+        """
+        Write up to one batch; returns its size, 0 if nothing was queued, -1 if the write failed.
+        """
+        if self.sink is None:
+            return 0
+
+        with self._write_lock:
+            with self._cond:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    return 0
+                self._writing_since = batch[0].at
+                self._cond.notify_all()
+            try:
+                self.sink.write(batch)
+            except Exception:
+                self.write_errors += 1
+                with self._cond:
+                    # Back at the front, in order; records queued meanwhile stay behind them.
+                    self._queue.extendleft(reversed(batch))
+                    while len(self._queue) > self.max_queue:
+                        self._queue.pop()
+                        self.dropped += 1
+                return -1
+            finally:
+                self._writing_since = None
+
+            self.written += len(batch)
+            return len(batch)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or len(self._queue) >= self.batch_size, self.flush_seconds
+                )
+                if self._stopping:
+                    return
+            written = self._write_batch()
+            while written == self.batch_size and not self._stopping:
+                written = self._write_batch()
+            if written < 0:
+                # The sink is failing; give it a pause before retrying.
+                with self._cond:
+                    self._cond.wait_for(lambda: self._stopping, self.flush_seconds)
+
+
+audit_log = AuditLog()
+
+
+class AuditEntry:
+    """
+    The record an audited endpoint is about to produce; handlers may refine its resource.
+    """
+
+    __slots__ = ("subject", "action", "resource")
+
+    def __init__(self, subject: str, action: str, resource: str | None):
+        self.subject = subject
+        self.action = action
+        self.resource = resource
+
+
+def audit(action: str) -> Callable:
+    """
+    Dependency recording `action` by the authenticated user once the request is handled.
+
+    The resource defaults to the path parameters (e.g. the account number). The
+    entry is recorded by `AuditMiddleware` with the status code of the response
+    actually sent, e.g. 304 for a conditional GET, or 500 if none was.
+
+    Args:
+        action (str): The action name, e.g. "transfer.create".
+
+    Returns:
+        Callable: A FastAPI dependency returning the AuditEntry.
+    """
+
+    def dependency(request: Request, current_user=Depends(get_current_user)) -> AuditEntry:
+        entry = AuditEntry(str(current_user), action, ",".join(map(str, request.path_params.values())) or None)
+        setattr(request.state, AUDIT_STATE_KEY, entry)
+        return entry
+
+    return dependency
+
+
+class AuditMiddleware:
+    """
+    ASGI middleware recording the AuditEntry of an audited request with its response status.
+
+    It runs on the event loop, so it never waits for room in a full queue.
+    """
+
+    def __init__(self, app, log: AuditLog = audit_log):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            entry = scope.get("state", {}).get(AUDIT_STATE_KEY)
+            if entry is not None:
+                self.log.record(entry.subject, entry.action, entry.resource, status_code, block=False)
@@ -1,43 +1,134 @@
 from typing import Annotated
-import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jwt.exceptions import InvalidTokenError
 
+from app.authentication.revocation import revocations
 from app.config import ALGORITHM, SECRET_KEY
+from app.tracing import tracer
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+# Key of the request's decoded bearer token in the ASGI scope state.
+CLAIMS_STATE_KEY = "token_claims"
 
-def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> str:
+def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], request: Request = None) -> str:
     """
     Extract and validate the current user's identity from a JWT bearer token.
 
     This dependency function will decode the JWT token, verify its signature,
     extract the "sub" claim (username), and return it. If the token is invalid,
-    expired, or missing the "sub" claim, it raises a 401 Unauthorized HTTPException.
+    expired, revoked or missing the "sub" claim, it raises a 401 Unauthorized
+    HTTPException.
 
     Args:
         token (str): JWT access token provided by the OAuth2PasswordBearer dependency.
+        request (Request): The request, whose token may already have been
+            verified by admission control; None outside a request.
 
     Returns:
         str: The username extracted from the token's "sub" claim.
 
     Raises:
-        HTTPException: With status code 401 if the token is invalid, expired, or
-            missing the required "sub" claim.
-    """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+        HTTPException: With status code 401 if the token is invalid, expired,
+            revoked or missing the required "sub" claim.
+    """
+    return get_token_claims(token, request)["sub"]
+
+
+def get_token_claims(token: Annotated[str, Depends(oauth2_scheme)], request: Request = None) -> dict:
+    """
+    Validate a JWT bearer token and return all of its claims.
+
+    Args:
+        token (str): JWT access token provided by the OAuth2PasswordBearer dependency.
+        request (Request): The request, whose token is verified at most once; None outside a request.
+
+    Returns:
+        dict: The token's claims, including "sub".
+
+    Raises:
+        HTTPException: With status code 401 if the token is invalid, expired,
+            revoked or missing the required "sub" claim.
+    """
+    with tracer.span("auth"):
+        claims = decode_token(token) if request is None else token_claims(request.scope, token)
+    if claims is None or claims.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return claims
+
+
+def decode_token(token: str) -> dict | None:
+    """
+    Return the claims of a valid token, or None if the token is invalid,
+    expired or revoked.
+
+    Revocation is checked against this worker's in-memory filter, without a query.
+
+    Args:
+        token (str): JWT access token.
+
+    Returns:
+        dict | None: The claims, or None.
+    """
+    # PyJWT pulls in `cryptography`; it is loaded by the first request, not at startup.
+    import jwt
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except InvalidTokenError:
-        raise credentials_exception
-
-    return username
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.InvalidTokenError:
+        return None
+
+    jti = claims.get("jti")
+    if jti is not None and revocations.is_revoked(jti):
+        return None
+
+    return claims
+
+
+def token_claims(scope, token: str) -> dict | None:
+    """
+    `decode_token` for a request's token, verified at most once per request.
+
+    The result is kept in the request's ASGI scope state, so admission control,
+    profiling and authentication share one verification.
+
+    Args:
+        scope: The request's ASGI scope.
+        token (str): JWT access token.
+
+    Returns:
+        dict | None: The claims, or None.
+    """
+    state = scope.setdefault("state", {})
+    cached = state.get(CLAIMS_STATE_KEY)
+    if cached is not None and cached[0] == token:
+        return cached[1]
+
+    claims = decode_token(token)
+    state[CLAIMS_STATE_KEY] = (token, claims)
+    return claims
+
+
+def bearer_claims(scope) -> dict | None:
+    """
+    The claims of the request's bearer token; None if it has no valid one.
+
+    Args:
+        scope: The request's ASGI scope.
+
+    Returns:
+        dict | None: The claims, or None.
+    """
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                return token_claims(scope, token)
+            break
+
+    return None
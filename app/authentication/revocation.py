@@ -0,0 +1,69 @@
+import threading
+import time
+from typing import Callable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import TOKEN_REVOCATION_SYNC_SECONDS
+from app.models.login import RevokedToken
+
+
+class RevocationFilter:
+    """
+    The revoked token ids of one worker, each kept until its token expires.
+
+    Checking a token is a dictionary lookup, so authentication needs no query.
+    A daemon thread reloads the unexpired revocations from the database every
+    `sync_seconds`, picking up tokens revoked by other workers; revocations made
+    by this worker are added at once.
+    """
+
+    def __init__(self, sync_seconds: float = TOKEN_REVOCATION_SYNC_SECONDS, clock: Callable[[], float] = time.time):
+        self.sync_seconds = sync_seconds
+        self.clock = clock
+        self._expiry: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._expiry
+
+    def add(self, jti: str, expires_at: int) -> None:
+        with self._lock:
+            self._expiry[jti] = expires_at
+
+    def sync(self, session: Session) -> None:
+        """
+        Add the unexpired revocations stored in the database and forget expired ones.
+        """
+        now = int(self.clock())
+        rows = session.execute(
+            select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > now)
+        ).all()
+        with self._lock:
+            # Readers never lock, so the pruned dict replaces the old one whole.
+            expiry = {jti: expires_at for jti, expires_at in self._expiry.items() if expires_at > now}
+            expiry.update(rows)
+            self._expiry = expiry
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(session_factory,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self, session_factory: Callable[[], Session]) -> None:
+        while not self._stop.wait(self.sync_seconds):
+            try:
+                with session_factory() as session:
+                    self.sync(session)
+            except Exception:
+                # Keep the revocations we have; the next round retries.
+                pass
+
+
+revocations = RevocationFilter()
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta, timezone
-import jwt
+from uuid import uuid4
 
 from app.config import ALGORITHM, SECRET_KEY
 
@@ -7,7 +7,7 @@ from app.config import ALGORITHM, SECRET_KEY
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     """
     Create a JSON Web Token (JWT) that encodes the given data payload,
-    with an expiration time.
+    with an expiration time and a unique "jti" so the token can be revoked.
 
     Args:
         data (dict): A dictionary of claims to include in the token payload.
@@ -17,11 +17,14 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     Returns:
         str: The encoded JWT as a string.
     """
+    import jwt  # loaded on first use, see decode_token
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    to_encode.setdefault("jti", uuid4().hex)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
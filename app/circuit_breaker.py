@@ -0,0 +1,127 @@
+import threading
+import time
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from app.config import DB_BREAKER_FAILURE_THRESHOLD, DB_BREAKER_RESET_SECONDS
+from app.exceptions import DatabaseUnavailableError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Fails database work fast while the database keeps timing out or refusing connections.
+
+    `failure_threshold` consecutive failures open the breaker; requests are then
+    rejected without waiting on the database. After `reset_seconds` one request
+    is let through as a probe: its first successful statement closes the
+    breaker, a failure opens it again. A probe that never reaches the database
+    is replaced by another after `reset_seconds`.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DB_BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = DB_BREAKER_RESET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._changed_at = clock()
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.rejections = 0
+
+    def allow(self) -> None:
+        """
+        Raise unless database work may start now; may turn this caller into the probe.
+
+        Raises:
+            DatabaseUnavailableError: While the breaker is open or another probe runs.
+        """
+        if self.state == CLOSED:
+            return
+
+        now = self.clock()
+        with self._lock:
+            waited = now - self._changed_at
+            if waited >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._changed_at = now
+                return
+            self.rejections += 1
+        raise DatabaseUnavailableError(self.reset_seconds - waited)
+
+    def record_success(self) -> None:
+        if self.state == CLOSED and not self.failures:
+            return
+
+        with self._lock:
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self._changed_at = self.clock()
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self._changed_at = self.clock()
+                self.trips += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._changed_at = self.clock()
+        self.trips = self.rejections = 0
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "seconds_in_state": round(self.clock() - self._changed_at, 3),
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "trips": self.trips,
+            "rejections": self.rejections,
+        }
+
+
+db_breaker = CircuitBreaker()
+
+
+def is_database_failure(error: BaseException) -> bool:
+    """
+    Whether an error means the database is unreachable or too slow: connection
+    errors and statement or lock timeouts, but not constraint violations or bad SQL.
+    """
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+
+    return isinstance(error, OperationalError)
+
+
+def instrument_engine(engine: Engine, breaker: CircuitBreaker = db_breaker) -> None:
+    """
+    Feed the outcome of every statement and connection attempt of an engine to a breaker.
+    """
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _succeeded(conn, cursor, statement, parameters, context, executemany):
+        breaker.record_success()
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        if exception_context.is_disconnect or is_database_failure(exception_context.sqlalchemy_exception):
+            breaker.record_failure()
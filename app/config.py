@@ -7,3 +7,125 @@ SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
 DB_URL = "postgresql://postgres:postgres@db:5432/banking"
 TIMEZONE = ZoneInfo("Europe/Berlin")
+# One database URL per shard. Account numbers and customer ids are allocated so that
+# ``n % len(SHARD_URLS)`` is the index of the shard holding the row.
+SHARD_URLS = [DB_URL]
+# Cross-shard transfers still undecided after this long are presumed aborted by recovery,
+# which the transfer scheduler runs this often.
+CROSS_SHARD_RECOVERY_GRACE_SECONDS = 60
+CROSS_SHARD_RECOVERY_INTERVAL_SECONDS = 30
+# Outbox relay: events per publish call and how long an id gap may hold it back.
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_GAP_GRACE_SECONDS = 30
+# A failing relay retries with a backoff doubling up to OUTBOX_RETRY_MAX_SECONDS and
+# gives up after this many failures in a row.
+OUTBOX_RETRY_MAX_SECONDS = 60
+OUTBOX_MAX_FAILURES = 30
+# Live balance streams: "memory" fans out within one worker, "postgres" uses LISTEN/NOTIFY.
+BALANCE_PUBSUB_BACKEND = "memory"
+BALANCE_STREAM_MAX_SUBSCRIBERS = 1000
+BALANCE_STREAM_HEARTBEAT_SECONDS = 15
+# Keyset pagination of customer and account listings.
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Largest number of accounts accepted by one POST /accounts/balances call.
+MAX_BALANCE_BATCH = 200
+# Admission control: per-subject token buckets and per-class concurrency limits.
+# Requests without a valid token are keyed on the client address instead.
+RATE_LIMIT_PER_SECOND = 100
+RATE_LIMIT_BURST = 200
+RATE_LIMIT_MAX_SUBJECTS = 10_000
+CONCURRENCY_LIMITS = {"login": 8, "reads": 64, "writes": 32}
+ADMISSION_QUEUE_LIMITS = {"login": 16, "reads": 128, "writes": 64}
+ADMISSION_QUEUE_TIMEOUT_SECONDS = 2.0
+# Ledger reconciliation: accounts per range, ranges checked in parallel, and how
+# many mismatching accounts a report lists.
+RECONCILIATION_CHUNK_SIZE = 10_000
+RECONCILIATION_WORKERS = 4
+RECONCILIATION_MAX_REPORTED_MISMATCHES = 1000
+# Money is stored and computed as integer minor units; amounts in the API carry
+# at most this many decimal places.
+MONEY_DECIMAL_PLACES = 2
+# Token revocation: how often each worker reloads revoked token ids from the database.
+TOKEN_REVOCATION_SYNC_SECONDS = 5
+# Scheduled transfers: schedules claimed per batch and how long an idle scheduler waits.
+SCHEDULED_TRANSFER_BATCH_SIZE = 500
+SCHEDULED_TRANSFER_POLL_SECONDS = 5
+# Cross-shard runs still pending after this long were left by a scheduler that
+# died mid-run; the next pass settles or executes them.
+SCHEDULED_TRANSFER_PENDING_GRACE_SECONDS = 300
+# Velocity limits on outgoing transfers per account: window in seconds ->
+# (maximum number of transfers, maximum total amount in minor units).
+# The counters live in each worker's memory, so the limits are per worker: with
+# N workers behind a balancer an account can make up to N times as many transfers
+# in a window before every worker rejects it. Divide by the worker count for a
+# bank-wide limit.
+VELOCITY_LIMITS = {
+    60: (10, 1_000_000),
+    3600: (100, 5_000_000),
+    86400: (500, 20_000_000),
+}
+# Buckets per sliding window; a window is exact to within one bucket.
+VELOCITY_BUCKETS = 12
+# Request tracing: share of requests traced when the caller sent no sampling
+# decision, the JSON lines file finished spans are appended to (None keeps the
+# most recent ones in memory), how many spans are buffered per export, and how
+# many full batches may wait for the exporter thread before the oldest is dropped.
+TRACE_SAMPLE_RATE = 0.0
+TRACE_EXPORT_PATH = None
+TRACE_EXPORT_BATCH_SIZE = 512
+TRACE_EXPORT_MAX_BATCHES = 64
+# Account existence index: account numbers within this many allocations of the
+# highest one loaded from a shard are always looked up in the database, and how
+# often each worker loads newly created account numbers.
+ACCOUNT_INDEX_MARGIN = 1000
+ACCOUNT_INDEX_SYNC_SECONDS = 30
+# Database timeouts in milliseconds per endpoint function, as (statement_timeout,
+# lock_timeout); applied with SET LOCAL to every PostgreSQL transaction of the request.
+DEFAULT_DB_TIMEOUTS = (5000, 2000)
+DB_TIMEOUTS = {
+    "get_balance": (500, 200),
+    "get_balances": (1000, 200),
+    "transfer_funds": (2000, 1000),
+    "get_transfer_history": (3000, 500),
+    "get_statement": (10_000, 500),
+    "start_reconciliation": (30_000, 2000),
+}
+# Database circuit breaker: consecutive timeouts or connection errors that open
+# it, and seconds it fails requests fast before letting one probe through.
+DB_BREAKER_FAILURE_THRESHOLD = 5
+DB_BREAKER_RESET_SECONDS = 10
+# Audit log: records queued per worker, records per write and how long the
+# writer waits to fill a batch. When the queue is full "block" waits up to
+# AUDIT_ENQUEUE_TIMEOUT_SECONDS for room and then drops the record, "drop" drops
+# it at once. Records go to the audit_log table, or to JSON lines files rotated
+# at AUDIT_LOG_MAX_BYTES when AUDIT_LOG_PATH is set.
+AUDIT_QUEUE_SIZE = 10_000
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_SECONDS = 1.0
+AUDIT_QUEUE_FULL_POLICY = "block"
+AUDIT_ENQUEUE_TIMEOUT_SECONDS = 0.05
+AUDIT_LOG_PATH = None
+AUDIT_LOG_MAX_BYTES = 50_000_000
+AUDIT_LOG_BACKUPS = 10
+# Bulk import: input rows validated and written per transaction (and checkpoint).
+BULK_IMPORT_CHUNK_SIZE = 50_000
+# Request profiling: subjects whose requests are profiled on `X-Profile: 1` or
+# `?profile=1`, 1 in how many requests is profiled anyway (0 turns sampling off),
+# and how many recent reports each worker keeps for GET /internal/profiles.
+PROFILE_ADMINS = {USERNAME}
+PROFILE_SAMPLE_EVERY = 0
+PROFILE_BUFFER_SIZE = 100
+# Memory introspection: the default and largest traceback depth of allocation
+# tracing (tracemalloc slows allocations and keeps a traceback per live block),
+# how long tracing may run before it stops itself, the most call sites or object
+# types one snapshot returns, and the recent requests kept per tracked endpoint.
+MEMORY_TRACE_DEFAULT_FRAMES = 10
+MEMORY_TRACE_MAX_FRAMES = 25
+MEMORY_TRACE_MAX_SECONDS = 900
+MEMORY_TOP_LIMIT = 50
+MEMORY_RECENT_REQUESTS = 20
+# Readiness: connections opened per database pool before a worker reports ready,
+# and seconds between retries of a failed warm-up step.
+READINESS_WARM_CONNECTIONS = 5
+READINESS_RETRY_SECONDS = 2
@@ -1,24 +1,85 @@
-from sqlalchemy import create_engine
+from fastapi import HTTPException, Request, status
+from sqlalchemy import ForeignKey, create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
-from .config import DB_URL
+from .circuit_breaker import db_breaker, instrument_engine
+from .config import DB_TIMEOUTS, DEFAULT_DB_TIMEOUTS, SHARD_URLS
+from .exceptions import DatabaseUnavailableError
+from .sharding import ShardRouter
 
-engine = create_engine(DB_URL)
+shard_engines = [create_engine(url) for url in SHARD_URLS]
+engine = shard_engines[0]
+for shard_engine in shard_engines:
+    instrument_engine(shard_engine)
+
+shard_router = ShardRouter(shard_engines)
+
+SessionLocal = shard_router.sessionmaker()
+
+
+@event.listens_for(Session, "after_begin")
+def apply_timeouts(session, transaction, connection) -> None:
+    """
+    Set the request's statement and lock timeouts on every PostgreSQL
+    transaction of a session opened by ``get_db``; they end with the transaction.
+    """
+    timeouts = session.info.get("db_timeouts")
+    if timeouts is None or connection.dialect.name != "postgresql":
+        return
+
+    statement_ms, lock_ms = timeouts
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(statement_ms)}")
+    connection.exec_driver_sql(f"SET LOCAL lock_timeout = {int(lock_ms)}")
 
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
 
-def get_db():
+def local_foreign_key(target: str) -> tuple:
+    """
+    Foreign key arguments for a column that may reference a row on another shard.
+
+    Cross-shard transfers are stored on both shards, so their account columns can
+    only be constrained while the whole ledger lives in one database.
+
+    Args:
+        target (str): The referenced column, e.g. "accounts.account_number".
+
+    Returns:
+        tuple: Positional ``Column`` arguments, empty when sharded.
+    """
+    if shard_router.sharded:
+        return ()
+
+    return (ForeignKey(target),)
+
+
+def get_db(request: Request):
     """
     Dependency function to provide a database session
 
+    With more than one entry in ``SHARD_URLS`` the session is sharded: queries are
+    routed by the account number, customer id or email they filter on.
+    Transactions get the statement and lock timeouts configured in ``DB_TIMEOUTS``
+    for the endpoint. While the database circuit breaker is open the request
+    fails at once with 503.
+
     Attributes
     Session : A database session instance
     """
+    try:
+        db_breaker.allow()
+    except DatabaseUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, round(e.retry_after)))},
+        )
+
+    route = request.scope.get("route")
     db = SessionLocal()
+    db.info["db_timeouts"] = DB_TIMEOUTS.get(getattr(route, "name", None), DEFAULT_DB_TIMEOUTS)
     try:
         yield db
     finally:
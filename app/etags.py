@@ -0,0 +1,28 @@
+from fastapi import Response, status
+
+
+def account_etag(resource: str, account_number: int, version: int, msgpack: bool = False) -> str:
+    """
+    Strong ETag of an account resource ("balance" or "history") at a version,
+    distinct for the MessagePack representation.
+    """
+    suffix = "-msgpack" if msgpack else ""
+    return f'"{resource}-{account_number}-{version}{suffix}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches the ETag (weak comparison, RFC 9110).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    return any(
+        candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Vary": "Accept"})
@@ -1,4 +1,4 @@
-from decimal import Decimal
+from app.money import to_decimal
 
 
 class AccountNotFoundError(Exception):
@@ -8,9 +8,9 @@ class AccountNotFoundError(Exception):
 
 
 class InsufficientFundsError(Exception):
-    def __init__(self, balance: Decimal, amount: Decimal):
+    def __init__(self, balance: int, amount: int):
         super().__init__(
-            f"Insufficient funds : balance={balance}, attempted transfer = {amount}"
+            f"Insufficient funds : balance={to_decimal(balance)}, attempted transfer = {to_decimal(amount)}"
         )
         self.balance = balance
         self.amount = amount
@@ -20,3 +20,54 @@ class SameAccountError(Exception):
     def __init__(self, account_number: int):
         super().__init__(f"Can not transfer to the same account : {account_number}")
         self.account_number = account_number
+
+
+class CustomerNotFoundError(Exception):
+    def __init__(self, customer_id: int):
+        super().__init__(f"Customer {customer_id} not found")
+        self.customer_id = customer_id
+
+
+class ReconciliationRunNotFoundError(Exception):
+    def __init__(self, run_id: str):
+        super().__init__(f"Reconciliation run {run_id} not found")
+        self.run_id = run_id
+
+
+class ScheduledTransferNotFoundError(Exception):
+    def __init__(self, schedule_id: int):
+        super().__init__(f"Scheduled transfer {schedule_id} not found")
+        self.schedule_id = schedule_id
+
+
+class VelocityLimitExceededError(Exception):
+    def __init__(self, account_number: int, window_seconds: int, limit: str):
+        super().__init__(
+            f"Account {account_number} exceeded its {limit} limit for {window_seconds} seconds"
+        )
+        self.account_number = account_number
+        self.window_seconds = window_seconds
+        self.limit = limit
+
+
+class CrossShardTransferAbortedError(Exception):
+    def __init__(self, txid: str):
+        super().__init__(f"Cross-shard transfer {txid} was aborted by recovery, please retry")
+        self.txid = txid
+
+
+class DatabaseUnavailableError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Database unavailable, retry in {retry_after:.0f} seconds")
+        self.retry_after = retry_after
+
+
+class ProfileNotFoundError(Exception):
+    def __init__(self, profile_id: str):
+        super().__init__(f"Profile {profile_id} not found")
+        self.profile_id = profile_id
+
+
+class MemoryTracingInactiveError(Exception):
+    def __init__(self):
+        super().__init__("Allocation tracing is not running")
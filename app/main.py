@@ -1,7 +1,19 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import sessionmaker
 
-from .database import Base, engine
-from .routers import accounts, login, transfers
+from .account_index import account_index
+from .audit import AuditMiddleware, DatabaseAuditSink, FileAuditSink, audit_log
+from .authentication.revocation import revocations
+from .config import AUDIT_LOG_PATH, BALANCE_PUBSUB_BACKEND
+from .database import engine, shard_engines, shard_router
+from .pubsub import PostgresNotifyBackend, balance_broker
+from .ratelimit import AdmissionControlMiddleware
+from .readiness import readiness, warm_pool
+from .routers import accounts, customers, internal, login, transfers
+from .services.scheduled_transfers import TransferScheduler
+from .tracing import instrument_sql, tracer
+from .velocity import velocity
 
 
 app = FastAPI(
@@ -13,18 +25,84 @@ app = FastAPI(
     openapi_url="/openapi.json",
 )
 
+transfer_scheduler = TransferScheduler(shard_router)
+
+app.add_middleware(AuditMiddleware)
+app.add_middleware(AdmissionControlMiddleware)
+
+instrument_sql()
+
 
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(engine)
+    # The schema is managed by `python -m app.tools.migrate`, run before the workers start.
+    # Interrupted cross-shard transfers are recovered by the transfer scheduler.
+    if BALANCE_PUBSUB_BACKEND == "postgres":
+        balance_broker.use_backend(PostgresNotifyBackend(engine))
+
+    # Pools and caches are loaded in the background; GET /ready reports when they are.
+    # The caches refresh themselves periodically once their first load succeeded.
+    session_factory = sessionmaker(bind=engine)
+    readiness.start(
+        {
+            "database_pool": lambda: warm_pool(shard_engines),
+            "velocity": lambda: velocity.rebuild(shard_engines),
+            "account_index": _load_account_index,
+            "revocations": lambda: _load_revocations(session_factory),
+        }
+    )
+    audit_log.start(FileAuditSink(AUDIT_LOG_PATH) if AUDIT_LOG_PATH else DatabaseAuditSink(engine))
+    transfer_scheduler.start()
+    tracer.start()
+
+
+def _load_account_index() -> None:
+    account_index.sync(shard_engines)
+    account_index.start(shard_engines)
+
+
+def _load_revocations(session_factory: sessionmaker) -> None:
+    with session_factory() as session:
+        revocations.sync(session)
+    revocations.start(session_factory)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    readiness.stop()
+    revocations.stop()
+    account_index.stop()
+    transfer_scheduler.stop()
+    if BALANCE_PUBSUB_BACKEND == "postgres":
+        balance_broker.backend.stop()
+    audit_log.stop()
+    tracer.stop()
+
 
 @app.get("/", summary="Landing point")
 async def root():
     return {"message": "Welcome to Entrix Banking API"}
 
 
+@app.get(
+    "/ready",
+    summary="Readiness probe",
+    description=(
+        "200 once this worker has warmed its database pools and loaded its caches, 503 "
+        "before, with the state of each warm-up step."
+    ),
+    responses={503: {"description": "Still warming up"}},
+)
+async def ready():
+    stats = readiness.stats()
+    return JSONResponse(stats, status_code=200 if stats["ready"] else 503)
+
+
 # Include endpoints
 
 app.include_router(login.router, prefix="/login", tags=["login"])
 app.include_router(accounts.router, prefix="/accounts", tags=["accounts"])
 app.include_router(transfers.router, prefix="/transfers", tags=["transfers"])
+app.include_router(customers.router, prefix="/customers", tags=["customers"])
+app.include_router(internal.router, prefix="/internal", tags=["internal"])
+
@@ -0,0 +1,213 @@
+"""
+Heap and allocation introspection of a long-running worker.
+
+Allocation tracing (`tracemalloc`) is off until started through
+`POST /internal/memory/tracing` and stops itself after MEMORY_TRACE_MAX_SECONDS.
+While it runs, each snapshot reports the top allocating call sites and how
+they and the live object counts per type changed since the previous snapshot,
+and endpoints depending on `track_memory` record their peak traced memory per
+request. Only the previous snapshot is kept and every list is capped at
+MEMORY_TOP_LIMIT entries.
+"""
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+
+from fastapi import Request
+
+from app.config import (MEMORY_RECENT_REQUESTS, MEMORY_TOP_LIMIT, MEMORY_TRACE_DEFAULT_FRAMES,
+                        MEMORY_TRACE_MAX_SECONDS)
+from app.exceptions import MemoryTracingInactiveError
+
+# Allocations made by the introspection itself are left out of snapshots.
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes() -> int | None:
+    """
+    The worker's resident set size, or None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def object_counts() -> Counter:
+    """
+    Live objects tracked by the garbage collector, by type; atoms such as ints and strings are not tracked.
+    """
+    by_type = Counter(map(type, gc.get_objects()))
+    return Counter({f"{t.__module__}.{t.__qualname__}": n for t, n in by_type.items()})
+
+
+def _stat(stat) -> dict:
+    return {
+        "size_bytes": stat.size,
+        "size_diff_bytes": getattr(stat, "size_diff", None),
+        "count": stat.count,
+        "count_diff": getattr(stat, "count_diff", None),
+        "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+    }
+
+
+class MemoryTracer:
+    """
+    Starts and stops allocation tracing, diffs snapshots and keeps per-request peaks.
+
+    tracemalloc has one peak counter per process, so a request's peak is only
+    its own when no other tracked request ran at the same time; overlapping
+    requests are marked and their peak is that of the overlap.
+    """
+
+    def __init__(self, max_seconds: float = MEMORY_TRACE_MAX_SECONDS, recent: int = MEMORY_RECENT_REQUESTS):
+        self.max_seconds = max_seconds
+        self.recent = recent
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._snapshot: tracemalloc.Snapshot | None = None
+        self._counts: Counter | None = None
+        self.started_at: float | None = None
+        self.frames = 0
+        self._in_flight = 0
+        self._overlapped = False
+        self._requests: dict[str, dict] = {}
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = MEMORY_TRACE_DEFAULT_FRAMES) -> None:
+        """
+        Start tracing with tracebacks of up to `frames` frames; the first
+        snapshot diffs against this moment. Does nothing if already tracing.
+        """
+        with self._lock:
+            if tracemalloc.is_tracing():
+                return
+
+            tracemalloc.start(frames)
+            self.frames = frames
+            self.started_at = time.time()
+            self._snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+            self._counts = object_counts()
+            self._timer = threading.Timer(self.max_seconds, self.stop)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            tracemalloc.stop()
+            self._snapshot = self._counts = None
+            self.started_at = None
+
+    def snapshot(self, limit: int = MEMORY_TOP_LIMIT) -> dict:
+        """
+        Take a snapshot and compare it with the previous one, which it replaces.
+
+        Returns:
+            dict: "top_allocations", the call sites holding the most traced
+            memory; "growth", the call sites that grew most; and "object_counts",
+            the types whose live object count changed most.
+
+        Raises:
+            MemoryTracingInactiveError: If tracing is not running.
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing() or self._snapshot is None:
+                raise MemoryTracingInactiveError()
+
+            snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+            counts = object_counts()
+            previous, previous_counts = self._snapshot, self._counts
+            self._snapshot, self._counts = snapshot, counts
+
+        count_diffs = counts.copy()
+        count_diffs.subtract(previous_counts)
+        changed = sorted((t for t, n in count_diffs.items() if n), key=lambda t: abs(count_diffs[t]), reverse=True)
+        return {
+            "top_allocations": [_stat(s) for s in snapshot.statistics("traceback")[:limit]],
+            "growth": [_stat(s) for s in snapshot.compare_to(previous, "traceback")[:limit] if s.size_diff],
+            "object_counts": [{"type": t, "count": counts[t], "diff": count_diffs[t]} for t in changed[:limit]],
+        }
+
+    def request_started(self) -> int:
+        """
+        Mark the start of a tracked request; returns the traced memory to measure its peak from.
+        """
+        with self._lock:
+            if self._in_flight:
+                self._overlapped = True
+            else:
+                tracemalloc.reset_peak()
+                self._overlapped = False
+            self._in_flight += 1
+            return tracemalloc.get_traced_memory()[0]
+
+    def request_finished(self, name: str, started_bytes: int) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if not tracemalloc.is_tracing():
+                return
+
+            peak = max(tracemalloc.get_traced_memory()[1] - started_bytes, 0)
+            entry = self._requests.setdefault(
+                name, {"count": 0, "max_peak_bytes": 0, "recent": deque(maxlen=self.recent)}
+            )
+            entry["count"] += 1
+            entry["max_peak_bytes"] = max(entry["max_peak_bytes"], peak)
+            entry["recent"].append({"at": time.time(), "peak_bytes": peak, "overlapped": self._overlapped})
+
+    def reset(self) -> None:
+        self.stop()
+        with self._lock:
+            self._requests.clear()
+            self._in_flight = 0
+
+    def stats(self) -> dict:
+        traced, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            requests = {
+                name: {**entry, "recent": list(entry["recent"])} for name, entry in self._requests.items()
+            }
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "frames": self.frames if self.started_at else None,
+            "started_at": self.started_at,
+            "stops_at": self.started_at + self.max_seconds if self.started_at else None,
+            "traced_bytes": traced,
+            "traced_peak_bytes": peak,
+            "tracing_overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+            "rss_bytes": rss_bytes(),
+            "requests": requests,
+        }
+
+
+memory_tracer = MemoryTracer()
+
+
+def track_memory(request: Request):
+    """
+    Dependency recording the request's peak traced memory under its endpoint
+    name while allocation tracing runs; free otherwise.
+    """
+    if not tracemalloc.is_tracing():
+        yield
+        return
+
+    started = memory_tracer.request_started()
+    try:
+        yield
+    finally:
+        memory_tracer.request_finished(request.scope["route"].name, started)
@@ -0,0 +1,190 @@
+"""
+Ordered schema changes for databases created before a model changed.
+
+`Base.metadata.create_all` only creates missing tables, so new columns and
+indexes on existing tables are applied here. Every migration must also be a
+no-op on a database that `create_all` just built at the current schema.
+"""
+from datetime import datetime
+from typing import Callable
+from sqlalchemy import Integer, func, inspect, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn
+
+from app.config import TIMEZONE
+from app.models.accounts import Account, Customer
+from app.models.migrations import SchemaMigration
+from app.models.reconciliation import ReconciliationRange, ReconciliationRun
+from app.models.sharding import PREPARED, PreparedLeg, ShardTransaction
+from app.models.transfers import Transfer
+from app.money import MINOR_UNITS
+
+
+def _create_index(table, name: str) -> Callable[[Connection], None]:
+    def migrate(conn: Connection) -> None:
+        index = next(ix for ix in table.indexes if ix.name == name)
+        index.create(conn, checkfirst=True)
+
+    return migrate
+
+
+def _add_column(table, name: str) -> Callable[[Connection], None]:
+    def migrate(conn: Connection) -> None:
+        if name in {column["name"] for column in inspect(conn).get_columns(table.name)}:
+            return
+        ddl = CreateColumn(table.c[name]).compile(dialect=conn.dialect)
+        conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+    return migrate
+
+
+def _add_initial_deposit(conn: Connection) -> None:
+    """
+    Add `accounts.initial_deposit`, derived for existing accounts from their
+    current balance and transfers, i.e. assuming today's balances are right.
+    """
+    columns = {column["name"]: column["type"] for column in inspect(conn).get_columns("accounts")}
+    if "initial_deposit" in columns:
+        return
+    # Same type as the balance it is derived from; 0007 converts both to minor units.
+    conn.exec_driver_sql(
+        "ALTER TABLE accounts ADD COLUMN initial_deposit "
+        f"{columns['balance'].compile(dialect=conn.dialect)} DEFAULT 0 NOT NULL"
+    )
+
+    def total(column, *criteria):
+        return func.coalesce(
+            select(func.sum(column.table.c.amount))
+            .where(column == Account.account_number, *criteria)
+            .scalar_subquery(),
+            0,
+        )
+
+    conn.execute(
+        update(Account.__table__).values(
+            initial_deposit=Account.balance
+            - total(Transfer.to_account_number)
+            + total(Transfer.from_account_number)
+            + total(
+                PreparedLeg.from_account_number,
+                PreparedLeg.account_number == PreparedLeg.from_account_number,
+                PreparedLeg.state == PREPARED,
+            )
+        )
+    )
+
+
+def _to_minor_units(table, *names: str) -> Callable[[Connection], None]:
+    """
+    Convert decimal money columns to BIGINT minor units, rounding to the nearest unit.
+    """
+
+    def migrate(conn: Connection) -> None:
+        columns = {column["name"]: column["type"] for column in inspect(conn).get_columns(table.name)}
+        for name in names:
+            if isinstance(columns[name], Integer):
+                continue
+            if conn.dialect.name == "postgresql":
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ALTER COLUMN {name} TYPE BIGINT "
+                    f"USING round({name} * {MINOR_UNITS})::bigint"
+                )
+            else:
+                # SQLite keeps the declared type but stores whatever it is given.
+                conn.exec_driver_sql(
+                    f"UPDATE {table.name} SET {name} = CAST(round({name} * {MINOR_UNITS}) AS INTEGER)"
+                )
+
+    return migrate
+
+
+def _money_to_minor_units(conn: Connection) -> None:
+    for table, names in (
+        (Account.__table__, ("balance", "initial_deposit")),
+        (Transfer.__table__, ("amount",)),
+        (ShardTransaction.__table__, ("amount",)),
+        (PreparedLeg.__table__, ("amount",)),
+    ):
+        _to_minor_units(table, *names)(conn)
+
+    # Checkpoints of earlier reconciliation runs hold decimal mismatches; they
+    # are only progress records, so they are dropped rather than converted.
+    ranges = ReconciliationRange.__table__
+    if not isinstance(
+        {c["name"]: c["type"] for c in inspect(conn).get_columns(ranges.name)}["total_balance"], Integer
+    ):
+        conn.execute(ranges.delete())
+        conn.execute(ReconciliationRun.__table__.delete())
+        _to_minor_units(ranges, "total_balance", "total_initial_deposits", "in_flight")(conn)
+
+
+MIGRATIONS: list[tuple[str, Callable[[Connection], None]]] = [
+    (
+        "0001_customers_email_prefix_index",
+        _create_index(Customer.__table__, "ix_customers_email_prefix"),
+    ),
+    (
+        "0002_accounts_customer_id_index",
+        _create_index(Account.__table__, "ix_accounts_customer_id_account_number"),
+    ),
+    (
+        "0003_accounts_version",
+        _add_column(Account.__table__, "version"),
+    ),
+    (
+        "0004_transfers_from_account_number_id_index",
+        _create_index(Transfer.__table__, "ix_transfers_from_account_number_id"),
+    ),
+    (
+        "0005_transfers_to_account_number_id_index",
+        _create_index(Transfer.__table__, "ix_transfers_to_account_number_id"),
+    ),
+    (
+        "0006_accounts_initial_deposit",
+        _add_initial_deposit,
+    ),
+    (
+        "0007_money_minor_units",
+        _money_to_minor_units,
+    ),
+]
+
+
+def run_migrations(engine: Engine) -> list[str]:
+    """
+    Apply every migration not yet recorded in `schema_migrations`, in order.
+
+    Args:
+        engine (Engine): The database to migrate.
+
+    Returns:
+        list[str]: Names of the migrations applied by this call.
+    """
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+
+    applied = []
+    with engine.begin() as conn:
+        done = {row.id for row in conn.execute(SchemaMigration.__table__.select())}
+        for name, migrate in MIGRATIONS:
+            if name in done:
+                continue
+            migrate(conn)
+            conn.execute(
+                SchemaMigration.__table__.insert().values(id=name, applied_at=datetime.now(TIMEZONE))
+            )
+            applied.append(name)
+
+    return applied
+
+
+def pending_migrations(engine: Engine) -> list[str]:
+    """
+    Names of the migrations not yet recorded in `schema_migrations`, in order;
+    all of them if the database was never migrated.
+    """
+    if not inspect(engine).has_table(SchemaMigration.__tablename__):
+        return [name for name, _ in MIGRATIONS]
+
+    with engine.connect() as conn:
+        done = {row.id for row in conn.execute(SchemaMigration.__table__.select())}
+    return [name for name, _ in MIGRATIONS if name not in done]
@@ -1,8 +1,10 @@
 from decimal import Decimal
+from typing import List, Optional
 from pydantic import BaseModel, EmailStr, Field
-from sqlalchemy import Column, ForeignKey, Integer, Numeric, String
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, Integer, String, text
 from sqlalchemy.orm import relationship
 
+from app.config import MAX_BALANCE_BATCH, MONEY_DECIMAL_PLACES
 from app.database import Base
 
 
@@ -14,12 +16,12 @@ class CustomerInput(BaseModel):
         name (str): The full name of the customer.
         email (EmailStr): A unique, valid email address for the customer.
         initial_deposit (Decimal): The initial deposit amount for the new account.
-            Must be greater than 0.
+            Must be greater than 0, with at most two decimal places.
     """
 
     name: str
     email: EmailStr
-    initial_deposit: Decimal = Field(..., gt=0)
+    initial_deposit: Decimal = Field(..., gt=0, decimal_places=MONEY_DECIMAL_PLACES)
 
     class Config:
         schema_extra = {
@@ -69,6 +71,117 @@ class BalanceOutput(BaseModel):
         orm_mode = True
 
 
+class CustomerAccountOutput(BaseModel):
+    """
+    Pydantic schema for one account in a customer listing.
+
+    Attributes:
+        account_number (int): The unique identifier for the account.
+        balance (Decimal): The current account balance; zero once drained by transfers.
+    """
+
+    account_number: int
+    balance: Decimal = Field(..., ge=0)
+
+    class Config:
+        orm_mode = True
+
+
+class BalancesInput(BaseModel):
+    """
+    Pydantic schema for looking up several balances at once.
+
+    Attributes:
+        account_numbers (List[int]): Accounts to look up, at most MAX_BALANCE_BATCH.
+    """
+
+    account_numbers: List[int] = Field(..., min_length=1, max_length=MAX_BALANCE_BATCH)
+
+    class Config:
+        schema_extra = {"example": {"account_numbers": [1234, 5678]}}
+
+
+class BalanceItem(BaseModel):
+    """
+    Pydantic schema for one entry of a batch balance lookup.
+
+    Attributes:
+        account_number (int): The requested account number.
+        balance (Optional[Decimal]): The current balance; None if not found.
+        error (Optional[str]): Why there is no balance, e.g. "Account 5678 not found".
+    """
+
+    account_number: int
+    balance: Optional[Decimal] = None
+    error: Optional[str] = None
+
+
+class BalancesOutput(BaseModel):
+    """
+    Pydantic schema for a batch balance lookup, one item per requested account
+    in request order.
+
+    Attributes:
+        balances (List[BalanceItem]): The looked-up balances.
+    """
+
+    balances: List[BalanceItem]
+
+
+class CustomerOutput(BaseModel):
+    """
+    Pydantic schema for returning a customer together with their accounts.
+
+    Attributes:
+        customer_id (int): The ID of the customer.
+        name (str): The customer’s full name.
+        email (EmailStr): The customer’s email address.
+        accounts (List[CustomerAccountOutput]): The customer's accounts, by account number.
+    """
+
+    customer_id: int
+    name: str
+    email: EmailStr
+    accounts: List[CustomerAccountOutput]
+
+    class Config:
+        orm_mode = True
+
+
+class CustomerPage(BaseModel):
+    """
+    Pydantic schema for one page of a customer search.
+
+    Attributes:
+        customers (List[CustomerOutput]): Matching customers ordered by email.
+        next_after (Optional[str]): Pass as `after` to fetch the next page;
+            None on the last page.
+    """
+
+    customers: List[CustomerOutput]
+    next_after: Optional[str] = None
+
+
+class CustomerAccountsPage(BaseModel):
+    """
+    Pydantic schema for one page of a customer's accounts.
+
+    Attributes:
+        customer_id (int): The ID of the customer.
+        name (str): The customer’s full name.
+        email (EmailStr): The customer’s email address.
+        accounts (List[CustomerAccountOutput]): Accounts ordered by account number.
+        next_after (Optional[int]): Pass as `after` to fetch the next page;
+            None on the last page.
+    """
+
+    customer_id: int
+    name: str
+    email: EmailStr
+    accounts: List[CustomerAccountOutput]
+    next_after: Optional[int] = None
+
+
 class Customer(Base):
     """
     SQLAlchemy ORM model for the customers table.
@@ -86,11 +199,22 @@ class Customer(Base):
     """
 
     __tablename__ = "customers"
+    __table_args__ = (
+        # Serves `email LIKE 'prefix%'` on Postgres, whose default collation
+        # can not use the unique index for pattern matching.
+        Index(
+            "ix_customers_email_prefix",
+            "email",
+            postgresql_ops={"email": "text_pattern_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     customer_id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
-    accounts = relationship("Account", back_populates="customer")
+    accounts = relationship(
+        "Account", back_populates="customer", order_by="Account.account_number"
+    )
 
 
 class Account(Base):
@@ -99,8 +223,11 @@ class Account(Base):
 
     Columns:
         account_number (int): Primary key, auto-incremented account identifier.
-        balance (Decimal): The current balance of the account.
+        balance (int): The current balance of the account, in minor units.
         customer_id (int): Foreign key pointing to the owning customer’s ID.
+        initial_deposit (int): The opening balance in minor units, the base of reconciliation.
+        version (int): Incremented by every change to the balance or transfer
+            history; the ETag of the balance and history endpoints.
 
     Relationships:
         customer (Customer): The owner of this account.
@@ -109,19 +236,26 @@ class Account(Base):
     """
 
     __tablename__ = "accounts"
+    __table_args__ = (
+        Index("ix_accounts_customer_id_account_number", "customer_id", "account_number"),
+    )
 
     account_number = Column(Integer, primary_key=True, index=True)
-    balance = Column(Numeric(precision=12, scale=2), default=Decimal("0.00"))
+    balance = Column(BigInteger, default=0)
     customer_id = Column(Integer, ForeignKey("customers.customer_id"))
+    initial_deposit = Column(BigInteger, nullable=False, server_default=text("0"))
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
     customer = relationship("Customer", back_populates="accounts")
 
     sent_transfers = relationship(
         "Transfer",
+        primaryjoin="Account.account_number == Transfer.from_account_number",
         foreign_keys="Transfer.from_account_number",
         back_populates="from_account",
     )
     received_transfers = relationship(
         "Transfer",
+        primaryjoin="Account.account_number == Transfer.to_account_number",
         foreign_keys="Transfer.to_account_number",
         back_populates="to_account",
     )
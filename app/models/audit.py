@@ -0,0 +1,26 @@
+from sqlalchemy import Column, DateTime, Integer, String
+
+from app.database import Base
+
+
+class AuditRecord(Base):
+    """
+    SQLAlchemy ORM model for the audit_log table; rows are only ever inserted.
+
+    Columns:
+        id (int): Primary key.
+        occurred_at (datetime): When the action finished, in the bank's timezone.
+        subject (str): The JWT subject, or the username given to a login.
+        action (str): What was done, e.g. "transfer.create" or "transfer.history".
+        resource (str): What it was done to, e.g. "1001" or "1001->1002".
+        status_code (int): The HTTP status of the response.
+    """
+
+    __tablename__ = "audit_log"
+
+    id = Column(Integer, primary_key=True)
+    occurred_at = Column(DateTime, nullable=False, index=True)
+    subject = Column(String, nullable=False, index=True)
+    action = Column(String, nullable=False)
+    resource = Column(String, nullable=True)
+    status_code = Column(Integer, nullable=False)
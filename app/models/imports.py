@@ -0,0 +1,27 @@
+from sqlalchemy import Column, DateTime, Integer, String
+
+from app.database import Base
+
+
+class ImportCheckpoint(Base):
+    """
+    SQLAlchemy ORM model for the progress of a bulk import, one row per input.
+
+    The row is updated in the transaction that writes each chunk, so a resumed
+    import skips exactly the input rows already loaded or rejected.
+
+    Columns:
+        name (str): Primary key, "<import name>:accounts" or "<import name>:transfers".
+        rows (int): Input rows consumed so far.
+        loaded (int): Rows written.
+        rejected (int): Rows that failed validation.
+        updated_at (datetime): When the last chunk was committed.
+    """
+
+    __tablename__ = "import_checkpoints"
+
+    name = Column(String, primary_key=True)
+    rows = Column(Integer, nullable=False)
+    loaded = Column(Integer, nullable=False)
+    rejected = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
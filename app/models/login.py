@@ -1,4 +1,7 @@
 from pydantic import BaseModel
+from sqlalchemy import BigInteger, Column, DateTime, String
+
+from app.database import Base
 
 
 class LoginInput(BaseModel):
@@ -25,3 +28,21 @@ class Token(BaseModel):
 
     access_token: str
     token_type: str
+
+
+class RevokedToken(Base):
+    """
+    SQLAlchemy ORM model for the revoked_tokens table.
+
+    Columns:
+        jti (str): Primary key, the revoked token's "jti" claim.
+        expires_at (int): The token's "exp" claim, seconds since the epoch; the
+            row is useless afterwards since the token is rejected anyway.
+        revoked_at (datetime): When the token was revoked.
+    """
+
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    expires_at = Column(BigInteger, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, String
+
+from app.database import Base
+
+
+class SchemaMigration(Base):
+    """
+    SQLAlchemy ORM model recording which schema migrations have been applied.
+
+    Columns:
+        id (str): Primary key, name of the migration.
+        applied_at (datetime): When the migration ran.
+    """
+
+    __tablename__ = "schema_migrations"
+
+    id = Column(String(128), primary_key=True)
+    applied_at = Column(DateTime, nullable=False)
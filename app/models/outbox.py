@@ -0,0 +1,44 @@
+from sqlalchemy import Column, DateTime, Integer, String, Text
+
+from app.database import Base
+
+
+class OutboxEvent(Base):
+    """
+    SQLAlchemy ORM model for the transactional outbox.
+
+    Rows are written in the same transaction as the change they describe and
+    read back in id order by the outbox relay.
+
+    Columns:
+        id (int): Primary key, increasing in insertion order.
+        event_type (str): e.g. "account.created" or "transfer.completed".
+        account_number (int): Account the event belongs to; also its shard key.
+        payload (str): JSON document describing the change.
+        created_at (datetime): When the event was recorded.
+    """
+
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String(64), nullable=False)
+    account_number = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+class OutboxOffset(Base):
+    """
+    SQLAlchemy ORM model for the position of each outbox relay.
+
+    Columns:
+        relay (str): Primary key, name of the relay.
+        last_event_id (int): Id of the last event handed to the sink.
+        updated_at (datetime): When the offset last moved.
+    """
+
+    __tablename__ = "outbox_offsets"
+
+    relay = Column(String(64), primary_key=True)
+    last_event_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
@@ -0,0 +1,117 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+from pydantic import BaseModel
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, Text
+
+from app.database import Base
+
+
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class BalanceMismatch(BaseModel):
+    """
+    Pydantic schema for an account whose stored balance disagrees with its ledger.
+
+    Attributes:
+        account_number (int): The account.
+        balance (Decimal): The stored balance.
+        expected (Decimal): Initial deposit + received − sent − reserved by
+            prepared cross-shard transfers.
+    """
+
+    account_number: int
+    balance: Decimal
+    expected: Decimal
+
+
+class ReconciliationReport(BaseModel):
+    """
+    Pydantic schema for the progress and findings of a reconciliation run.
+
+    Attributes:
+        run_id (str): The run.
+        status (str): "running", "completed" or "failed".
+        started_at (datetime): When the run was planned.
+        finished_at (Optional[datetime]): When the last range was checked.
+        ranges_done (int): Account ranges checked so far.
+        ranges_total (int): Account ranges in the run.
+        accounts (int): Accounts checked so far.
+        total_balance (Decimal): Sum of the checked balances.
+        total_initial_deposits (Decimal): Sum of the checked initial deposits.
+        in_flight (Decimal): Funds reserved by prepared cross-shard transfers.
+        conservation_drift (Decimal): total_balance + in_flight − total_initial_deposits;
+            zero when no money was created or lost.
+        mismatch_count (int): Accounts whose balance disagrees with their ledger.
+        mismatches (List[BalanceMismatch]): The first of them, by account number.
+    """
+
+    run_id: str
+    status: str
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    ranges_done: int
+    ranges_total: int
+    accounts: int
+    total_balance: Decimal
+    total_initial_deposits: Decimal
+    in_flight: Decimal
+    conservation_drift: Decimal
+    mismatch_count: int
+    mismatches: List[BalanceMismatch]
+
+
+class ReconciliationRun(Base):
+    """
+    SQLAlchemy ORM model for one reconciliation run.
+
+    Columns:
+        id (str): Primary key, a random hex id.
+        status (str): "running", "completed" or "failed".
+        started_at (datetime): When the ranges were planned.
+        finished_at (datetime): When the last range was checked; null until then.
+    """
+
+    __tablename__ = "reconciliation_runs"
+
+    id = Column(String(32), primary_key=True)
+    status = Column(String(16), nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ReconciliationRange(Base):
+    """
+    SQLAlchemy ORM model for one account-number range of a run; the checkpoint.
+
+    Rows are written when the run is planned and filled in as each range is
+    checked, so a resumed run only checks ranges with no `checked_at`.
+
+    Columns:
+        run_id (str): The run, part of the primary key.
+        shard_id (int): Shard holding the range, part of the primary key.
+        range_start (int): First account number, part of the primary key.
+        range_end (int): Account number after the last one.
+        accounts (int): Accounts in the range.
+        total_balance (int): Sum of their balances, in minor units.
+        total_initial_deposits (int): Sum of their initial deposits, in minor units.
+        in_flight (int): Funds reserved by their prepared cross-shard debits, in minor units.
+        mismatches (str): JSON list of [account_number, balance, expected] in minor units.
+        checked_at (datetime): When the range was checked; null until then.
+    """
+
+    __tablename__ = "reconciliation_ranges"
+
+    run_id = Column(String(32), primary_key=True)
+    shard_id = Column(Integer, primary_key=True)
+    range_start = Column(Integer, primary_key=True)
+    range_end = Column(Integer, nullable=False)
+    accounts = Column(Integer, nullable=True)
+    total_balance = Column(BigInteger, nullable=True)
+    total_initial_deposits = Column(BigInteger, nullable=True)
+    in_flight = Column(BigInteger, nullable=True)
+    mismatches = Column(Text, nullable=True)
+    checked_at = Column(DateTime, nullable=True)
@@ -0,0 +1,161 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String
+
+from app.config import MONEY_DECIMAL_PLACES
+from app.database import Base
+
+ONCE = "once"
+DAILY = "daily"
+WEEKLY = "weekly"
+MONTHLY = "monthly"
+
+COMPLETED = "completed"
+REJECTED = "rejected"
+# Cross-shard runs are recorded before the two-phase transfer starts.
+PENDING = "pending"
+
+
+class ScheduledTransferInput(BaseModel):
+    """
+    Pydantic schema for creating a scheduled or recurring transfer.
+
+    Attributes:
+        from_account_number (int): The account number to debit funds from.
+        to_account_number (int): The account number to credit funds to.
+        amount (Decimal): The amount of every run. Must be greater than 0, with at
+            most two decimal places.
+        frequency (str): "once", "daily", "weekly" or "monthly".
+        first_run_at (datetime): When the first run is due; naive times are in
+            the bank's timezone.
+    """
+
+    from_account_number: int
+    to_account_number: int
+    amount: Decimal = Field(..., gt=0, decimal_places=MONEY_DECIMAL_PLACES)
+    frequency: Literal["once", "daily", "weekly", "monthly"] = ONCE
+    first_run_at: datetime
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "from_account_number": 1234,
+                "to_account_number": 5678,
+                "amount": "100.00",
+                "frequency": "monthly",
+                "first_run_at": "2025-02-01T00:00:00",
+            }
+        }
+
+
+class ScheduledTransferOutput(BaseModel):
+    """
+    Pydantic schema for returning a scheduled transfer.
+
+    Attributes:
+        id (int): The schedule id.
+        from_account_number (int): The source account number.
+        to_account_number (int): The destination account number.
+        amount (Decimal): The amount of every run.
+        frequency (str): "once", "daily", "weekly" or "monthly".
+        first_run_at (datetime): When the first run was due.
+        next_run_at (Optional[datetime]): When the next run is due; None once
+            finished or cancelled.
+    """
+
+    id: int
+    from_account_number: int
+    to_account_number: int
+    amount: Decimal
+    frequency: str
+    first_run_at: datetime
+    next_run_at: Optional[datetime] = None
+
+
+class ScheduledTransferRunOutput(BaseModel):
+    """
+    Pydantic schema for the outcome of one run of a scheduled transfer.
+
+    Attributes:
+        scheduled_for (datetime): When the run was due.
+        executed_at (datetime): When the scheduler executed it.
+        status (str): "completed", "rejected" or "pending".
+        transfer_id (Optional[int]): The resulting transfer, if completed.
+        error (Optional[str]): Why the run was rejected.
+    """
+
+    scheduled_for: datetime
+    executed_at: datetime
+    status: str
+    transfer_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class ScheduledTransferRunsPage(BaseModel):
+    """
+    Pydantic schema for the most recent runs of a scheduled transfer.
+
+    Attributes:
+        scheduled_transfer (ScheduledTransferOutput): The schedule.
+        runs (List[ScheduledTransferRunOutput]): Its runs, newest first.
+    """
+
+    scheduled_transfer: ScheduledTransferOutput
+    runs: List[ScheduledTransferRunOutput]
+
+
+class ScheduledTransfer(Base):
+    """
+    SQLAlchemy ORM model for the scheduled_transfers table.
+
+    Columns:
+        id (int): Primary key.
+        from_account_number (int): Source account; also the shard key.
+        to_account_number (int): Destination account.
+        amount (int): The amount of every run, in minor units.
+        frequency (str): "once", "daily", "weekly" or "monthly".
+        first_run_at (datetime): The first due time; anchors the day of monthly runs.
+        next_run_at (datetime): The next due time, indexed for the scheduler;
+            NULL once the schedule is finished or cancelled.
+        created_at (datetime): When the schedule was created.
+    """
+
+    __tablename__ = "scheduled_transfers"
+
+    id = Column(Integer, primary_key=True)
+    from_account_number = Column(Integer, nullable=False, index=True)
+    to_account_number = Column(Integer, nullable=False)
+    amount = Column(BigInteger, nullable=False)
+    frequency = Column(String, nullable=False)
+    first_run_at = Column(DateTime, nullable=False)
+    next_run_at = Column(DateTime, nullable=True, index=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+class ScheduledTransferRun(Base):
+    """
+    SQLAlchemy ORM model for the scheduled_transfer_runs table, one row per run.
+
+    Columns:
+        id (int): Primary key.
+        scheduled_transfer_id (int): FK to scheduled_transfers.id.
+        from_account_number (int): Source account, the shard key.
+        scheduled_for (datetime): When the run was due.
+        executed_at (datetime): When it was executed.
+        status (str): "completed", "rejected" or "pending".
+        transfer_id (int): The resulting transfer, if completed.
+        error (str): Why the run was rejected.
+    """
+
+    __tablename__ = "scheduled_transfer_runs"
+
+    id = Column(Integer, primary_key=True)
+    scheduled_transfer_id = Column(Integer, ForeignKey("scheduled_transfers.id"), nullable=False, index=True)
+    from_account_number = Column(Integer, nullable=False)
+    scheduled_for = Column(DateTime, nullable=False)
+    executed_at = Column(DateTime, nullable=False)
+    status = Column(String, nullable=False)
+    transfer_id = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
@@ -0,0 +1,94 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String
+
+from app.database import Base
+
+
+PREPARING = "preparing"
+PREPARED = "prepared"
+COMMITTED = "committed"
+COMPLETED = "completed"
+ABORTED = "aborted"
+
+
+class AccountNumberTicket(Base):
+    """
+    SQLAlchemy ORM model for the per-shard account number allocator.
+
+    Columns:
+        id (int): Autoincrement ticket, turned into an account number by the
+            ShardRouter.
+    """
+
+    __tablename__ = "account_number_tickets"
+
+    id = Column(Integer, primary_key=True)
+
+
+class CustomerIdTicket(Base):
+    """
+    SQLAlchemy ORM model for the per-shard customer id allocator.
+
+    Columns:
+        id (int): Autoincrement ticket, turned into a customer id by the
+            ShardRouter.
+    """
+
+    __tablename__ = "customer_id_tickets"
+
+    id = Column(Integer, primary_key=True)
+
+
+class ShardTransaction(Base):
+    """
+    SQLAlchemy ORM model for the coordinator log of cross-shard transfers.
+
+    The row lives on the shard of the debited account and holds the commit
+    decision of the two-phase protocol.
+
+    Columns:
+        txid (str): Primary key, unique id of the distributed transaction.
+        from_account_number (int): Account to debit.
+        to_account_number (int): Account to credit.
+        amount (int): Amount to transfer, in minor units.
+        timestamp (datetime): Timestamp recorded on both transfer rows.
+        state (str): One of preparing, committed, completed or aborted.
+        created_at (datetime): When the transaction was started.
+    """
+
+    __tablename__ = "shard_transactions"
+
+    txid = Column(String(32), primary_key=True)
+    from_account_number = Column(Integer, nullable=False)
+    to_account_number = Column(Integer, nullable=False)
+    amount = Column(BigInteger, default=0)
+    timestamp = Column(DateTime, nullable=False)
+    state = Column(String(16), nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+class PreparedLeg(Base):
+    """
+    SQLAlchemy ORM model for one participant's part of a cross-shard transfer.
+
+    Columns:
+        txid (str): Id of the distributed transaction, part of the primary key.
+        account_number (int): The local account touched by this leg, part of
+            the primary key.
+        coordinator_shard (int): Shard holding the ShardTransaction row.
+        from_account_number (int): Account to debit.
+        to_account_number (int): Account to credit.
+        amount (int): Amount to transfer, in minor units.
+        timestamp (datetime): Timestamp recorded on the transfer row.
+        state (str): One of prepared, committed or aborted.
+    """
+
+    __tablename__ = "prepared_legs"
+
+    txid = Column(String(32), primary_key=True)
+    account_number = Column(Integer, primary_key=True)
+    coordinator_shard = Column(Integer, nullable=False)
+    from_account_number = Column(Integer, nullable=False)
+    to_account_number = Column(Integer, nullable=False)
+    amount = Column(BigInteger, default=0)
+    timestamp = Column(DateTime, nullable=False)
+    state = Column(String(16), nullable=False, index=True)
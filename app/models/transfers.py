@@ -1,11 +1,12 @@
 from datetime import datetime
 from decimal import Decimal
+from typing import List, Optional
 from pydantic import BaseModel, Field
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Numeric
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer
 from sqlalchemy.orm import relationship
 
-from app.config import TIMEZONE
-from app.database import Base
+from app.config import MONEY_DECIMAL_PLACES, TIMEZONE
+from app.database import Base, local_foreign_key
 
 
 class TransferInput(BaseModel):
@@ -15,12 +16,13 @@ class TransferInput(BaseModel):
     Attributes:
         from_account_number (int): The account number to debit funds from.
         to_account_number (int): The account number to credit funds to.
-        amount (Decimal): The amount to transfer. Must be greater than 0.
+        amount (Decimal): The amount to transfer. Must be greater than 0, with at
+            most two decimal places.
     """
 
     from_account_number: int
     to_account_number: int
-    amount: Decimal = Field(..., gt=0)
+    amount: Decimal = Field(..., gt=0, decimal_places=MONEY_DECIMAL_PLACES)
 
     class Config:
         schema_extra = {
@@ -52,6 +54,48 @@ class TransferOutput(BaseModel):
         orm_mode = True
 
 
+class StatementEntry(BaseModel):
+    """
+    Pydantic schema for one line of an account statement.
+
+    Attributes:
+        id (int): The transfer id.
+        from_account_number (int): The source account number.
+        to_account_number (int): The destination account number.
+        amount (Decimal): The transferred amount.
+        signed_amount (Decimal): The amount as seen by the account, negative for debits.
+        balance_after (Decimal): The account balance right after this transfer.
+        timestamp (datetime): ISO timestamp when the transfer occurred.
+    """
+
+    id: int
+    from_account_number: int
+    to_account_number: int
+    amount: Decimal
+    signed_amount: Decimal
+    balance_after: Decimal
+    timestamp: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class StatementPage(BaseModel):
+    """
+    Pydantic schema for one page of an account statement.
+
+    Attributes:
+        account_number (int): The account the statement belongs to.
+        entries (List[StatementEntry]): Statement lines, newest first.
+        next_before (Optional[int]): Pass as `before` to fetch the next page;
+            None on the last page.
+    """
+
+    account_number: int
+    entries: List[StatementEntry]
+    next_before: Optional[int] = None
+
+
 class Transfer(Base):
     """
     SQLAlchemy ORM model for the transfers table.
@@ -60,29 +104,43 @@ class Transfer(Base):
         id (int): Primary key, unique transfer identifier.
         from_account_number (int): FK to accounts.account_number, source account.
         to_account_number (int): FK to accounts.account_number, destination account.
-        amount (Decimal): The amount of money transferred.
+        amount (int): The amount of money transferred, in minor units.
         timestamp (datetime): When the transfer was executed (default=now).
 
     Relationships:
         from_account (Account): The Account object from which funds were debited.
         to_account   (Account): The Account object to which funds were credited.
+
+    When sharded, a transfer between accounts on different shards is stored on
+    both shards, so the account columns carry no foreign key constraint.
     """
 
     __tablename__ = "transfers"
-    
+    __table_args__ = (
+        # Keyset pages of an account's statement, one index per side.
+        Index("ix_transfers_from_account_number_id", "from_account_number", "id"),
+        Index("ix_transfers_to_account_number_id", "to_account_number", "id"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     from_account_number = Column(
-        Integer, ForeignKey("accounts.account_number"), nullable=False
+        Integer, *local_foreign_key("accounts.account_number"), nullable=False
     )
     to_account_number = Column(
-        Integer, ForeignKey("accounts.account_number"), nullable=False
+        Integer, *local_foreign_key("accounts.account_number"), nullable=False
     )
-    amount = Column(Numeric(precision=12, scale=2), default=Decimal("0.00"))
+    amount = Column(BigInteger, default=0)
     timestamp = Column(DateTime, default=datetime.now(TIMEZONE), nullable=False)
 
     from_account = relationship(
-        "Account", foreign_keys=[from_account_number], back_populates="sent_transfers"
+        "Account",
+        primaryjoin="Transfer.from_account_number == Account.account_number",
+        foreign_keys=[from_account_number],
+        back_populates="sent_transfers",
     )
     to_account = relationship(
-        "Account", foreign_keys=[to_account_number], back_populates="received_transfers"
+        "Account",
+        primaryjoin="Transfer.to_account_number == Account.account_number",
+        foreign_keys=[to_account_number],
+        back_populates="received_transfers",
     )
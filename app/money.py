@@ -0,0 +1,33 @@
+"""
+Conversion between API amounts and integer minor units.
+
+Balances and amounts are BIGINT minor units (cents) in the database and plain
+ints in the services. Decimal only appears at the API boundary: request models
+are converted with `to_minor`, responses and events with `to_decimal`.
+"""
+from decimal import Decimal
+
+from app.config import MONEY_DECIMAL_PLACES
+
+MINOR_UNITS = 10 ** MONEY_DECIMAL_PLACES
+
+
+def to_minor(amount) -> int:
+    """
+    Convert a decimal amount to minor units.
+
+    Raises:
+        ValueError: If the amount has more decimal places than the currency.
+    """
+    minor = Decimal(amount) * MINOR_UNITS
+    if minor != minor.to_integral_value():
+        raise ValueError(f"{amount} has more than {MONEY_DECIMAL_PLACES} decimal places")
+
+    return int(minor)
+
+
+def to_decimal(minor: int) -> Decimal:
+    """
+    Convert minor units to a Decimal with the currency's decimal places, e.g. 5000 -> 50.00.
+    """
+    return Decimal(minor).scaleb(-MONEY_DECIMAL_PLACES)
@@ -0,0 +1,119 @@
+"""
+MessagePack as an alternative wire format for high-volume clients.
+
+Clients opt in per request: `Accept: application/msgpack` on the balance,
+batch balance and history endpoints, `Content-Type: application/msgpack` for
+request bodies on routers using `MsgPackRoute`. JSON stays the default.
+
+Types in MessagePack are fixed: amounts are integer minor units (requests may
+also send a decimal string) and timestamps are float seconds since the epoch.
+"""
+from datetime import datetime
+from typing import Any, Callable
+
+import msgpack
+from fastapi import Request, Response
+
+from app.config import TIMEZONE
+from app.money import to_decimal
+from app.profiling import ProfiledRoute
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+# Request fields holding money; an integer there is in minor units.
+MONEY_FIELDS = ("amount", "initial_deposit")
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content)
+
+
+def wants_msgpack(accept: str | None) -> bool:
+    """
+    Whether an Accept header prefers MessagePack over JSON.
+
+    MessagePack is chosen when it is listed with a quality of at least that of
+    `application/json`; wildcards and missing headers keep JSON.
+    """
+    if not accept or "msgpack" not in accept:
+        return False
+
+    quality = {}
+    for part in accept.split(","):
+        media_type, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        quality[media_type.strip().lower()] = q
+
+    msgpack_q = max(quality.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES)
+    return msgpack_q > 0 and msgpack_q >= quality.get("application/json", 0.0)
+
+
+def epoch(timestamp: datetime) -> float:
+    """
+    Seconds since the epoch; naive timestamps are in the configured TIMEZONE.
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=TIMEZONE)
+
+    return timestamp.timestamp()
+
+
+def decode_msgpack_body(body: bytes) -> Any:
+    """
+    Unpack a MessagePack request body, reading integer money fields as minor units.
+
+    Invalid bodies raise from `msgpack.unpackb`, which FastAPI answers with 400
+    like any other body it can not parse.
+    """
+    data = msgpack.unpackb(body)
+
+    if isinstance(data, dict):
+        for name in MONEY_FIELDS:
+            if isinstance(data.get(name), int) and not isinstance(data[name], bool):
+                data[name] = str(to_decimal(data[name]))
+
+    return data
+
+
+class MsgPackRequest(Request):
+    """
+    A request whose MessagePack body is presented to FastAPI as a parsed JSON body.
+    """
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = decode_msgpack_body(await self.body())
+        return self._json
+
+
+class MsgPackRoute(ProfiledRoute):
+    """
+    Route class accepting `application/msgpack` request bodies next to JSON.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "")
+            if content_type.split(";")[0].strip().lower() in MSGPACK_MEDIA_TYPES:
+                # FastAPI only parses bodies it sees as JSON.
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (name, value) for name, value in request.scope["headers"] if name != b"content-type"
+                ] + [(b"content-type", b"application/json")]
+                request = MsgPackRequest(scope, request.receive)
+            return await handler(request)
+
+        return route_handler
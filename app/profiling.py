@@ -0,0 +1,327 @@
+"""
+On-demand request profiling.
+
+Routers using `ProfiledRoute` run a request's endpoint under `cProfile` when an
+admin asks for it with `X-Profile: 1` (or `?profile=1`), and 1 in
+PROFILE_SAMPLE_EVERY other requests. The report holds the request's wall time,
+the endpoint's wall and CPU time, the top `app.services` frames and the call
+tree below the endpoint. Reports are kept in a bounded ring buffer per worker
+(`GET /internal/profiles`); a requested one's id is returned in X-Profile-Id.
+
+Dependencies (authentication, the database session) run before the endpoint
+and are only part of the wall time. Coroutine endpoints are profiled on the
+event loop, so their report includes whatever else ran while they awaited.
+Requests that are not profiled pay one context variable lookup.
+"""
+import cProfile
+import functools
+import inspect
+import itertools
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from types import CodeType
+from typing import Callable
+
+from fastapi import Request, Response
+
+from app.authentication.oauth import bearer_claims
+from app.config import PROFILE_ADMINS, PROFILE_BUFFER_SIZE, PROFILE_SAMPLE_EVERY
+from app.exceptions import ProfileNotFoundError
+from app.tracing import TracedRoute
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+REQUESTED = "requested"
+SAMPLED = "sampled"
+# Frames listed in `top_frames`, by module prefix.
+SERVICES_PREFIX = "app.services."
+TOP_FRAMES = 20
+# Shape of the call tree: levels, callees per function, and the smallest share
+# of the endpoint's time a callee needs to be listed.
+TREE_DEPTH = 12
+TREE_WIDTH = 10
+TREE_MIN_SHARE = 0.01
+
+# The directory holding the `app` package; frames below it are named by module.
+_SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+
+def frame_name(key: tuple[str, int, str]) -> str:
+    """
+    Readable name of a pstats function key, e.g. "app.services.accounts.read_account".
+    """
+    filename, lineno, function = key
+    if filename == "~":
+        # Built-ins, e.g. "<method 'execute' of 'sqlite3.Cursor' objects>".
+        return function
+    if filename.startswith(_SOURCE_ROOT) and filename.endswith(".py"):
+        module = filename[len(_SOURCE_ROOT):-3].replace(os.sep, ".")
+        return f"{module}.{function}"
+
+    return f"{os.path.basename(filename)}:{lineno}({function})"
+
+
+def build_report(profile: cProfile.Profile, root: CodeType | None) -> dict:
+    """
+    Summarize a profile: the slowest `app.services` frames and the call tree below `root`.
+
+    pstats only records caller/callee pairs, so a callee's time in the tree is
+    that of all its calls from the same caller, wherever in the tree that is.
+
+    Returns:
+        dict: "top_frames", a list of frames by cumulative time, and
+        "call_tree", nested from `root` (None if `root` never ran).
+    """
+    stats = pstats.Stats(profile).stats
+    frames = [
+        {
+            "function": frame_name(key),
+            "calls": calls,
+            "own_ms": round(own * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        }
+        for key, (_, calls, own, cumulative, _) in stats.items()
+    ]
+    top_frames = sorted(
+        (frame for frame in frames if frame["function"].startswith(SERVICES_PREFIX)),
+        key=lambda frame: frame["cumulative_ms"],
+        reverse=True,
+    )[:TOP_FRAMES]
+
+    callees = defaultdict(list)
+    for key, (*_, callers) in stats.items():
+        for caller, timing in callers.items():
+            callees[caller].append((key, timing))
+
+    root_key = root and (root.co_filename, root.co_firstlineno, root.co_name)
+    if root_key not in stats:
+        return {"top_frames": top_frames, "call_tree": None}
+
+    _, calls, _, total, _ = stats[root_key]
+    threshold = total * TREE_MIN_SHARE
+
+    def node(key, calls: int, cumulative: float, path: frozenset) -> dict:
+        entry = {"function": frame_name(key), "calls": calls, "cumulative_ms": round(cumulative * 1000, 3)}
+        if len(path) < TREE_DEPTH:
+            children = sorted(callees.get(key, []), key=lambda c: c[1][3], reverse=True)
+            entry["children"] = [
+                node(child, timing[1], timing[3], path | {child})
+                for child, timing in children
+                if child not in path and timing[3] >= threshold
+            ][:TREE_WIDTH]
+        return entry
+
+    return {"top_frames": top_frames, "call_tree": node(root_key, calls, total, frozenset({root_key}))}
+
+
+class _Capture:
+    """
+    Profile of the endpoint of one request, filled in by the endpoint's thread.
+    """
+
+    __slots__ = ("profile", "root", "cpu_seconds", "endpoint_seconds", "busy")
+
+    def __init__(self):
+        self.profile: cProfile.Profile | None = None
+        self.root: CodeType | None = None
+        self.cpu_seconds = self.endpoint_seconds = 0.0
+        self.busy = False
+
+    def start(self, call: Callable) -> tuple[float, float]:
+        self.root = getattr(call, "__code__", None)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            self.profile = profile
+        except ValueError:
+            # Another profiler is active (process-wide on Python 3.12+).
+            self.busy = True
+        return time.thread_time(), time.perf_counter()
+
+    def stop(self, cpu: float, wall: float) -> None:
+        if self.profile is not None:
+            self.profile.disable()
+        self.cpu_seconds = time.thread_time() - cpu
+        self.endpoint_seconds = time.perf_counter() - wall
+
+
+_capture: ContextVar[_Capture | None] = ContextVar("profile_capture", default=None)
+
+
+class RequestProfiler:
+    """
+    Decides which requests are profiled and keeps their most recent reports.
+    """
+
+    def __init__(
+        self,
+        sample_every: int = PROFILE_SAMPLE_EVERY,
+        max_reports: int = PROFILE_BUFFER_SIZE,
+        admins: set[str] = PROFILE_ADMINS,
+    ):
+        self.sample_every = sample_every
+        self.admins = admins
+        self._reports: deque[dict] = deque(maxlen=max_reports)
+        self._lock = threading.Lock()
+        self._seen = itertools.count(1)
+        self.requested = self.sampled = self.busy = 0
+
+    def mode(self, request: Request) -> str | None:
+        """
+        REQUESTED if an admin asked to profile the request, SAMPLED if it is
+        the Nth one since the last sample, otherwise None.
+        """
+        flag = request.headers.get(PROFILE_HEADER) or request.query_params.get("profile")
+        if flag in ("1", "true") and self._is_admin(request):
+            return REQUESTED
+        if self.sample_every and next(self._seen) % self.sample_every == 0:
+            return SAMPLED
+
+        return None
+
+    def add(self, report: dict) -> None:
+        with self._lock:
+            self._reports.append(report)
+            if report["mode"] == REQUESTED:
+                self.requested += 1
+            else:
+                self.sampled += 1
+            self.busy += report["profiler_busy"]
+
+    def get(self, profile_id: str) -> dict:
+        """
+        Raises:
+            ProfileNotFoundError: If no kept report has this id.
+        """
+        with self._lock:
+            for report in self._reports:
+                if report["id"] == profile_id:
+                    return report
+        raise ProfileNotFoundError(profile_id)
+
+    def summaries(self) -> list[dict]:
+        """
+        The kept reports without their frames and call trees, newest first.
+        """
+        with self._lock:
+            reports = list(self._reports)
+        return [
+            {k: v for k, v in report.items() if k not in ("top_frames", "call_tree")} for report in reversed(reports)
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reports.clear()
+        self._seen = itertools.count(1)
+        self.requested = self.sampled = self.busy = 0
+
+    def stats(self) -> dict:
+        return {
+            "sample_every": self.sample_every,
+            "kept": len(self._reports),
+            "capacity": self._reports.maxlen,
+            "requested": self.requested,
+            "sampled": self.sampled,
+            "profiler_busy": self.busy,
+        }
+
+    def _is_admin(self, request: Request) -> bool:
+        claims = bearer_claims(request.scope)
+        return claims is not None and claims.get("sub") in self.admins
+
+
+profiler = RequestProfiler()
+
+
+def _profiled_endpoint(call: Callable) -> Callable:
+    if inspect.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def profiled(**values):
+            capture = _capture.get()
+            if capture is None:
+                return await call(**values)
+
+            started = capture.start(call)
+            try:
+                return await call(**values)
+            finally:
+                capture.stop(*started)
+
+    else:
+
+        @functools.wraps(call)
+        def profiled(**values):
+            capture = _capture.get()
+            if capture is None:
+                return call(**values)
+
+            started = capture.start(call)
+            try:
+                return call(**values)
+            finally:
+                capture.stop(*started)
+
+    profiled.__profiled__ = True
+    return profiled
+
+
+class ProfiledRoute(TracedRoute):
+    """
+    Traced route class that also profiles requests chosen by the `profiler`.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not getattr(endpoint, "__profiled__", False) and not (
+            inspect.isgeneratorfunction(endpoint) or inspect.isasyncgenfunction(endpoint)
+        ):
+            endpoint = _profiled_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            mode = profiler.mode(request)
+            if mode is None:
+                return await handler(request)
+
+            capture = _Capture()
+            token = _capture.set(capture)
+            started, wall = time.time(), time.perf_counter()
+            status_code = 500
+            try:
+                response = await handler(request)
+                status_code = response.status_code
+            except Exception as e:
+                status_code = getattr(e, "status_code", 500)
+                raise
+            finally:
+                _capture.reset(token)
+                report = {
+                    "id": os.urandom(8).hex(),
+                    "mode": mode,
+                    "method": request.method,
+                    "path": request.url.path,
+                    "status_code": status_code,
+                    "started_at": started,
+                    "wall_ms": round((time.perf_counter() - wall) * 1000, 3),
+                    "endpoint_wall_ms": round(capture.endpoint_seconds * 1000, 3),
+                    "cpu_ms": round(capture.cpu_seconds * 1000, 3),
+                    "profiler_busy": capture.busy,
+                }
+                if capture.profile is not None:
+                    report.update(build_report(capture.profile, capture.root))
+                else:
+                    report.update(top_frames=[], call_tree=None)
+                profiler.add(report)
+
+            if mode == REQUESTED:
+                response.headers[PROFILE_ID_HEADER] = report["id"]
+            return response
+
+        return route_handler
@@ -0,0 +1,230 @@
+import asyncio
+import json
+import select
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Protocol
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config import BALANCE_STREAM_MAX_SUBSCRIBERS
+
+
+class SubscriberLimitError(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Too many balance subscribers on this worker : limit={limit}")
+        self.limit = limit
+
+
+class Backend(Protocol):
+    def start(self, deliver: Callable[[dict], None]) -> None:
+        ...
+
+    def publish(self, message: dict) -> None:
+        ...
+
+    def stop(self) -> None:
+        ...
+
+
+class InProcessBackend:
+    """
+    Deliver messages straight to the subscribers of this worker.
+    """
+
+    def __init__(self):
+        self._deliver: Callable[[dict], None] | None = None
+
+    def start(self, deliver: Callable[[dict], None]) -> None:
+        self._deliver = deliver
+
+    def publish(self, message: dict) -> None:
+        if self._deliver is not None:
+            self._deliver(message)
+
+    def stop(self) -> None:
+        self._deliver = None
+
+
+class PostgresNotifyBackend:
+    """
+    Fan messages out to every worker through Postgres LISTEN/NOTIFY.
+
+    Publishing is a `pg_notify` on a pooled connection; a daemon thread keeps one
+    dedicated connection listening and hands every notification to `deliver`.
+    """
+
+    def __init__(self, engine: Engine, channel: str = "balance_events", poll_seconds: float = 1.0):
+        self.engine = engine
+        self.channel = channel
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, deliver: Callable[[dict], None]) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, args=(deliver,), daemon=True)
+        self._thread.start()
+
+    def publish(self, message: dict) -> None:
+        with self.engine.connect() as conn:
+            conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": json.dumps(message)},
+            )
+            conn.commit()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _listen(self, deliver: Callable[[dict], None]) -> None:
+        while not self._stop.is_set():
+            conn = None
+            try:
+                raw = self.engine.raw_connection()
+                raw.detach()
+                conn = raw.dbapi_connection
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.channel}")
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_seconds) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        deliver(json.loads(conn.notifies.pop(0).payload))
+            except Exception:
+                # Lost the listening connection; reconnect after a short pause.
+                time.sleep(self.poll_seconds)
+            finally:
+                # A detached connection never returns to the pool; close it on every path.
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+class Subscription:
+    """
+    One stream's mailbox. Only the most recent message is kept, so a slow
+    reader skips intermediate balances instead of building a backlog.
+
+    Messages are published after their commit, from any thread or worker, so
+    they can arrive out of order; one whose account version is not newer than
+    the last one taken is dropped, and a stream never goes back to a stale balance.
+    """
+
+    def __init__(self, account_number: int, loop: asyncio.AbstractEventLoop):
+        self.account_number = account_number
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.version = 0
+
+    def offer(self, message: dict) -> None:
+        if message["version"] <= self.version:
+            return
+        self.version = message["version"]
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    def advance(self, version: int) -> None:
+        """
+        Skip every message up to `version`, e.g. that of a balance read directly.
+        """
+        self.version = max(self.version, version)
+        if self.queue.full():
+            message = self.queue.get_nowait()
+            if message["version"] > version:
+                self.queue.put_nowait(message)
+
+
+class BalanceBroker:
+    """
+    Per-worker registry of balance subscribers fed by a pluggable backend.
+
+    Services call `publish` after a commit changes a balance; the backend
+    delivers the message to every worker it reaches, and each worker pushes it
+    onto the event loop of the matching subscriptions.
+
+    Attributes:
+        backend (Backend): Transport between publishers and workers.
+        max_subscribers (int): Cap on open subscriptions in this worker.
+    """
+
+    def __init__(self, backend: Backend | None = None, max_subscribers: int = BALANCE_STREAM_MAX_SUBSCRIBERS):
+        self.backend = backend or InProcessBackend()
+        self.max_subscribers = max_subscribers
+        self._subscriptions: dict[int, set[Subscription]] = defaultdict(set)
+        self._count = 0
+        self._published = 0
+        self._failed = 0
+        self._lock = threading.Lock()
+        self.backend.start(self._deliver)
+
+    def use_backend(self, backend: Backend) -> None:
+        self.backend.stop()
+        self.backend = backend
+        self.backend.start(self._deliver)
+
+    def subscribe(self, account_number: int) -> Subscription:
+        """
+        Register a subscription on the running event loop.
+
+        Raises:
+            SubscriberLimitError: If the worker already has `max_subscribers` streams.
+        """
+        subscription = Subscription(account_number, asyncio.get_running_loop())
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise SubscriberLimitError(self.max_subscribers)
+            self._subscriptions[account_number].add(subscription)
+            self._count += 1
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.account_number)
+            if subscribers and subscription in subscribers:
+                subscribers.remove(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscriptions[subscription.account_number]
+
+    def publish(self, account_number: int, balance: int, version: int) -> None:
+        """
+        Announce the committed balance (minor units) and version of an account. Safe to call from any thread.
+
+        A failing backend is counted, not raised: the change is already committed
+        and streams fall back to their heartbeat until the next update.
+        """
+        try:
+            self.backend.publish({"account_number": account_number, "balance": balance, "version": version})
+            self._published += 1
+        except Exception:
+            self._failed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": self._count,
+                "accounts": len(self._subscriptions),
+                "max_subscribers": self.max_subscribers,
+                "published": self._published,
+                "publish_failures": self._failed,
+            }
+
+    def _deliver(self, message: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscriptions.get(message["account_number"], ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, message)
+            except RuntimeError:
+                # The subscriber's loop is closed; its stream is going away.
+                pass
+
+
+balance_broker = BalanceBroker()
@@ -0,0 +1,218 @@
+"""
+EXPLAIN the SQL statements an operation sends, as dialect-neutral plan steps.
+
+SQLite's `EXPLAIN QUERY PLAN` and PostgreSQL's `EXPLAIN (FORMAT JSON)` are
+reduced to the same `PlanStep`s: which table is read, whether by a full scan
+or an index search, through which index and, on PostgreSQL, how many rows the
+planner expects. The query plan regression tests use these to pin the indexes
+of the hot queries.
+"""
+import difflib
+import json
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+SCAN = "scan"
+SEARCH = "search"
+# Tables too large to be read in full by a request.
+LARGE_TABLES = frozenset({"accounts", "customers", "transfers"})
+
+# e.g. "SEARCH transfers USING INDEX ix_transfers_from_account_number_id (from_account_number=? AND id<?)"
+SQLITE_STEP = re.compile(r"^(SCAN|SEARCH) (\w+)(?: AS \w+)?(?: USING (.*))?$")
+SQLITE_INDEX = re.compile(r"(?:COVERING )?INDEX (\w+)")
+# PostgreSQL nodes reading a table or index.
+POSTGRES_SCANS = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Index Scan", "Bitmap Heap Scan"}
+
+
+@dataclass(frozen=True)
+class PlanStep:
+    """
+    One read of a table in a query plan.
+
+    Attributes:
+        operation (str): SEARCH when an index narrows the rows read, SCAN when
+            every row (of the table, or of an index) is read.
+        table (str | None): The table read.
+        index (str | None): The index used; SQLite primary keys are reported
+            under PostgreSQL's default name, "<table>_pkey".
+        estimated_rows (float | None): The planner's row estimate; None on SQLite.
+        detail (str): The dialect's own description of the step.
+    """
+
+    operation: str
+    table: str | None
+    index: str | None
+    estimated_rows: float | None
+    detail: str
+
+
+@dataclass
+class QueryPlan:
+    """
+    The plan of one statement.
+
+    Attributes:
+        statement (str): The SQL explained.
+        steps (list[PlanStep]): Table reads in plan order.
+        text (str): The plan as the dialect prints it, one node per line.
+    """
+
+    statement: str
+    steps: list[PlanStep]
+    text: str
+
+    def full_scans(self, tables: set[str]) -> list[PlanStep]:
+        return [s for s in self.steps if s.operation == SCAN and s.table in tables]
+
+    def indexes(self) -> set[str]:
+        return {s.index for s in self.steps if s.index is not None}
+
+    def max_estimated_rows(self) -> float | None:
+        estimates = [s.estimated_rows for s in self.steps if s.estimated_rows is not None]
+        return max(estimates) if estimates else None
+
+
+def parse_sqlite_plan(statement: str, rows: list[tuple]) -> QueryPlan:
+    """
+    Read the (id, parent, notused, detail) rows of SQLite's EXPLAIN QUERY PLAN.
+    """
+    depth: dict[int, int] = {}
+    lines = []
+    steps = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+        match = SQLITE_STEP.match(detail)
+        if match is None:
+            continue
+
+        operation, table, using = match.groups()
+        index = None
+        if using:
+            if "PRIMARY KEY" in using:
+                index = f"{table}_pkey"
+            elif (found := SQLITE_INDEX.search(using)) is not None:
+                index = found.group(1)
+        steps.append(PlanStep(operation.lower(), table, index, None, detail))
+
+    return QueryPlan(statement, steps, "\n".join(lines))
+
+
+def parse_postgres_plan(statement: str, document: list[dict] | str) -> QueryPlan:
+    """
+    Read the output of PostgreSQL's EXPLAIN (FORMAT JSON).
+    """
+    if isinstance(document, str):
+        document = json.loads(document)
+
+    lines = []
+    steps = []
+
+    def visit(node: dict, depth: int, heap_table: str | None) -> None:
+        node_type = node["Node Type"]
+        # A bitmap index scan reads the table of the bitmap heap scan above it.
+        table = node.get("Relation Name") or (heap_table if node_type == "Bitmap Index Scan" else None)
+        index = node.get("Index Name")
+        condition = node.get("Index Cond") or node.get("Recheck Cond") or node.get("Filter")
+        lines.append(
+            "  " * depth
+            + " ".join(filter(None, [node_type, table and f"on {table}", index and f"using {index}", condition]))
+            + f" (rows={node.get('Plan Rows')})"
+        )
+        if node_type in POSTGRES_SCANS:
+            # An index scan without a condition walks the whole index, e.g. only for its order.
+            searched = node_type != "Seq Scan" and (
+                node_type.startswith("Bitmap") or "Index Cond" in node
+            )
+            steps.append(
+                PlanStep(SEARCH if searched else SCAN, node.get("Relation Name") or table, index,
+                         node.get("Plan Rows"), lines[-1].strip())
+            )
+        for child in node.get("Plans", []):
+            visit(child, depth + 1, table if node_type == "Bitmap Heap Scan" else heap_table)
+
+    visit(document[0]["Plan"], 0, None)
+    return QueryPlan(statement, steps, "\n".join(lines))
+
+
+def explain(conn: Connection, statement: str, parameters=None) -> QueryPlan:
+    """
+    Plan a statement without running it.
+
+    Args:
+        conn (Connection): Connection to a SQLite or PostgreSQL database.
+        statement (str): SQL as sent by the DBAPI cursor, with its paramstyle.
+        parameters: The statement's DBAPI parameters.
+
+    Returns:
+        QueryPlan: The parsed plan.
+    """
+    if conn.dialect.name == "postgresql":
+        result = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters or {})
+        return parse_postgres_plan(statement, result.scalar())
+
+    result = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+    return parse_sqlite_plan(statement, result.all())
+
+
+def plan_problems(
+    plan: QueryPlan,
+    uses: list[tuple[str, tuple[str, ...]]],
+    tables: frozenset[str] = LARGE_TABLES,
+    max_rows: float | None = None,
+) -> list[str]:
+    """
+    Check a plan against what a hot query needs.
+
+    Args:
+        plan (QueryPlan): The plan to check.
+        uses (list): (table, acceptable index names) pairs the plan must search through.
+        tables (frozenset[str]): Tables that must not be scanned in full.
+        max_rows (float | None): Largest row estimate allowed for any step.
+
+    Returns:
+        list[str]: One line per problem; empty if the plan is fine.
+    """
+    problems = [f"full scan: {step.detail}" for step in plan.full_scans(tables)]
+    for table, names in uses:
+        if not any(s.operation == SEARCH and s.table == table and s.index in names for s in plan.steps):
+            problems.append(f"no search of {table} using {' or '.join(names)}")
+    estimated = plan.max_estimated_rows()
+    if max_rows is not None and estimated is not None and estimated > max_rows:
+        problems.append(f"estimated {estimated:g} rows, expected at most {max_rows:g}")
+
+    return problems
+
+
+def plan_diff(plan: QueryPlan, uses: list[tuple[str, tuple[str, ...]]]) -> str:
+    """
+    A unified diff from the expected table reads to those of the plan, followed by the full plan.
+    """
+    expected = sorted({f"SEARCH {table} USING {' or '.join(names)}" for table, names in uses})
+    actual = sorted(
+        {" ".join(filter(None, [s.operation.upper(), s.table, s.index and f"USING {s.index}"])) for s in plan.steps}
+    )
+    diff = difflib.unified_diff(expected, actual, "expected", "actual", lineterm="")
+    return "\n".join([*diff, "", plan.statement, "", plan.text])
+
+
+@contextmanager
+def captured_statements(engine: Engine) -> Iterator[list[tuple[str, object]]]:
+    """
+    Collect the (statement, parameters) pairs an engine sends while the block runs.
+    """
+    statements: list[tuple[str, object]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
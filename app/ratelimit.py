@@ -0,0 +1,262 @@
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from app.authentication.oauth import bearer_claims
+from app.config import (ADMISSION_QUEUE_LIMITS, ADMISSION_QUEUE_TIMEOUT_SECONDS, CONCURRENCY_LIMITS,
+                        RATE_LIMIT_BURST, RATE_LIMIT_MAX_SUBJECTS, RATE_LIMIT_PER_SECOND)
+
+
+# Paths never throttled: docs, the landing page, the readiness probe (a throttled
+# probe takes a healthy worker out of rotation), long-lived streams (capped by
+# their own subscriber limit) and the internal endpoints used to watch the limiter.
+EXEMPT_PREFIXES = ("/docs", "/redoc", "/openapi.json", "/internal", "/ready")
+EXEMPT_SUFFIXES = ("/balance/stream",)
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        Take one token.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    One token bucket per subject, keeping at most `max_subjects` buckets (the
+    least recently used are dropped; a dropped subject starts again full).
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_PER_SECOND,
+        burst: float = RATE_LIMIT_BURST,
+        max_subjects: int = RATE_LIMIT_MAX_SUBJECTS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_subjects = max_subjects
+        self.clock = clock
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, subject: str) -> float:
+        """
+        Returns:
+            float: 0 if the request may proceed, otherwise the Retry-After in seconds.
+        """
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(subject)
+            if bucket is None:
+                bucket = self._buckets[subject] = TokenBucket(self.rate, self.burst, now)
+                if len(self._buckets) > self.max_subjects:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(subject)
+
+            return bucket.take(now)
+
+    def subjects(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """
+    Bound the requests in flight for one endpoint class.
+
+    Up to `limit` requests run at once and up to `max_queue` more may wait, each
+    for at most `queue_timeout` seconds. Anything beyond that is rejected at
+    once, so a backlog never builds up behind requests that would time out anyway.
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._slots: asyncio.Semaphore | None = None
+
+    async def acquire(self) -> None:
+        """
+        Raises:
+            AdmissionRejected: With 503 if the queue is full or the wait timed out.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.limit)
+
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                raise AdmissionRejected(503, 1, "queue full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise AdmissionRejected(503, 1, "queue timeout")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._slots.release()
+
+
+class AdmissionController:
+    """
+    Per-worker admission state: the subject rate limiter, one concurrency
+    limiter per endpoint class and the rejection counters.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.rate_limiter = RateLimiter()
+        self.limiters = {
+            name: ConcurrencyLimiter(limit, ADMISSION_QUEUE_LIMITS[name])
+            for name, limit in CONCURRENCY_LIMITS.items()
+        }
+        self.rejections = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+
+    def stats(self) -> dict:
+        return {
+            "rate_limit": {
+                "per_second": self.rate_limiter.rate,
+                "burst": self.rate_limiter.burst,
+                "subjects": self.rate_limiter.subjects(),
+            },
+            "endpoint_classes": {
+                name: {
+                    "limit": limiter.limit,
+                    "active": limiter.active,
+                    "waiting": limiter.waiting,
+                    "max_queue": limiter.max_queue,
+                }
+                for name, limiter in self.limiters.items()
+            },
+            "rejections": dict(self.rejections),
+        }
+
+
+admission = AdmissionController()
+
+
+def endpoint_class(method: str, path: str) -> str | None:
+    """
+    Classify a request as "login", "reads" or "writes"; None if exempt.
+    """
+    if path == "/" or path.startswith(EXEMPT_PREFIXES) or path.endswith(EXEMPT_SUFFIXES):
+        return None
+    if path.startswith("/login"):
+        return "login"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "reads"
+    # The batch balance lookup is a read sent as POST.
+    if path == "/accounts/balances":
+        return "reads"
+
+    return "writes"
+
+
+def request_subject(scope) -> str:
+    """
+    The JWT subject of the request, or the client address if it has no valid token.
+    """
+    claims = bearer_claims(scope)
+    if claims is not None and claims.get("sub") is not None:
+        return claims["sub"]
+
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware applying the rate limit and the concurrency limits.
+
+    Rejections are answered immediately with 429 (rate limit) or 503 (shed
+    load), both with a Retry-After header.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        kind = endpoint_class(scope["method"], scope["path"])
+        if kind is None:
+            return await self.app(scope, receive, send)
+
+        retry_after = self.controller.rate_limiter.check(request_subject(scope))
+        if retry_after:
+            self.controller.rejections["rate_limited"] += 1
+            return await _reject(send, 429, retry_after, "Rate limit exceeded")
+
+        limiter = self.controller.limiters[kind]
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as e:
+            self.controller.rejections[e.reason.replace(" ", "_")] += 1
+            return await _reject(send, e.status_code, e.retry_after, f"Server busy ({e.reason})")
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+async def _reject(send, status_code: int, retry_after: float, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
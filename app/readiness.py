@@ -0,0 +1,114 @@
+"""
+Warm-up of a worker after it starts serving, and its readiness.
+
+Startup only registers the warm-up steps; a daemon thread runs them (opening
+the database pools, loading the in-memory caches) and retries failed ones
+every READINESS_RETRY_SECONDS. `GET /ready` answers 503 until every step has
+succeeded, so a load balancer only routes to warmed-up workers.
+"""
+import threading
+import time
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config import READINESS_RETRY_SECONDS, READINESS_WARM_CONNECTIONS
+
+PENDING = "pending"
+OK = "ok"
+
+
+def warm_pool(engines: list[Engine], connections: int = READINESS_WARM_CONNECTIONS) -> None:
+    """
+    Open up to `connections` connections per engine at once, so requests find them in the pool.
+    """
+    for engine in engines:
+        size = getattr(engine.pool, "size", None)
+        opened = []
+        try:
+            for _ in range(min(connections, size() if callable(size) else 1)):
+                conn = engine.connect()
+                opened.append(conn)
+                conn.execute(text("SELECT 1"))
+        finally:
+            for conn in opened:
+                conn.close()
+
+
+class Readiness:
+    """
+    Runs named warm-up steps in order until each has succeeded once.
+    """
+
+    def __init__(self, retry_seconds: float = READINESS_RETRY_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.retry_seconds = retry_seconds
+        self.clock = clock
+        self._steps: dict[str, Callable[[], object]] = {}
+        self._state: dict[str, str] = {}
+        self._started: float | None = None
+        self._ready_after: float | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._state) and all(state == OK for state in self._state.values())
+
+    def warm_up(self) -> bool:
+        """
+        Run every step that has not succeeded yet; a failing step is recorded and skipped.
+
+        Returns:
+            bool: Whether the worker is ready.
+        """
+        for name, step in self._steps.items():
+            if self._state[name] == OK:
+                continue
+            try:
+                step()
+            except Exception as e:
+                self._state[name] = f"{type(e).__name__}: {e}"
+            else:
+                self._state[name] = OK
+
+        if self.ready and self._ready_after is None:
+            self._ready_after = self.clock() - self._started
+        return self.ready
+
+    def register(self, steps: dict[str, Callable[[], object]]) -> None:
+        """
+        Replace the warm-up steps; the worker is not ready until each has succeeded.
+        """
+        self._steps = dict(steps)
+        self._state = {name: PENDING for name in steps}
+        self._started = self.clock()
+        self._ready_after = None
+
+    def start(self, steps: dict[str, Callable[[], object]]) -> None:
+        self.register(steps)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def reset(self) -> None:
+        self.stop()
+        self._steps, self._state = {}, {}
+        self._started = self._ready_after = None
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "checks": dict(self._state),
+            "ready_after_seconds": None if self._ready_after is None else round(self._ready_after, 3),
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set() and not self.warm_up():
+            self._stop.wait(self.retry_seconds)
+
+
+readiness = Readiness()
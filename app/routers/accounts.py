@@ -1,14 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from app.services import accounts as accounts_service
+from app.audit import AuditEntry, audit
 from app.authentication.oauth import get_current_user
+from app.config import BALANCE_STREAM_HEARTBEAT_SECONDS
 from app.database import get_db
+from app.etags import account_etag, etag_matches, not_modified
 from app.exceptions import AccountNotFoundError
-from app.models.accounts import AccountOutput, BalanceOutput, CustomerInput
+from app.money import to_decimal, to_minor
+from app.negotiation import MsgPackResponse, MsgPackRoute, wants_msgpack
+from app.models.accounts import (AccountOutput, BalanceItem, BalanceOutput, BalancesInput,
+                                 BalancesOutput, CustomerInput)
+from app.pubsub import Subscription, SubscriberLimitError, balance_broker
 
-router = APIRouter()
+router = APIRouter(route_class=MsgPackRoute)
 
 
 @router.post(
@@ -38,32 +49,104 @@ def create_account(
     customer: CustomerInput,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
+    audit_entry: AuditEntry = Depends(audit("account.create")),
 ) -> AccountOutput:
     """
     Create an account for a customer.
     """
+    audit_entry.resource = customer.email
     try:
         customer_db = accounts_service.create_customer(db, customer)
         new_account = accounts_service.create_account_for_customer(
-            db, customer_db, customer.initial_deposit
+            db, customer_db, to_minor(customer.initial_deposit)
         )
     except SQLAlchemyError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
 
+    audit_entry.resource = str(new_account.account_number)
     return AccountOutput(
         account_number=new_account.account_number,
-        balance=new_account.balance,
+        balance=to_decimal(new_account.balance),
         customer_id=customer_db.customer_id,
         name=customer_db.name,
         email=customer_db.email,
     )
 
 
+@router.post(
+    "/balances",
+    response_model=BalancesOutput,
+    summary="Retrieve several account balances",
+    description=(
+        "Returns the balances of up to 200 accounts in request order. Accounts that do not "
+        "exist are reported per item instead of failing the request. Send "
+        "`Accept: application/msgpack` for MessagePack with balances in minor units. Only "
+        "accessible to authenticated users."
+    ),
+    responses={
+        200: {
+            "description": "Balances retrieved successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "balances": [
+                            {"account_number": 1234, "balance": "100.00", "error": None},
+                            {"account_number": 5678, "balance": None, "error": "Account 5678 not found"},
+                        ]
+                    }
+                }
+            },
+        },
+        422: {"description": "Empty or oversized batch"},
+        500: {"description": "Internal server error"},
+    },
+)
+def get_balances(
+    request: BalancesInput,
+    accept: str | None = Header(None),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+) -> BalancesOutput:
+    """
+    Get the balances of several accounts.
+    """
+    try:
+        balances = accounts_service.get_balances(db, request.account_numbers)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error {e}")
+
+    if wants_msgpack(accept):
+        return MsgPackResponse(
+            {
+                "balances": [
+                    {"account_number": n, "balance": balances[n], "error": None}
+                    if n in balances
+                    else {"account_number": n, "balance": None, "error": str(AccountNotFoundError(n))}
+                    for n in request.account_numbers
+                ]
+            },
+            headers={"Vary": "Accept"},
+        )
+
+    return BalancesOutput(
+        balances=[
+            BalanceItem(account_number=n, balance=to_decimal(balances[n]))
+            if n in balances
+            else BalanceItem(account_number=n, error=str(AccountNotFoundError(n)))
+            for n in request.account_numbers
+        ]
+    )
+
+
 @router.get(
     "/{account_number}/balance",
     response_model=BalanceOutput,
     summary="Retrieve account balance",
-    description="Returns the current balance for the given account number. Only accessible to authenticated users.",
+    description=(
+        "Returns the current balance for the given account number with an ETag; a matching "
+        "If-None-Match is answered with 304. Send `Accept: application/msgpack` for MessagePack "
+        "with the balance in minor units. Only accessible to authenticated users."
+    ),
     responses={
         200: {
             "description": "Balance retrieved successfully",
@@ -73,23 +156,129 @@ def create_account(
                 }
             },
         },
+        304: {"description": "Balance unchanged since the given ETag"},
         404: {"description": "Account not found"},
         500: {"description": "Internal server error"},
     },
 )
 def get_balance(
     account_number: int,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    accept: str | None = Header(None),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ) -> BalanceOutput:
     """
     Get the balance of an account.
     """
+    msgpack = wants_msgpack(accept)
+    try:
+        if if_none_match:
+            version = accounts_service.get_account_version(db, account_number)
+            if version is not None:
+                etag = account_etag("balance", account_number, version, msgpack)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+
+        account = accounts_service.read_account(db, account_number)
+    except AccountNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error {e}")
+
+    etag = account_etag("balance", account.account_number, account.version, msgpack)
+    if msgpack:
+        return MsgPackResponse(
+            {"account_number": account.account_number, "balance": account.balance},
+            headers={"ETag": etag, "Vary": "Accept"},
+        )
+
+    response.headers["ETag"] = etag
+    response.headers["Vary"] = "Accept"
+    return BalanceOutput(account_number=account.account_number, balance=to_decimal(account.balance))
+
+
+@router.get(
+    "/{account_number}/balance/stream",
+    summary="Stream account balance",
+    description=(
+        "Server-sent events: the current balance once, then a new event after every committed "
+        "transfer touching the account. Only accessible to authenticated users."
+    ),
+    responses={
+        200: {
+            "description": "Balance event stream",
+            "content": {
+                "text/event-stream": {
+                    "example": 'event: balance\ndata: {"account_number": 1234, "balance": "100.00"}\n\n'
+                }
+            },
+        },
+        404: {"description": "Account not found"},
+        500: {"description": "Internal server error"},
+        503: {"description": "Too many balance streams on this worker"},
+    },
+)
+async def stream_balance(
+    account_number: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+) -> StreamingResponse:
+    """
+    Stream the balance of an account as server-sent events.
+    """
+    try:
+        subscription = balance_broker.subscribe(account_number)
+    except SubscriberLimitError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    # Subscribed before reading, so a transfer committed in between is not missed.
     try:
-        account = accounts_service.get_account_by_number(db, account_number)
+        account = await run_in_threadpool(accounts_service.get_account_by_number, db, account_number)
+        initial = {"account_number": account.account_number, "balance": account.balance}
+        subscription.advance(account.version)
     except AccountNotFoundError as e:
+        balance_broker.unsubscribe(subscription)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except SQLAlchemyError as e:
+        balance_broker.unsubscribe(subscription)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error {e}")
+    finally:
+        # Give the connection back now instead of holding it for the life of the stream.
+        await run_in_threadpool(db.close)
+
+    return StreamingResponse(
+        balance_events(request, subscription, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def balance_events(
+    request: Request,
+    subscription: Subscription,
+    initial: dict,
+    heartbeat_seconds: float = BALANCE_STREAM_HEARTBEAT_SECONDS,
+):
+    """
+    Yield the initial balance, then every published balance, with a comment
+    line as heartbeat whenever nothing happened for `heartbeat_seconds`.
+    """
+    try:
+        yield _sse_event(initial)
+        while not await request.is_disconnected():
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            yield _sse_event(message)
+    finally:
+        balance_broker.unsubscribe(subscription)
+
 
-    return BalanceOutput(account_number=account.account_number, balance=account.balance)
+def _sse_event(message: dict) -> str:
+    data = {"account_number": message["account_number"], "balance": str(to_decimal(message["balance"]))}
+    return f"event: balance\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,133 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.services import customers as customers_service
+from app.authentication.oauth import get_current_user
+from app.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.database import get_db
+from app.exceptions import CustomerNotFoundError
+from app.money import to_decimal
+from app.models.accounts import CustomerAccountOutput, CustomerAccountsPage, CustomerOutput, CustomerPage
+from app.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get(
+    "/",
+    response_model=CustomerPage,
+    summary="Search customers by email",
+    description=(
+        "Returns customers whose email starts with the given prefix, ordered by email, "
+        "each with their accounts. Pass `next_after` back as `after` for the next page. "
+        "Authentication required."
+    ),
+    responses={
+        200: {
+            "description": "Customers retrieved successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "customers": [
+                            {
+                                "customer_id": 99,
+                                "name": "Alice Wonderland",
+                                "email": "alice@example.com",
+                                "accounts": [{"account_number": 1234, "balance": "250.00"}],
+                            }
+                        ],
+                        "next_after": None,
+                    }
+                }
+            },
+        },
+        500: {"description": "Internal server error"},
+    },
+)
+def search_customers(
+    email: str = Query(..., min_length=1, description="Email or leading part of an email"),
+    after: Optional[str] = Query(None, description="Last email of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+) -> CustomerPage:
+    """
+    Search customers by email prefix.
+    """
+    try:
+        customers = customers_service.search_customers_by_email(db, email, after, limit)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    return CustomerPage(
+        customers=[
+            CustomerOutput(
+                customer_id=customer.customer_id,
+                name=customer.name,
+                email=customer.email,
+                accounts=[
+                    CustomerAccountOutput(account_number=a.account_number, balance=to_decimal(a.balance))
+                    for a in customer.accounts
+                ],
+            )
+            for customer in customers
+        ],
+        next_after=customers[-1].email if len(customers) == limit else None,
+    )
+
+
+@router.get(
+    "/{customer_id}/accounts",
+    response_model=CustomerAccountsPage,
+    summary="List a customer's accounts",
+    description=(
+        "Returns the customer and their accounts ordered by account number. "
+        "Pass `next_after` back as `after` for the next page. Authentication required."
+    ),
+    responses={
+        200: {
+            "description": "Accounts retrieved successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "customer_id": 99,
+                        "name": "Alice Wonderland",
+                        "email": "alice@example.com",
+                        "accounts": [{"account_number": 1234, "balance": "250.00"}],
+                        "next_after": None,
+                    }
+                }
+            },
+        },
+        404: {"description": "Customer not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+def list_customer_accounts(
+    customer_id: int,
+    after: Optional[int] = Query(None, description="Last account number of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+) -> CustomerAccountsPage:
+    """
+    List the accounts of a customer.
+    """
+    try:
+        customer, accounts = customers_service.get_customer_accounts(db, customer_id, after, limit)
+    except CustomerNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    return CustomerAccountsPage(
+        customer_id=customer.customer_id,
+        name=customer.name,
+        email=customer.email,
+        accounts=[
+            CustomerAccountOutput(account_number=a.account_number, balance=to_decimal(a.balance)) for a in accounts
+        ],
+        next_after=accounts[-1].account_number if len(accounts) == limit else None,
+    )
@@ -0,0 +1,308 @@
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app import singleflight
+from app.account_index import account_index
+from app.audit import audit_log
+from app.authentication.oauth import get_current_user
+from app.circuit_breaker import db_breaker
+from app.config import (DB_TIMEOUTS, DEFAULT_DB_TIMEOUTS, MEMORY_TOP_LIMIT, MEMORY_TRACE_DEFAULT_FRAMES,
+                        MEMORY_TRACE_MAX_FRAMES)
+from app.database import get_db
+from app.exceptions import MemoryTracingInactiveError, ProfileNotFoundError, ReconciliationRunNotFoundError
+from app.memory import memory_tracer
+from app.models.reconciliation import ReconciliationReport
+from app.profiling import ProfiledRoute, profiler
+from app.pubsub import balance_broker
+from app.ratelimit import admission
+from app.services import reconciliation as reconciliation_service
+from app.velocity import velocity
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get(
+    "/limits",
+    summary="Admission control state",
+    description=(
+        "Token-bucket settings, in-flight and queued requests per endpoint class, and "
+        "rejection counters of this worker. Authentication required."
+    ),
+)
+def get_limits(current_user=Depends(get_current_user)) -> dict:
+    """
+    Report the rate limiter and concurrency limiter state of this worker.
+    """
+    return admission.stats()
+
+
+@router.get(
+    "/balance-streams",
+    summary="Live balance stream state",
+    description="Open balance streams and publish counters of this worker. Authentication required.",
+)
+def get_balance_streams(current_user=Depends(get_current_user)) -> dict:
+    """
+    Report the balance broker state of this worker.
+    """
+    return balance_broker.stats()
+
+
+@router.get(
+    "/singleflight",
+    summary="Read coalescing counters",
+    description=(
+        "For each coalesced read, how many calls ran a query and how many were answered "
+        "by an identical query already in flight. Authentication required."
+    ),
+)
+def get_singleflight(current_user=Depends(get_current_user)) -> dict:
+    """
+    Report the single-flight counters of this worker.
+    """
+    return singleflight.stats()
+
+
+@router.get(
+    "/velocity",
+    summary="Velocity limit state",
+    description=(
+        "Configured per-account transfer limits, accounts with live counters and rejections "
+        "of this worker. Authentication required."
+    ),
+)
+def get_velocity(current_user=Depends(get_current_user)) -> dict:
+    """
+    Report the velocity engine state of this worker.
+    """
+    return velocity.stats()
+
+
+@router.get(
+    "/account-index",
+    summary="Account existence index state",
+    description=(
+        "Trusted account number range per shard, bitmap size and lookups rejected without a "
+        "query by this worker. Authentication required."
+    ),
+)
+def get_account_index(current_user=Depends(get_current_user)) -> dict:
+    """
+    Report the account existence index of this worker.
+    """
+    return account_index.stats()
+
+
+@router.get(
+    "/audit",
+    summary="Audit log writer state",
+    description=(
+        "Queue depth and capacity, how far behind the writer is, and records queued, written "
+        "and dropped by this worker. Authentication required."
+    ),
+)
+def get_audit(current_user=Depends(get_current_user)) -> dict:
+    """
+    Report the audit log queue of this worker.
+    """
+    return audit_log.stats()
+
+
+@router.get(
+    "/database",
+    summary="Database circuit breaker state",
+    description=(
+        "Circuit breaker state, consecutive failures, trips and fast-failed requests of this "
+        "worker, and the configured per-endpoint timeouts. Authentication required."
+    ),
+)
+def get_database(current_user=Depends(get_current_user)) -> dict:
+    """
+    Report the database circuit breaker and timeouts of this worker.
+    """
+    return {
+        "breaker": db_breaker.stats(),
+        "timeouts_ms": {
+            "default": {"statement": DEFAULT_DB_TIMEOUTS[0], "lock": DEFAULT_DB_TIMEOUTS[1]},
+            **{name: {"statement": stmt, "lock": lock} for name, (stmt, lock) in DB_TIMEOUTS.items()},
+        },
+    }
+
+
+@router.get(
+    "/profiles",
+    summary="Recent request profiles",
+    description=(
+        "Profiler settings and counters, and the most recent profiled requests of this worker "
+        "with their wall and CPU times, newest first. Authentication required."
+    ),
+)
+def list_profiles(current_user=Depends(get_current_user)) -> dict:
+    """
+    Report the request profiler and the reports it keeps.
+    """
+    return {"profiler": profiler.stats(), "reports": profiler.summaries()}
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    summary="Request profile report",
+    description=(
+        "Wall and CPU time, the slowest `app.services` frames and the call tree of one "
+        "profiled request. Authentication required."
+    ),
+    responses={404: {"description": "Profile not found"}},
+)
+def get_profile(profile_id: str, current_user=Depends(get_current_user)) -> dict:
+    """
+    Return one kept profile report.
+    """
+    try:
+        return profiler.get(profile_id)
+    except ProfileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.get(
+    "/memory",
+    summary="Memory and allocation tracing state",
+    description=(
+        "Resident set size, traced memory and its peak, whether allocation tracing runs and "
+        "until when, and the peak traced memory of recent history and statement requests of "
+        "this worker. Authentication required."
+    ),
+)
+def get_memory(current_user=Depends(get_current_user)) -> dict:
+    """
+    Report the memory of this worker.
+    """
+    return memory_tracer.stats()
+
+
+@router.post(
+    "/memory/tracing",
+    summary="Start allocation tracing",
+    description=(
+        "Starts tracing allocations with tracebacks of up to `frames` frames; it stops by "
+        "itself after MEMORY_TRACE_MAX_SECONDS. Tracing slows allocations down. "
+        "Authentication required."
+    ),
+)
+def start_memory_tracing(
+    frames: int = Query(MEMORY_TRACE_DEFAULT_FRAMES, ge=1, le=MEMORY_TRACE_MAX_FRAMES),
+    current_user=Depends(get_current_user),
+) -> dict:
+    """
+    Start allocation tracing on this worker.
+    """
+    memory_tracer.start(frames)
+    return memory_tracer.stats()
+
+
+@router.delete(
+    "/memory/tracing",
+    summary="Stop allocation tracing",
+    description="Stops allocation tracing and drops its snapshot. Authentication required.",
+)
+def stop_memory_tracing(current_user=Depends(get_current_user)) -> dict:
+    """
+    Stop allocation tracing on this worker.
+    """
+    memory_tracer.stop()
+    return memory_tracer.stats()
+
+
+@router.post(
+    "/memory/snapshots",
+    summary="Allocation snapshot",
+    description=(
+        "Takes an allocation snapshot and returns the top allocating call sites, the call "
+        "sites and object types that grew most since the previous snapshot (or since tracing "
+        "started). Authentication required."
+    ),
+    responses={409: {"description": "Allocation tracing is not running"}},
+)
+def take_memory_snapshot(
+    limit: int = Query(MEMORY_TOP_LIMIT, ge=1, le=MEMORY_TOP_LIMIT),
+    current_user=Depends(get_current_user),
+) -> dict:
+    """
+    Diff the allocations of this worker against its previous snapshot.
+    """
+    try:
+        return memory_tracer.snapshot(limit)
+    except MemoryTracingInactiveError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.post(
+    "/reconciliation",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=ReconciliationReport,
+    summary="Start or resume a ledger reconciliation",
+    description=(
+        "Plans a new reconciliation run, or resumes the given one, and checks it in the "
+        "background. Poll `GET /internal/reconciliation/{run_id}` for the result. "
+        "Authentication required."
+    ),
+    responses={
+        404: {"description": "Reconciliation run not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+def start_reconciliation(
+    background_tasks: BackgroundTasks,
+    resume: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+) -> ReconciliationReport:
+    """
+    Start or resume a reconciliation run in the background.
+    """
+    engines, session_factory = reconciliation_service.reconciliation_targets(db)
+    try:
+        run_id = resume or reconciliation_service.start_reconciliation(engines, session_factory)
+        with session_factory() as session:
+            report = reconciliation_service.get_reconciliation_report(session, run_id)
+    except ReconciliationRunNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    background_tasks.add_task(
+        reconciliation_service.resume_reconciliation, engines, session_factory, run_id
+    )
+    return report
+
+
+@router.get(
+    "/reconciliation/{run_id}",
+    response_model=ReconciliationReport,
+    summary="Ledger reconciliation report",
+    description=(
+        "Progress, mismatching accounts and total-money conservation of a reconciliation "
+        "run. Authentication required."
+    ),
+    responses={
+        404: {"description": "Reconciliation run not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+def get_reconciliation(
+    run_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+) -> ReconciliationReport:
+    """
+    Report on a reconciliation run.
+    """
+    _, session_factory = reconciliation_service.reconciliation_targets(db)
+    try:
+        with session_factory() as session:
+            return reconciliation_service.get_reconciliation_report(session, run_id)
+    except ReconciliationRunNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
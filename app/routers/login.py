@@ -1,13 +1,23 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
 
+from app.audit import audit_log
 from app.services import login as login_service
+from app.authentication.oauth import get_token_claims
 from app.authentication.token import create_access_token
 from app.config import ACCESS_TOKEN_EXPIRE_MINUTES, HASH_PASSWORD, USERNAME
+from app.database import get_db
 from app.models.login import Token
+from app.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# Logins are recorded here rather than through `audit()`: that dependency needs an
+# authenticated user, which a failed login has not. These endpoints run in the
+# threadpool, so the queue's "block" policy never holds up the event loop.
 
 
 @router.post(
@@ -28,9 +38,11 @@ def login(request: OAuth2PasswordRequestForm = Depends()) -> Token:
     Authenticates the users username and password and provides an access token.
     """
     if not login_service.verify_username(request.username, USERNAME):
+        audit_log.record(request.username, "login", status_code=status.HTTP_403_FORBIDDEN)
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid username")
 
     if not login_service.verify_password(request.password, HASH_PASSWORD):
+        audit_log.record(request.username, "login", status_code=status.HTTP_403_FORBIDDEN)
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid password")
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -38,4 +50,36 @@ def login(request: OAuth2PasswordRequestForm = Depends()) -> Token:
         data={"sub": request.username}, expires_delta=access_token_expires
     )
 
+    audit_log.record(request.username, "login")
     return Token(access_token=access_token, token_type="bearer")
+
+
+@router.post(
+    "/revoke",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Revoke the current access token (logout)",
+    description=(
+        "Revokes the bearer token of the request before it expires. Every worker rejects it "
+        "within a few seconds; the worker handling this call does so immediately."
+    ),
+    responses={
+        204: {"description": "Token revoked"},
+        400: {"description": "Token has no jti and can not be revoked"},
+        401: {"description": "Invalid, expired or already revoked token"},
+        500: {"description": "Internal server error"},
+    },
+)
+def revoke(claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)) -> Response:
+    """
+    Revoke the access token used to call this endpoint.
+    """
+    if "jti" not in claims:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token can not be revoked")
+
+    try:
+        login_service.revoke_token(db, claims["jti"], claims["exp"])
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    audit_log.record(claims["sub"], "login.revoke", status_code=status.HTTP_204_NO_CONTENT)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
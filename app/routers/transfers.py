@@ -1,16 +1,28 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from app.services import accounts as accounts_service
+from app.services import scheduled_transfers as scheduled_service
 from app.services import transfers as transfer_service
+from app.audit import AuditEntry, audit
 from app.authentication.oauth import get_current_user
+from app.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.database import get_db
-from app.exceptions import (AccountNotFoundError, InsufficientFundsError,
-                            SameAccountError)
-from app.models.transfers import Transfer, TransferInput, TransferOutput
+from app.etags import account_etag, etag_matches, not_modified
+from app.memory import track_memory
+from app.money import to_decimal, to_minor
+from app.negotiation import MsgPackResponse, MsgPackRoute, epoch, wants_msgpack
+from app.exceptions import (AccountNotFoundError, CrossShardTransferAbortedError, InsufficientFundsError,
+                            SameAccountError, ScheduledTransferNotFoundError,
+                            VelocityLimitExceededError)
+from app.models.scheduled_transfers import (ScheduledTransferInput, ScheduledTransferOutput,
+                                            ScheduledTransferRunOutput, ScheduledTransferRunsPage)
+from app.models.transfers import (StatementEntry, StatementPage, Transfer, TransferInput,
+                                  TransferOutput)
 
-router = APIRouter()
+router = APIRouter(route_class=MsgPackRoute)
 
 
 @router.post(
@@ -18,13 +30,18 @@ router = APIRouter()
     status_code=status.HTTP_201_CREATED,
     response_model=TransferOutput,
     summary="Transfer funds between accounts",
-    description="Moves the specified amount from one account to another. Authentication required.",
+    description=(
+        "Moves the specified amount from one account to another. Accepts JSON or MessagePack "
+        "(`Content-Type: application/msgpack`, integer amounts in minor units). Authentication required."
+    ),
     responses={
         201: {"Description ": "Successful response"},
         400: {
             "Description ": "Can not transfer to the same account or insufficient funds"
         },
         404: {"Description ": "Account not found"},
+        409: {"Description ": "Cross-shard transfer aborted by recovery, nothing was moved"},
+        429: {"Description ": "Source account is over a velocity limit"},
         500: {"Description ": "Internal server error"},
     },
 )
@@ -32,15 +49,17 @@ def transfer_funds(
     transfer: TransferInput,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
+    audit_entry: AuditEntry = Depends(audit("transfer.create")),
 ) -> TransferOutput:
     """
     Transfer funds between accounts.
     """
+    audit_entry.resource = f"{transfer.from_account_number}->{transfer.to_account_number}"
     try:
         from_acc = transfer.from_account_number
         to_acc = transfer.to_account_number
         record = transfer_service.perform_transfer(
-            db, from_acc, to_acc, transfer.amount
+            db, from_acc, to_acc, to_minor(transfer.amount)
         )
     except SameAccountError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -48,13 +67,17 @@ def transfer_funds(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except AccountNotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except VelocityLimitExceededError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    except CrossShardTransferAbortedError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except SQLAlchemyError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error : {e}")
 
     return TransferOutput(
         from_account_number=from_acc,
         to_account_number=to_acc,
-        amount=record.amount,
+        amount=to_decimal(record.amount),
         timestamp=record.timestamp,
     )
 
@@ -62,27 +85,301 @@ def transfer_funds(
 @router.get(
     "/{account_number}/transfer_history",
     response_model=List[TransferOutput],
+    dependencies=[Depends(track_memory)],
     summary="Get account transfer history",
-    description="Returns all transfers to and from the given account, most recent first. Authentication required.",
+    description=(
+        "Returns all transfers to and from the given account, most recent first, with an ETag; "
+        "a matching If-None-Match is answered with 304. Send `Accept: application/msgpack` for "
+        "MessagePack with amounts in minor units and epoch timestamps. Authentication required."
+    ),
     responses={
         200: {"Description ": "Successful response"},
+        304: {"Description ": "History unchanged since the given ETag"},
         404: {"Description ": "Account not found error"},
         500: {"Description ": "Internal server error"},
     }
 )
 def get_transfer_history(
     account_number: int,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    accept: str | None = Header(None),
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
-) -> list[Transfer]:
+    audit_entry: AuditEntry = Depends(audit("transfer.history")),
+) -> list[TransferOutput]:
     """
     Get the transfer history of an account.
     """
+    msgpack = wants_msgpack(accept)
     try:
-        history = transfer_service.get_transfer_history_for_account(db, account_number)
+        if if_none_match:
+            version = accounts_service.get_account_version(db, account_number)
+            if version is not None:
+                etag = account_etag("history", account_number, version, msgpack)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+
+        history = transfer_service.read_transfer_history(db, account_number)
     except AccountNotFoundError as e:
         raise HTTPException(status_code=status. HTTP_404_NOT_FOUND, detail=str(e))
     except SQLAlchemyError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
 
-    return history
+    headers = {"Vary": "Accept"}
+    if history.version is not None:
+        headers["ETag"] = account_etag("history", account_number, history.version, msgpack)
+    if msgpack:
+        return MsgPackResponse(
+            [
+                {
+                    "from_account_number": t.from_account_number,
+                    "to_account_number": t.to_account_number,
+                    "amount": t.amount,
+                    "timestamp": epoch(t.timestamp),
+                }
+                for t in history.transfers
+            ],
+            headers=headers,
+        )
+
+    response.headers.update(headers)
+    return [
+        TransferOutput(
+            from_account_number=t.from_account_number,
+            to_account_number=t.to_account_number,
+            amount=to_decimal(t.amount),
+            timestamp=t.timestamp,
+        )
+        for t in history.transfers
+    ]
+
+
+@router.get(
+    "/{account_number}/statement",
+    response_model=StatementPage,
+    dependencies=[Depends(track_memory)],
+    summary="Get account statement",
+    description=(
+        "Returns the account's transfers newest first, each with its signed amount and the "
+        "balance after it, computed by the database. Pass `next_before` back as `before` for "
+        "the next page. Authentication required."
+    ),
+    responses={
+        200: {
+            "description": "Statement retrieved successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "account_number": 1234,
+                        "entries": [
+                            {
+                                "id": 42,
+                                "from_account_number": 1234,
+                                "to_account_number": 5678,
+                                "amount": "30.00",
+                                "signed_amount": "-30.00",
+                                "balance_after": "70.00",
+                                "timestamp": "2025-01-01T12:00:00",
+                            }
+                        ],
+                        "next_before": None,
+                    }
+                }
+            },
+        },
+        404: {"description": "Account not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+def get_statement(
+    account_number: int,
+    before: Optional[int] = Query(None, description="Last transfer id of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    audit_entry: AuditEntry = Depends(audit("transfer.statement")),
+) -> StatementPage:
+    """
+    Get a page of an account's running-balance statement.
+    """
+    try:
+        rows = transfer_service.get_statement(db, account_number, before, limit)
+    except AccountNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    return StatementPage(
+        account_number=account_number,
+        entries=[
+            StatementEntry(
+                id=row.id,
+                from_account_number=row.from_account_number,
+                to_account_number=row.to_account_number,
+                amount=to_decimal(row.amount),
+                signed_amount=to_decimal(row.signed_amount),
+                balance_after=to_decimal(row.balance_after),
+                timestamp=row.timestamp,
+            )
+            for row in rows
+        ],
+        next_before=rows[-1].id if len(rows) == limit else None,
+    )
+
+
+@router.post(
+    "/scheduled",
+    status_code=status.HTTP_201_CREATED,
+    response_model=ScheduledTransferOutput,
+    summary="Schedule a one-off or recurring transfer",
+    description=(
+        "Creates a standing order executed by the in-process scheduler from `first_run_at` on, "
+        "once or every day, week or month. Authentication required."
+    ),
+    responses={
+        201: {"description": "Transfer scheduled"},
+        400: {"description": "Can not transfer to the same account"},
+        404: {"description": "Account not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+def schedule_transfer(
+    transfer: ScheduledTransferInput,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    audit_entry: AuditEntry = Depends(audit("scheduled_transfer.create")),
+) -> ScheduledTransferOutput:
+    """
+    Schedule a transfer.
+    """
+    audit_entry.resource = f"{transfer.from_account_number}->{transfer.to_account_number}"
+    try:
+        schedule = scheduled_service.create_scheduled_transfer(
+            db,
+            transfer.from_account_number,
+            transfer.to_account_number,
+            to_minor(transfer.amount),
+            transfer.frequency,
+            transfer.first_run_at,
+        )
+    except SameAccountError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except AccountNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    return _schedule_output(schedule)
+
+
+@router.get(
+    "/{account_number}/scheduled",
+    response_model=List[ScheduledTransferOutput],
+    summary="List an account's scheduled transfers",
+    responses={
+        200: {"description": "Scheduled transfers retrieved successfully"},
+        404: {"description": "Account not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+def list_scheduled_transfers(
+    account_number: int,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+) -> list[ScheduledTransferOutput]:
+    """
+    List the scheduled transfers debiting an account.
+    """
+    try:
+        schedules = scheduled_service.list_scheduled_transfers(db, account_number)
+    except AccountNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    return [_schedule_output(schedule) for schedule in schedules]
+
+
+@router.get(
+    "/{account_number}/scheduled/{schedule_id}/runs",
+    response_model=ScheduledTransferRunsPage,
+    summary="Get the outcomes of a scheduled transfer",
+    responses={
+        200: {"description": "Runs retrieved successfully"},
+        404: {"description": "Scheduled transfer not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+def get_scheduled_transfer_runs(
+    account_number: int,
+    schedule_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+) -> ScheduledTransferRunsPage:
+    """
+    Get a scheduled transfer with its most recent runs.
+    """
+    try:
+        schedule, runs = scheduled_service.get_scheduled_transfer_runs(db, account_number, schedule_id, limit)
+    except ScheduledTransferNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    return ScheduledTransferRunsPage(
+        scheduled_transfer=_schedule_output(schedule),
+        runs=[
+            ScheduledTransferRunOutput(
+                scheduled_for=run.scheduled_for,
+                executed_at=run.executed_at,
+                status=run.status,
+                transfer_id=run.transfer_id,
+                error=run.error,
+            )
+            for run in runs
+        ],
+    )
+
+
+@router.delete(
+    "/{account_number}/scheduled/{schedule_id}",
+    response_model=ScheduledTransferOutput,
+    summary="Cancel a scheduled transfer",
+    responses={
+        200: {"description": "Scheduled transfer cancelled"},
+        404: {"description": "Scheduled transfer not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+def cancel_scheduled_transfer(
+    account_number: int,
+    schedule_id: int,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    audit_entry: AuditEntry = Depends(audit("scheduled_transfer.cancel")),
+) -> ScheduledTransferOutput:
+    """
+    Cancel a scheduled transfer; its past runs are kept.
+    """
+    try:
+        schedule = scheduled_service.cancel_scheduled_transfer(db, account_number, schedule_id)
+    except ScheduledTransferNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    return _schedule_output(schedule)
+
+
+def _schedule_output(schedule) -> ScheduledTransferOutput:
+    return ScheduledTransferOutput(
+        id=schedule.id,
+        from_account_number=schedule.from_account_number,
+        to_account_number=schedule.to_account_number,
+        amount=to_decimal(schedule.amount),
+        frequency=schedule.frequency,
+        first_run_at=schedule.first_run_at,
+        next_run_at=schedule.next_run_at,
+    )
@@ -1,16 +1,39 @@
-from decimal import Decimal
+from dataclasses import dataclass
 from pydantic import Field
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.account_index import account_index
 from app.exceptions import AccountNotFoundError
 from app.models.accounts import Account, Customer, CustomerInput
+from app.models.sharding import AccountNumberTicket, CustomerIdTicket
+from app.services import outbox as outbox_service
+from app.sharding import get_shard_router
+from app.singleflight import SingleFlight
+
+
+account_reads = SingleFlight("accounts")
+
+
+@dataclass(frozen=True)
+class AccountSnapshot:
+    """
+    Immutable copy of an account row, safe to share between requests.
+    """
+
+    account_number: int
+    balance: int
+    customer_id: int
+    version: int
 
 
 def create_customer(db: Session, customer_data: CustomerInput) -> Customer:
     """
     Retrieve an existing customer by email if exists or create a new one.
 
+    On a sharded session the customer id is allocated on the shard chosen by the
+    email, so later lookups by either key reach the same database.
+
     Args:
         db (Session): SQLAlchemy database session.
         customer_data: An object with `.name` and `.email` attributes
@@ -27,6 +50,11 @@ def create_customer(db: Session, customer_data: CustomerInput) -> Customer:
         )
         if not cust:
             cust = Customer(name=customer_data.name, email=customer_data.email)
+            router = get_shard_router(db)
+            if router is not None:
+                cust.customer_id = router.allocate_id(
+                    CustomerIdTicket, router.shard_for_email(customer_data.email)
+                )
             db.add(cust)
             db.commit()
             db.refresh(cust)
@@ -37,25 +65,38 @@ def create_customer(db: Session, customer_data: CustomerInput) -> Customer:
 
 
 def create_account_for_customer(
-    db: Session, customer: Customer, initial_deposit: Decimal = Field(..., gt=1)
+    db: Session, customer: Customer, initial_deposit: int = Field(..., gt=0)
 ) -> Account:
     """
     Create a new bank account for a given customer with an initial balance.
 
+    On a sharded session the account number is allocated on the customer's shard.
+    An "account.created" outbox event is committed together with the account.
+
     Args:
         db (Session): SQLAlchemy database session.
         customer (Customer): The Customer ORM instance to associate the new account with.
-        initial_deposit (Decimal): The starting balance for the account. Must be > 1.
+        initial_deposit (int): The starting balance in minor units. Must be > 0.
 
     Returns:
         Account: The newly created Account ORM instance, with generated
                  `account_number` and persisted `balance`.
     """
-    account = Account(customer_id=customer.customer_id, balance=initial_deposit)
+    account = Account(
+        customer_id=customer.customer_id, balance=initial_deposit, initial_deposit=initial_deposit
+    )
+    router = get_shard_router(db)
+    if router is not None:
+        account.account_number = router.allocate_id(
+            AccountNumberTicket, router.shard_for_customer(customer.customer_id)
+        )
 
     db.add(account)
+    db.flush()
+    outbox_service.record_account_created(db, account)
     db.commit()
     db.refresh(account)
+    account_index.add(account.account_number)
 
     return account
 
@@ -64,6 +105,8 @@ def get_account_by_number(db: Session, account_number: int) -> Account:
     """
     Look up an account by its account number.
 
+    Numbers the account index knows to be unused are rejected without a query.
+
     Args:
         db (Session): SQLAlchemy database session.
         account_number (int): The unique account number to search for.
@@ -74,6 +117,9 @@ def get_account_by_number(db: Session, account_number: int) -> Account:
     Raises:
         AccountNotFoundError: If no account with the given number exists.
     """
+    if not account_index.might_exist(account_number):
+        raise AccountNotFoundError(account_number)
+
     account = (
         db.query(Account).filter(Account.account_number == account_number).one_or_none()
     )
@@ -82,3 +128,86 @@ def get_account_by_number(db: Session, account_number: int) -> Account:
         raise AccountNotFoundError(account_number)
 
     return account
+
+
+def get_account_version(db: Session, account_number: int) -> int | None:
+    """
+    Look up only the version counter of an account, for conditional requests.
+
+    Args:
+        db (Session): SQLAlchemy database session.
+        account_number (int): The account number to look up.
+
+    Returns:
+        int | None: The account's version, or None if it does not exist.
+    """
+    if not account_index.might_exist(account_number):
+        return None
+
+    return (
+        db.query(Account.version).filter(Account.account_number == account_number).scalar()
+    )
+
+
+def bump_version(account: Account) -> None:
+    """
+    Mark a change to the account's balance or transfer history.
+
+    The increment is applied by the database on flush, so concurrent writers
+    never hand out the same version twice.
+
+    Args:
+        account (Account): The account being modified in the current transaction.
+    """
+    account.version = Account.version + 1
+
+
+def read_account(db: Session, account_number: int) -> AccountSnapshot:
+    """
+    Read-only lookup of an account, coalesced with identical concurrent lookups.
+
+    Callers that arrive while the same account is being read wait for that
+    query instead of sending their own. Use `get_account_by_number` when the
+    account is going to be modified.
+
+    Args:
+        db (Session): SQLAlchemy database session.
+        account_number (int): The unique account number to search for.
+
+    Returns:
+        AccountSnapshot: The account's current values.
+
+    Raises:
+        AccountNotFoundError: If no account with the given number exists.
+    """
+
+    if not account_index.might_exist(account_number):
+        raise AccountNotFoundError(account_number)
+
+    def load() -> AccountSnapshot:
+        account = get_account_by_number(db, account_number)
+        return AccountSnapshot(
+            account.account_number, account.balance, account.customer_id, account.version
+        )
+
+    return account_reads.do(account_number, load)
+
+
+def get_balances(db: Session, account_numbers: list[int]) -> dict[int, int]:
+    """
+    Look up the balances of many accounts with a single `IN` query.
+
+    Args:
+        db (Session): SQLAlchemy database session.
+        account_numbers (list[int]): Account numbers to look up; duplicates allowed.
+
+    Returns:
+        dict[int, int]: Balance in minor units by account number, for the accounts that exist.
+    """
+    rows = (
+        db.query(Account.account_number, Account.balance)
+        .filter(Account.account_number.in_(set(account_numbers)))
+        .all()
+    )
+
+    return {account_number: balance for account_number, balance in rows}
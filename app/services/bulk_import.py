@@ -0,0 +1,350 @@
+import csv
+import io
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Iterator, TextIO
+
+from pydantic import ValidationError
+from sqlalchemy import Table, func, insert, select, text, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+
+from app.account_index import AccountIndex
+from app.config import BULK_IMPORT_CHUNK_SIZE, TIMEZONE
+from app.models.accounts import Account, Customer, CustomerInput
+from app.models.imports import ImportCheckpoint
+from app.models.transfers import Transfer, TransferInput
+from app.money import to_minor
+
+ACCOUNTS = "accounts"
+TRANSFERS = "transfers"
+
+# Emails looked up per query; SQLite caps the number of bound parameters.
+LOOKUP_BATCH_SIZE = 10_000
+# Tables whose secondary indexes are dropped while loading and built once at the end.
+DEFERRED_INDEX_TABLES: tuple[Table, ...] = (Account.__table__, Transfer.__table__)
+
+
+@dataclass
+class ImportProgress:
+    """
+    Counters of one input file; `rows` includes rows skipped on resume.
+    """
+
+    kind: str
+    rows: int = 0
+    loaded: int = 0
+    rejected: int = 0
+    resumed_at: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return (self.rows - self.resumed_at) / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "rows": self.rows,
+            "loaded": self.loaded,
+            "rejected": self.rejected,
+            "resumed_at": self.resumed_at,
+            "rows_per_second": round(self.rows_per_second),
+        }
+
+
+def read_rows(path: str) -> Iterator[dict]:
+    """
+    Stream the rows of a CSV file with a header line, or of a JSON lines file.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def validate_account(row: dict, accounts: AccountIndex) -> dict:
+    """
+    Check an account row with the rules of `CustomerInput`, plus its legacy
+    account number, which must not be in `accounts` yet; it is added there.
+
+    Returns:
+        dict: account_number, name, email and initial_deposit in minor units.
+
+    Raises:
+        ValueError: If the row is invalid (pydantic's ValidationError included).
+    """
+    customer = CustomerInput(name=row.get("name"), email=row.get("email"), initial_deposit=row.get("initial_deposit"))
+    account_number = int(row.get("account_number") or 0)
+    if account_number <= 0:
+        raise ValueError("account_number must be a positive integer")
+    if account_number in accounts:
+        raise ValueError(f"Account {account_number} already exists")
+    accounts.add(account_number)
+
+    return {
+        "account_number": account_number,
+        "name": customer.name,
+        "email": customer.email,
+        "initial_deposit": to_minor(customer.initial_deposit),
+    }
+
+
+def validate_transfer(row: dict, accounts: AccountIndex) -> dict:
+    """
+    Check a transfer row with the rules of `TransferInput`; both accounts must
+    exist and differ. Balances are not checked, the history is taken as it was.
+
+    Returns:
+        dict: from_account_number, to_account_number, amount in minor units and
+        timestamp (naive, in the bank's timezone).
+
+    Raises:
+        ValueError: If the row is invalid (pydantic's ValidationError included).
+    """
+    transfer = TransferInput(
+        from_account_number=row.get("from_account_number"),
+        to_account_number=row.get("to_account_number"),
+        amount=row.get("amount"),
+    )
+    for account_number in (transfer.from_account_number, transfer.to_account_number):
+        if account_number not in accounts:
+            raise ValueError(f"Account {account_number} not found")
+    if transfer.from_account_number == transfer.to_account_number:
+        raise ValueError(f"Can not transfer to the same account : {transfer.from_account_number}")
+
+    timestamp = datetime.fromisoformat(str(row.get("timestamp")))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(TIMEZONE).replace(tzinfo=None)
+
+    return {
+        "from_account_number": transfer.from_account_number,
+        "to_account_number": transfer.to_account_number,
+        "amount": to_minor(transfer.amount),
+        "timestamp": timestamp,
+    }
+
+
+def drop_deferred_indexes(engine: Engine) -> None:
+    with engine.begin() as conn:
+        for table in DEFERRED_INDEX_TABLES:
+            for index in table.indexes:
+                index.drop(conn, checkfirst=True)
+
+
+def create_deferred_indexes(engine: Engine) -> None:
+    with engine.begin() as conn:
+        for table in DEFERRED_INDEX_TABLES:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def load_file(
+    engine: Engine,
+    name: str,
+    kind: str,
+    path: str,
+    chunk_size: int = BULK_IMPORT_CHUNK_SIZE,
+    rejects: TextIO | None = None,
+    report: Callable[[ImportProgress], None] | None = None,
+) -> ImportProgress:
+    """
+    Load an accounts or transfers file in chunks, resuming after the last committed chunk.
+
+    Every chunk is written with COPY on PostgreSQL (psycopg2) and with one
+    executemany INSERT elsewhere, in the same transaction as the checkpoint.
+    Rows failing validation are skipped and, after their chunk commits,
+    written to `rejects` as JSON lines with their row number and error.
+
+    Args:
+        engine (Engine): The database to load.
+        name (str): The import's name; with `kind` it keys the checkpoint.
+        kind (str): ACCOUNTS or TRANSFERS.
+        path (str): CSV or JSON lines file.
+        chunk_size (int): Input rows per transaction.
+        rejects (TextIO | None): Where to report invalid rows.
+        report (Callable | None): Called with the progress after every chunk.
+
+    Returns:
+        ImportProgress: The final counters.
+    """
+    checkpoint_name = f"{name}:{kind}"
+    with engine.connect() as conn:
+        checkpoint = conn.execute(
+            select(ImportCheckpoint.rows, ImportCheckpoint.loaded, ImportCheckpoint.rejected).where(
+                ImportCheckpoint.name == checkpoint_name
+            )
+        ).one_or_none()
+    progress = ImportProgress(kind)
+    if checkpoint is not None:
+        progress.rows, progress.loaded, progress.rejected = checkpoint
+        progress.resumed_at = progress.rows
+
+    # Every account number in the database plus those loaded by this run.
+    accounts = AccountIndex(margin=0)
+    accounts.sync([engine])
+    if kind == ACCOUNTS:
+        validate, write = (lambda row: validate_account(row, accounts)), _write_accounts
+    else:
+        validate, write = (lambda row: validate_transfer(row, accounts)), _write_transfers
+
+    rows = read_rows(path)
+    for _ in range(progress.resumed_at):
+        next(rows, None)
+
+    chunk: list[dict] = []
+    failed: list[dict] = []
+    for row in rows:
+        progress.rows += 1
+        try:
+            chunk.append(validate(row))
+        except (ValueError, TypeError) as e:
+            failed.append({"row": progress.rows, "error": _describe(e), "data": row})
+        if len(chunk) + len(failed) >= chunk_size:
+            _commit_chunk(engine, checkpoint_name, write, chunk, failed, progress, rejects, report)
+            chunk, failed = [], []
+    if chunk or failed or checkpoint is None:
+        _commit_chunk(engine, checkpoint_name, write, chunk, failed, progress, rejects, report)
+
+    return progress
+
+
+def recompute_balances(engine: Engine) -> int:
+    """
+    Set every account with transfers to its initial deposit plus received minus
+    sent, in one set-based UPDATE; accounts without transfers keep their deposit.
+
+    Returns:
+        int: The number of accounts updated.
+    """
+    legs = union_all(
+        select(Transfer.to_account_number.label("account_number"), Transfer.amount.label("amount")),
+        select(Transfer.from_account_number, -Transfer.amount),
+    ).subquery()
+    net = (
+        select(legs.c.account_number, func.sum(legs.c.amount).label("net"))
+        .group_by(legs.c.account_number)
+        .subquery()
+    )
+    statement = (
+        update(Account)
+        .where(Account.account_number == net.c.account_number)
+        .values(balance=Account.initial_deposit + net.c.net, version=Account.version + 1)
+    )
+    with engine.begin() as conn:
+        return conn.execute(statement).rowcount
+
+
+def reset_sequences(engine: Engine) -> None:
+    """
+    Move PostgreSQL id sequences past the imported ids, so the API keeps allocating new ones.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    with engine.begin() as conn:
+        for table, column in (("customers", "customer_id"), ("accounts", "account_number"), ("transfers", "id")):
+            conn.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                    f"(SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}), false)"
+                )
+            )
+
+
+def _commit_chunk(
+    engine: Engine,
+    checkpoint_name: str,
+    write: Callable[[Connection, list[dict]], None],
+    chunk: list[dict],
+    failed: list[dict],
+    progress: ImportProgress,
+    rejects: TextIO | None,
+    report: Callable[[ImportProgress], None] | None,
+) -> None:
+    with engine.begin() as conn:
+        if chunk:
+            write(conn, chunk)
+        values = {
+            "name": checkpoint_name,
+            "rows": progress.rows,
+            "loaded": progress.loaded + len(chunk),
+            "rejected": progress.rejected + len(failed),
+            "updated_at": datetime.now(TIMEZONE).replace(tzinfo=None),
+        }
+        conn.execute(
+            _insert(conn, ImportCheckpoint.__table__).values(values).on_conflict_do_update(
+                index_elements=["name"], set_={k: v for k, v in values.items() if k != "name"}
+            )
+        )
+
+    progress.loaded += len(chunk)
+    progress.rejected += len(failed)
+    if rejects is not None:
+        for reject in failed:
+            rejects.write(json.dumps(reject, default=str) + "\n")
+    if report is not None:
+        report(progress)
+
+
+def _write_accounts(conn: Connection, rows: list[dict]) -> None:
+    customers = {row["email"]: {"name": row["name"], "email": row["email"]} for row in rows}
+    conn.execute(
+        _insert(conn, Customer.__table__).on_conflict_do_nothing(index_elements=["email"]), list(customers.values())
+    )
+    emails = list(customers)
+    customer_ids = {}
+    for start in range(0, len(emails), LOOKUP_BATCH_SIZE):
+        batch = emails[start:start + LOOKUP_BATCH_SIZE]
+        customer_ids.update(
+            conn.execute(select(Customer.email, Customer.customer_id).where(Customer.email.in_(batch))).all()
+        )
+    _bulk_insert(
+        conn,
+        Account.__table__,
+        ("account_number", "customer_id", "balance", "initial_deposit"),
+        [
+            (row["account_number"], customer_ids[row["email"]], row["initial_deposit"], row["initial_deposit"])
+            for row in rows
+        ],
+    )
+
+
+def _write_transfers(conn: Connection, rows: list[dict]) -> None:
+    _bulk_insert(
+        conn,
+        Transfer.__table__,
+        ("from_account_number", "to_account_number", "amount", "timestamp"),
+        [(row["from_account_number"], row["to_account_number"], row["amount"], row["timestamp"]) for row in rows],
+    )
+
+
+def _bulk_insert(conn: Connection, table: Table, columns: tuple[str, ...], rows: list[tuple]) -> None:
+    if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        return
+
+    conn.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+
+def _insert(conn: Connection, table: Table):
+    # The dialect's INSERT, which supports ON CONFLICT.
+    dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+
+    return str(error)
@@ -0,0 +1,322 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+from sqlalchemy.orm import Session
+
+from app.config import CROSS_SHARD_RECOVERY_GRACE_SECONDS, TIMEZONE
+from app.exceptions import AccountNotFoundError, CrossShardTransferAbortedError, InsufficientFundsError
+from app.models.accounts import Account
+from app.models.sharding import (ABORTED, COMMITTED, COMPLETED, PREPARED, PREPARING,
+                                 PreparedLeg, ShardTransaction)
+from app.models.transfers import Transfer
+from app.pubsub import balance_broker
+from app.services import accounts as accounts_service
+from app.services import outbox as outbox_service
+from app.sharding import ShardRouter
+
+
+def perform_cross_shard_transfer(
+    router: ShardRouter, from_acc: int, to_acc: int, amount: int, txid: str | None = None
+) -> Transfer:
+    """
+    Move funds between accounts on different shards with a two-phase commit.
+
+    The shard of the debited account coordinates. Its ShardTransaction row is
+    written first, then each shard prepares a durable PreparedLeg (the debit
+    leg also reserves the funds), then the coordinator records the decision and
+    each shard applies its leg in a local transaction. Anything interrupted is
+    finished or undone by `recover_cross_shard_transfers` using the decision.
+
+    Args:
+        router (ShardRouter): Router holding the shard engines.
+        from_acc (int): Account number to debit.
+        to_acc (int): Account number to credit, on another shard.
+        amount (int): Amount to transfer in minor units; must be greater than zero.
+        txid (str | None): Id of the distributed transaction; a random one by
+            default. A caller retrying an operation passes the same id, so the
+            transfer starts at most once.
+
+    Returns:
+        Transfer: The transfer row stored on the debited account's shard.
+
+    Raises:
+        AccountNotFoundError: If either account does not exist.
+        InsufficientFundsError: If the source account's balance is less than the amount.
+        CrossShardTransferAbortedError: If recovery presumed the transfer
+            abandoned and aborted it before it was decided.
+        IntegrityError: If a transaction with this `txid` was already started.
+    """
+    coordinator = router.shard_for_account(from_acc)
+    now = datetime.now(TIMEZONE)
+    tx = ShardTransaction(
+        txid=txid or uuid4().hex,
+        from_account_number=from_acc,
+        to_account_number=to_acc,
+        amount=amount,
+        timestamp=now,
+        state=PREPARING,
+        created_at=now,
+    )
+    with router.session_for_shard(coordinator) as session:
+        session.add(tx)
+        session.commit()
+        session.refresh(tx)
+        session.expunge(tx)
+
+    try:
+        _prepare_leg(router, tx, coordinator, from_acc)
+        _prepare_leg(router, tx, coordinator, to_acc)
+    except Exception:
+        if _decide(router, coordinator, tx.txid, ABORTED):
+            _finish_legs(router, tx)
+        raise
+
+    if not _decide(router, coordinator, tx.txid, COMMITTED):
+        # Recovery presumed this transaction aborted while it was preparing.
+        _finish_legs(router, tx)
+        raise CrossShardTransferAbortedError(tx.txid)
+
+    transfer = _finish_legs(router, tx)
+    _decide(router, coordinator, tx.txid, COMPLETED, expected=COMMITTED)
+
+    return transfer
+
+
+def get_cross_shard_outcome(router: ShardRouter, from_acc: int, txid: str) -> tuple[str | None, int | None]:
+    """
+    Look up how a cross-shard transfer ended.
+
+    Args:
+        router (ShardRouter): Router holding the shard engines.
+        from_acc (int): The debited account, whose shard coordinated the transfer.
+        txid (str): Id of the distributed transaction.
+
+    Returns:
+        tuple[str | None, int | None]: The coordinator's state (None if the
+        transaction never started) and, once completed, the id of the transfer
+        row on the debited account's shard.
+    """
+    with router.session_for_shard(router.shard_for_account(from_acc)) as session:
+        tx = session.get(ShardTransaction, txid)
+        if tx is None or tx.state != COMPLETED:
+            return (tx.state if tx else None), None
+
+        transfer_id = (
+            session.query(Transfer.id)
+            .filter(
+                Transfer.from_account_number == tx.from_account_number,
+                Transfer.to_account_number == tx.to_account_number,
+                Transfer.amount == tx.amount,
+                Transfer.timestamp == tx.timestamp,
+            )
+            .limit(1)
+            .scalar()
+        )
+
+    return COMPLETED, transfer_id
+
+
+def recover_cross_shard_transfers(
+    router: ShardRouter, grace_seconds: int = CROSS_SHARD_RECOVERY_GRACE_SECONDS
+) -> int:
+    """
+    Finish or undo cross-shard transfers interrupted by a crash.
+
+    Safe to run while transfers are in flight: legs whose transaction is still
+    undecided and within the grace period are left alone. The transfer
+    scheduler runs it every CROSS_SHARD_RECOVERY_INTERVAL_SECONDS when sharded.
+
+    Undecided transactions older than the grace period are presumed aborted.
+    Every prepared leg is then committed or rolled back according to its
+    coordinator's decision, and committed transactions are marked completed.
+
+    Args:
+        router (ShardRouter): Router holding the shard engines.
+        grace_seconds (int): Age after which an undecided transaction is
+            considered abandoned rather than in flight.
+
+    Returns:
+        int: The number of transactions that were finished or aborted.
+    """
+    cutoff = datetime.now(TIMEZONE) - timedelta(seconds=grace_seconds)
+    recovered = set()
+
+    for shard_id in range(router.shard_count):
+        with router.session_for_shard(shard_id) as session:
+            stale = [
+                txid
+                for (txid,) in session.query(ShardTransaction.txid)
+                .filter(ShardTransaction.state == PREPARING)
+                .filter(ShardTransaction.created_at <= cutoff)
+                .all()
+            ]
+        for txid in stale:
+            if _decide(router, shard_id, txid, ABORTED):
+                recovered.add(txid)
+
+    for shard_id in range(router.shard_count):
+        with router.session_for_shard(shard_id) as session:
+            legs = session.query(PreparedLeg).filter(PreparedLeg.state == PREPARED).all()
+            session.expunge_all()
+        for leg in legs:
+            decision = _decision(router, leg.coordinator_shard, leg.txid)
+            if decision in (COMMITTED, COMPLETED):
+                _commit_leg(router, shard_id, leg.txid, leg.account_number)
+                recovered.add(leg.txid)
+            elif decision in (ABORTED, None):
+                _abort_leg(router, shard_id, leg.txid, leg.account_number)
+                recovered.add(leg.txid)
+
+    for shard_id in range(router.shard_count):
+        with router.session_for_shard(shard_id) as session:
+            committed = (
+                session.query(ShardTransaction)
+                .filter(ShardTransaction.state == COMMITTED)
+                .all()
+            )
+            for tx in committed:
+                tx.state = COMPLETED
+                recovered.add(tx.txid)
+            session.commit()
+
+    return len(recovered)
+
+
+def _prepare_leg(router: ShardRouter, tx: ShardTransaction, coordinator: int, account_number: int) -> None:
+    """
+    Durably vote yes for one shard, reserving the funds on the debit side.
+    """
+    shard_id = router.shard_for_account(account_number)
+    with router.session_for_shard(shard_id) as session:
+        account = _lock_account(session, account_number)
+        if account_number == tx.from_account_number:
+            if account.balance < tx.amount:
+                raise InsufficientFundsError(account.balance, tx.amount)
+            account.balance -= tx.amount
+            accounts_service.bump_version(account)
+
+        session.add(
+            PreparedLeg(
+                txid=tx.txid,
+                account_number=account_number,
+                coordinator_shard=coordinator,
+                from_account_number=tx.from_account_number,
+                to_account_number=tx.to_account_number,
+                amount=tx.amount,
+                timestamp=tx.timestamp,
+                state=PREPARED,
+            )
+        )
+        session.commit()
+
+
+def _decide(router: ShardRouter, coordinator: int, txid: str, state: str, expected: str = PREPARING) -> bool:
+    """
+    Move the coordinator row from `expected` to `state`; False if it had already moved.
+    """
+    with router.session_for_shard(coordinator) as session:
+        updated = (
+            session.query(ShardTransaction)
+            .filter(ShardTransaction.txid == txid, ShardTransaction.state == expected)
+            .update({ShardTransaction.state: state}, synchronize_session=False)
+        )
+        session.commit()
+
+    return updated == 1
+
+
+def _decision(router: ShardRouter, coordinator: int, txid: str) -> str | None:
+    with router.session_for_shard(coordinator) as session:
+        return (
+            session.query(ShardTransaction.state)
+            .filter(ShardTransaction.txid == txid)
+            .scalar()
+        )
+
+
+def _finish_legs(router: ShardRouter, tx: ShardTransaction) -> Transfer | None:
+    """
+    Apply the coordinator's decision to both legs; return the debit-side transfer row.
+    """
+    decision = _decision(router, router.shard_for_account(tx.from_account_number), tx.txid)
+    transfer = None
+    for account_number in (tx.from_account_number, tx.to_account_number):
+        shard_id = router.shard_for_account(account_number)
+        if decision in (COMMITTED, COMPLETED):
+            record = _commit_leg(router, shard_id, tx.txid, account_number)
+            if account_number == tx.from_account_number:
+                transfer = record
+        else:
+            _abort_leg(router, shard_id, tx.txid, account_number)
+
+    return transfer
+
+
+def _commit_leg(router: ShardRouter, shard_id: int, txid: str, account_number: int) -> Transfer | None:
+    with router.session_for_shard(shard_id) as session:
+        leg = _lock_leg(session, txid, account_number)
+        if leg is None or leg.state != PREPARED:
+            return None
+
+        account = _lock_account(session, account_number)
+        if account_number == leg.to_account_number:
+            account.balance += leg.amount
+        balance = account.balance
+        # The transfer row joins this account's history on both sides.
+        accounts_service.bump_version(account)
+
+        transfer = Transfer(
+            from_account_number=leg.from_account_number,
+            to_account_number=leg.to_account_number,
+            amount=leg.amount,
+            timestamp=leg.timestamp,
+        )
+        session.add(transfer)
+        session.flush()
+        version = account.version
+        if account_number == leg.from_account_number:
+            outbox_service.record_transfer_completed(session, transfer)
+        leg.state = COMMITTED
+        session.commit()
+        session.refresh(transfer)
+        session.expunge(transfer)
+
+    balance_broker.publish(account_number, balance, version)
+
+    return transfer
+
+
+def _abort_leg(router: ShardRouter, shard_id: int, txid: str, account_number: int) -> None:
+    with router.session_for_shard(shard_id) as session:
+        leg = _lock_leg(session, txid, account_number)
+        if leg is None or leg.state != PREPARED:
+            return
+
+        if account_number == leg.from_account_number:
+            account = _lock_account(session, account_number)
+            account.balance += leg.amount
+            accounts_service.bump_version(account)
+
+        leg.state = ABORTED
+        session.commit()
+
+
+def _lock_account(session: Session, account_number: int) -> Account:
+    account = (
+        session.query(Account)
+        .filter(Account.account_number == account_number)
+        .with_for_update()
+        .one_or_none()
+    )
+    if not account:
+        raise AccountNotFoundError(account_number)
+
+    return account
+
+
+def _lock_leg(session: Session, txid: str, account_number: int) -> PreparedLeg | None:
+    return (
+        session.query(PreparedLeg)
+        .filter(PreparedLeg.txid == txid, PreparedLeg.account_number == account_number)
+        .with_for_update()
+        .one_or_none()
+    )
@@ -0,0 +1,70 @@
+from sqlalchemy.orm import Session, selectinload
+
+from app.config import DEFAULT_PAGE_SIZE
+from app.exceptions import CustomerNotFoundError
+from app.models.accounts import Account, Customer
+
+
+def get_customer_accounts(
+    db: Session, customer_id: int, after: int | None = None, limit: int = DEFAULT_PAGE_SIZE
+) -> tuple[Customer, list[Account]]:
+    """
+    Fetch a customer and one page of their accounts in two statements.
+
+    Args:
+        db (Session): SQLAlchemy database session.
+        customer_id (int): The customer whose accounts to list.
+        after (int | None): Only return account numbers greater than this one.
+        limit (int): Maximum number of accounts to return.
+
+    Returns:
+        tuple[Customer, list[Account]]: The customer and up to `limit` of their
+        accounts ordered by account number.
+
+    Raises:
+        CustomerNotFoundError: If no customer with the given id exists.
+    """
+    customer = (
+        db.query(Customer).filter(Customer.customer_id == customer_id).one_or_none()
+    )
+    if not customer:
+        raise CustomerNotFoundError(customer_id)
+
+    query = db.query(Account).filter(Account.customer_id == customer_id)
+    if after is not None:
+        query = query.filter(Account.account_number > after)
+
+    return customer, query.order_by(Account.account_number).limit(limit).all()
+
+
+def search_customers_by_email(
+    db: Session, email_prefix: str, after: str | None = None, limit: int = DEFAULT_PAGE_SIZE
+) -> list[Customer]:
+    """
+    Find customers whose email starts with a prefix, with their accounts.
+
+    Accounts are loaded with one batched `IN` query for the whole page, so a
+    page costs two statements however many customers it holds.
+
+    Args:
+        db (Session): SQLAlchemy database session.
+        email_prefix (str): Leading part of the email; a full email matches itself.
+        after (str | None): Only return emails sorting after this one.
+        limit (int): Maximum number of customers to return.
+
+    Returns:
+        list[Customer]: Up to `limit` customers ordered by email, with
+        `accounts` already loaded.
+    """
+    query = (
+        db.query(Customer)
+        .options(selectinload(Customer.accounts))
+        .filter(Customer.email.startswith(email_prefix, autoescape=True))
+    )
+    if after is not None:
+        query = query.filter(Customer.email > after)
+
+    customers = query.order_by(Customer.email).limit(limit).all()
+
+    # Several shards each return their own sorted page; merge them.
+    return sorted(customers, key=lambda customer: customer.email)[:limit]
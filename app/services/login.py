@@ -1,4 +1,12 @@
-from passlib.context import CryptContext
+import functools
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.authentication.revocation import revocations
+from app.config import TIMEZONE
+from app.models.login import RevokedToken
+from app.sharding import get_shard_router
 
 
 def verify_username(username_inp: str, username_correct : str) -> bool:
@@ -28,9 +36,7 @@ def hash_password(plain_password: str) -> str:
     Returns:
         str: The bcrypt-hashed password string, including salt.
     """
-    pwd_cxt = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-    return pwd_cxt.hash(plain_password)
+    return _password_context().hash(plain_password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -44,6 +50,40 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: True if the plaintext password matches the hash, False otherwise.
     """
-    pwd_cxt = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _password_context().verify(plain_password, hashed_password)
+
+
+@functools.cache
+def _password_context():
+    # passlib and bcrypt are only loaded by the first login, not at startup.
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def revoke_token(db: Session, jti: str, expires_at: int) -> None:
+    """
+    Record a token as revoked and add it to this worker's revocation filter.
+
+    Revocations live on the first shard; other workers pick them up on their
+    next filter sync. Revoking a token twice, even concurrently, is a no-op.
+
+    Args:
+        db (Session): Database session of the request.
+        jti (str): The token's "jti" claim.
+        expires_at (int): The token's "exp" claim, seconds since the epoch.
+    """
+    router = get_shard_router(db)
+    session = router.session_for_shard(0) if router is not None else db
+    try:
+        if session.get(RevokedToken, jti) is None:
+            session.add(RevokedToken(jti=jti, expires_at=expires_at, revoked_at=datetime.now(TIMEZONE)))
+            session.commit()
+    except IntegrityError:
+        # A concurrent logout with the same token stored it first.
+        session.rollback()
+    finally:
+        if session is not db:
+            session.close()
 
-    return pwd_cxt.verify(plain_password, hashed_password)
+    revocations.add(jti, expires_at)
@@ -0,0 +1,275 @@
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from typing import Callable, Protocol
+from sqlalchemy.orm import Session
+
+from app.config import (OUTBOX_BATCH_SIZE, OUTBOX_GAP_GRACE_SECONDS, OUTBOX_MAX_FAILURES,
+                        OUTBOX_RETRY_MAX_SECONDS, TIMEZONE)
+from app.models.outbox import OutboxEvent, OutboxOffset
+from app.money import to_decimal
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_CREATED = "account.created"
+TRANSFER_COMPLETED = "transfer.completed"
+
+
+def record_event(db: Session, event_type: str, account_number: int, payload: dict) -> OutboxEvent:
+    """
+    Add an event to the outbox as part of the caller's transaction.
+
+    Nothing is committed here; the event becomes visible to the relay exactly
+    when the caller's change commits.
+
+    Args:
+        db (Session): SQLAlchemy session holding the change being described.
+        event_type (str): The kind of event.
+        account_number (int): Account the event belongs to.
+        payload (dict): JSON-serialisable description of the change.
+
+    Returns:
+        OutboxEvent: The pending outbox row.
+    """
+    event = OutboxEvent(
+        event_type=event_type,
+        account_number=account_number,
+        payload=json.dumps(payload, default=str),
+        created_at=datetime.now(TIMEZONE),
+    )
+    db.add(event)
+
+    return event
+
+
+def record_account_created(db: Session, account) -> OutboxEvent:
+    return record_event(
+        db,
+        ACCOUNT_CREATED,
+        account.account_number,
+        {
+            "account_number": account.account_number,
+            "customer_id": account.customer_id,
+            "balance": str(to_decimal(account.balance)),
+        },
+    )
+
+
+def record_transfer_completed(db: Session, transfer) -> OutboxEvent:
+    return record_event(
+        db,
+        TRANSFER_COMPLETED,
+        transfer.from_account_number,
+        {
+            "transfer_id": transfer.id,
+            "from_account_number": transfer.from_account_number,
+            "to_account_number": transfer.to_account_number,
+            "amount": str(to_decimal(transfer.amount)),
+            "timestamp": transfer.timestamp.isoformat(),
+        },
+    )
+
+
+class Sink(Protocol):
+    def publish(self, events: list[dict]) -> None:
+        ...
+
+
+class QueueSink:
+    """
+    Hand events to an in-process queue, one item per event.
+    """
+
+    def __init__(self, target: queue.Queue | None = None):
+        self.queue = target if target is not None else queue.Queue()
+
+    def publish(self, events: list[dict]) -> None:
+        for event in events:
+            self.queue.put(event)
+
+
+class FileSink:
+    """
+    Append events to a JSON Lines file, flushed to disk before returning.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def publish(self, events: list[dict]) -> None:
+        with open(self.path, "a", encoding="utf-8") as fh:
+            for event in events:
+                fh.write(json.dumps(event) + "\n")
+            fh.flush()
+
+
+class HttpSink:
+    """
+    POST each batch as a JSON array; any non-2xx answer fails the batch.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def publish(self, events: list[dict]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(events).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def sink_from_url(target: str) -> Sink:
+    """
+    Build a sink from "file:<path>", "http://..." / "https://..." or "queue:".
+    """
+    if target.startswith(("http://", "https://")):
+        return HttpSink(target)
+    if target.startswith("file:"):
+        return FileSink(target[len("file:"):])
+    if target == "queue:":
+        return QueueSink()
+
+    raise ValueError(f"Unknown outbox sink : {target}")
+
+
+class OutboxRelay:
+    """
+    Publish outbox events in id order with at-least-once delivery.
+
+    Each call to `relay_once` reads the next batch after the stored offset,
+    hands it to the sink and only then advances the offset, so a crash between
+    the two replays the batch. Ids are allocated when a row is inserted, so a
+    gap may belong to a transaction that has not committed yet; the relay stops
+    in front of a gap until it has stayed open for `gap_grace_seconds`, after
+    which the missing ids are taken to be rolled back.
+
+    Attributes:
+        session_factory (Callable[[], Session]): Opens sessions on the database
+            holding the outbox.
+        sink (Sink): Where events are published.
+        name (str): Key of this relay's offset row.
+        batch_size (int): Maximum number of events per publish call.
+        gap_grace_seconds (float): How long a gap may block the relay.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        sink: Sink,
+        name: str = "default",
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        gap_grace_seconds: float = OUTBOX_GAP_GRACE_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.sink = sink
+        self.name = name
+        self.batch_size = batch_size
+        self.gap_grace_seconds = gap_grace_seconds
+        self._gap_seen: tuple[int, float] | None = None
+
+    def relay_once(self) -> int:
+        """
+        Publish the next batch of events.
+
+        Returns:
+            int: The number of events published.
+        """
+        with self.session_factory() as session:
+            offset = session.get(OutboxOffset, self.name)
+            if offset is None:
+                offset = OutboxOffset(relay=self.name, last_event_id=0)
+                session.add(offset)
+
+            rows = (
+                session.query(OutboxEvent)
+                .filter(OutboxEvent.id > offset.last_event_id)
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+                .all()
+            )
+            batch = self._contiguous(offset.last_event_id, rows)
+            if not batch:
+                session.rollback()
+                return 0
+
+            self.sink.publish([_as_message(row) for row in batch])
+
+            offset.last_event_id = batch[-1].id
+            offset.updated_at = datetime.now(TIMEZONE)
+            session.commit()
+
+        return len(batch)
+
+    def run(
+        self,
+        stop: threading.Event,
+        poll_interval: float = 1.0,
+        max_failures: int = OUTBOX_MAX_FAILURES,
+        retry_max_seconds: float = OUTBOX_RETRY_MAX_SECONDS,
+    ) -> None:
+        """
+        Relay until `stop` is set, sleeping only when there was nothing to send.
+
+        A failed batch, e.g. while the sink is unreachable, is logged and
+        retried after a backoff doubling from `poll_interval` up to
+        `retry_max_seconds`; the offset only moves after a publish, so nothing
+        is skipped.
+
+        Raises:
+            Exception: The last error, after `max_failures` failures in a row.
+        """
+        failures = 0
+        while not stop.is_set():
+            try:
+                sent = self.relay_once()
+            except Exception:
+                failures += 1
+                if failures >= max_failures:
+                    raise
+                delay = min(poll_interval * 2 ** failures, retry_max_seconds)
+                logger.exception(
+                    "Outbox relay %s failed %d times in a row, retrying in %.1fs", self.name, failures, delay
+                )
+                stop.wait(delay)
+                continue
+
+            failures = 0
+            if sent < self.batch_size:
+                stop.wait(poll_interval)
+
+    def _contiguous(self, last_id: int, rows: list[OutboxEvent]) -> list[OutboxEvent]:
+        batch = []
+        expected = last_id + 1
+        for row in rows:
+            if row.id != expected and not self._gap_expired(expected):
+                break
+            batch.append(row)
+            expected = row.id + 1
+
+        return batch
+
+    def _gap_expired(self, missing_id: int) -> bool:
+        now = time.monotonic()
+        if self._gap_seen is None or self._gap_seen[0] != missing_id:
+            self._gap_seen = (missing_id, now)
+
+        return now - self._gap_seen[1] >= self.gap_grace_seconds
+
+
+def _as_message(row: OutboxEvent) -> dict:
+    return {
+        "id": row.id,
+        "type": row.event_type,
+        "account_number": row.account_number,
+        "payload": json.loads(row.payload),
+        "created_at": row.created_at.isoformat(),
+    }
@@ -0,0 +1,278 @@
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from uuid import uuid4
+from sqlalchemy import and_, func, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import (RECONCILIATION_CHUNK_SIZE, RECONCILIATION_MAX_REPORTED_MISMATCHES,
+                        RECONCILIATION_WORKERS, TIMEZONE)
+from app.exceptions import ReconciliationRunNotFoundError
+from app.models.accounts import Account
+from app.models.reconciliation import (COMPLETED, FAILED, RUNNING, BalanceMismatch,
+                                       ReconciliationRange, ReconciliationReport,
+                                       ReconciliationRun)
+from app.models.sharding import PREPARED, PreparedLeg
+from app.models.transfers import Transfer
+from app.money import to_decimal
+from app.sharding import get_shard_router
+
+
+def reconciliation_targets(db: Session) -> tuple[list[Engine], sessionmaker]:
+    """
+    The engines to check and the session factory holding the checkpoints
+    (the first shard) for the database behind a request session.
+    """
+    router = get_shard_router(db)
+    if router is not None:
+        return router.engines, router.session_factories[0]
+
+    bind = db.get_bind()
+    return [bind], sessionmaker(bind=bind, autocommit=False, autoflush=False)
+
+
+def check_range(conn: Connection, range_start: int, range_end: int) -> dict:
+    """
+    Compare stored balances with their ledger for one account-number range.
+
+    The expected balance of every account is computed with set-based SQL:
+    per-account sums of received and sent transfers and of funds reserved by
+    prepared cross-shard debits are joined onto the accounts of the range.
+
+    Args:
+        conn (Connection): Connection to the shard holding the range.
+        range_start (int): First account number.
+        range_end (int): Account number after the last one.
+
+    Returns:
+        dict: accounts, total_balance, total_initial_deposits, in_flight and
+        mismatches (a list of (account_number, balance, expected)), all in minor units.
+    """
+
+    def in_range(column):
+        return and_(column >= range_start, column < range_end)
+
+    received = (
+        select(Transfer.to_account_number.label("account_number"), func.sum(Transfer.amount).label("amount"))
+        .where(in_range(Transfer.to_account_number))
+        .group_by(Transfer.to_account_number)
+        .subquery()
+    )
+    sent = (
+        select(Transfer.from_account_number.label("account_number"), func.sum(Transfer.amount).label("amount"))
+        .where(in_range(Transfer.from_account_number))
+        .group_by(Transfer.from_account_number)
+        .subquery()
+    )
+    reserved = (
+        select(PreparedLeg.account_number, func.sum(PreparedLeg.amount).label("amount"))
+        .where(
+            in_range(PreparedLeg.account_number),
+            PreparedLeg.account_number == PreparedLeg.from_account_number,
+            PreparedLeg.state == PREPARED,
+        )
+        .group_by(PreparedLeg.account_number)
+        .subquery()
+    )
+    in_flight = func.coalesce(reserved.c.amount, 0)
+    ledger = (
+        select(
+            Account.account_number,
+            Account.balance,
+            Account.initial_deposit,
+            in_flight.label("in_flight"),
+            (
+                Account.initial_deposit
+                + func.coalesce(received.c.amount, 0)
+                - func.coalesce(sent.c.amount, 0)
+                - in_flight
+            ).label("expected"),
+        )
+        .outerjoin(received, received.c.account_number == Account.account_number)
+        .outerjoin(sent, sent.c.account_number == Account.account_number)
+        .outerjoin(reserved, reserved.c.account_number == Account.account_number)
+        .where(in_range(Account.account_number))
+        .subquery()
+    )
+
+    accounts, total_balance, total_initial, total_in_flight = conn.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(ledger.c.balance), 0),
+            func.coalesce(func.sum(ledger.c.initial_deposit), 0),
+            func.coalesce(func.sum(ledger.c.in_flight), 0),
+        )
+    ).one()
+    mismatches = conn.execute(
+        select(ledger.c.account_number, ledger.c.balance, ledger.c.expected)
+        .where(ledger.c.balance != ledger.c.expected)
+        .order_by(ledger.c.account_number)
+    ).all()
+
+    return {
+        "accounts": accounts,
+        "total_balance": total_balance,
+        "total_initial_deposits": total_initial,
+        "in_flight": total_in_flight,
+        "mismatches": [tuple(row) for row in mismatches],
+    }
+
+
+def start_reconciliation(
+    engines: list[Engine], session_factory: sessionmaker, chunk_size: int = RECONCILIATION_CHUNK_SIZE
+) -> str:
+    """
+    Plan a reconciliation run: split every shard's account numbers into ranges
+    and record them as pending checkpoints.
+
+    Args:
+        engines (list[Engine]): One engine per shard.
+        session_factory (sessionmaker): Where runs and checkpoints are stored.
+        chunk_size (int): Accounts per range on each shard.
+
+    Returns:
+        str: The id of the new run.
+    """
+    run_id = uuid4().hex
+    # Account numbers of a shard are spaced `len(engines)` apart.
+    step = chunk_size * len(engines)
+
+    with session_factory() as session:
+        session.add(ReconciliationRun(id=run_id, status=RUNNING, started_at=datetime.now(TIMEZONE)))
+        for shard_id, shard_engine in enumerate(engines):
+            with shard_engine.connect() as conn:
+                low, high = conn.execute(
+                    select(func.min(Account.account_number), func.max(Account.account_number))
+                ).one()
+            if low is None:
+                continue
+            for range_start in range(low, high + 1, step):
+                session.add(
+                    ReconciliationRange(
+                        run_id=run_id,
+                        shard_id=shard_id,
+                        range_start=range_start,
+                        range_end=min(range_start + step, high + 1),
+                    )
+                )
+        session.commit()
+
+    return run_id
+
+
+def resume_reconciliation(
+    engines: list[Engine],
+    session_factory: sessionmaker,
+    run_id: str,
+    workers: int = RECONCILIATION_WORKERS,
+) -> None:
+    """
+    Check every pending range of a run, `workers` ranges at a time.
+
+    Each range runs on its own connection; its result is checkpointed as soon
+    as it finishes, so an interrupted run resumes where it stopped.
+
+    Args:
+        engines (list[Engine]): One engine per shard.
+        session_factory (sessionmaker): Where runs and checkpoints are stored.
+        run_id (str): The run to continue.
+        workers (int): Ranges checked in parallel.
+
+    Raises:
+        ReconciliationRunNotFoundError: If the run does not exist.
+    """
+    with session_factory() as session:
+        run = session.get(ReconciliationRun, run_id)
+        if run is None:
+            raise ReconciliationRunNotFoundError(run_id)
+        run.status = RUNNING
+        pending = [
+            (r.shard_id, r.range_start, r.range_end)
+            for r in session.query(ReconciliationRange)
+            .filter(ReconciliationRange.run_id == run_id, ReconciliationRange.checked_at.is_(None))
+            .all()
+        ]
+        session.commit()
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(_check_on_shard, engines[shard_id], range_start, range_end): (shard_id, range_start)
+                    for shard_id, range_start, range_end in pending
+                }
+                for future in as_completed(futures):
+                    shard_id, range_start = futures[future]
+                    result = future.result()
+                    checkpoint = session.get(ReconciliationRange, (run_id, shard_id, range_start))
+                    checkpoint.accounts = result["accounts"]
+                    checkpoint.total_balance = result["total_balance"]
+                    checkpoint.total_initial_deposits = result["total_initial_deposits"]
+                    checkpoint.in_flight = result["in_flight"]
+                    checkpoint.mismatches = json.dumps(result["mismatches"])
+                    checkpoint.checked_at = datetime.now(TIMEZONE)
+                    session.commit()
+        except Exception:
+            session.rollback()
+            session.get(ReconciliationRun, run_id).status = FAILED
+            session.commit()
+            raise
+
+        run = session.get(ReconciliationRun, run_id)
+        run.status = COMPLETED
+        run.finished_at = datetime.now(TIMEZONE)
+        session.commit()
+
+
+def get_reconciliation_report(db: Session, run_id: str) -> ReconciliationReport:
+    """
+    Summarise the checkpoints of a run.
+
+    Args:
+        db (Session): Session on the database holding the checkpoints.
+        run_id (str): The run to report on.
+
+    Returns:
+        ReconciliationReport: Totals over the ranges checked so far.
+
+    Raises:
+        ReconciliationRunNotFoundError: If the run does not exist.
+    """
+    run = db.get(ReconciliationRun, run_id)
+    if run is None:
+        raise ReconciliationRunNotFoundError(run_id)
+
+    ranges = db.query(ReconciliationRange).filter(ReconciliationRange.run_id == run_id).all()
+    done = [r for r in ranges if r.checked_at is not None]
+    mismatches = sorted(tuple(m) for r in done for m in json.loads(r.mismatches))
+    total_balance = sum(r.total_balance for r in done)
+    total_initial = sum(r.total_initial_deposits for r in done)
+    in_flight = sum(r.in_flight for r in done)
+
+    return ReconciliationReport(
+        run_id=run.id,
+        status=run.status,
+        started_at=run.started_at,
+        finished_at=run.finished_at,
+        ranges_done=len(done),
+        ranges_total=len(ranges),
+        accounts=sum(r.accounts for r in done),
+        total_balance=to_decimal(total_balance),
+        total_initial_deposits=to_decimal(total_initial),
+        in_flight=to_decimal(in_flight),
+        conservation_drift=to_decimal(total_balance + in_flight - total_initial),
+        mismatch_count=len(mismatches),
+        mismatches=[
+            BalanceMismatch(account_number=n, balance=to_decimal(balance), expected=to_decimal(expected))
+            for n, balance, expected in mismatches[:RECONCILIATION_MAX_REPORTED_MISMATCHES]
+        ],
+    )
+
+
+def _check_on_shard(shard_engine: Engine, range_start: int, range_end: int) -> dict:
+    with shard_engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # Both statements of a range must see the same snapshot.
+            conn = conn.execution_options(isolation_level="REPEATABLE READ")
+        with conn.begin():
+            return check_range(conn, range_start, range_end)
@@ -0,0 +1,445 @@
+import calendar
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import (CROSS_SHARD_RECOVERY_INTERVAL_SECONDS, SCHEDULED_TRANSFER_BATCH_SIZE,
+                        SCHEDULED_TRANSFER_PENDING_GRACE_SECONDS, SCHEDULED_TRANSFER_POLL_SECONDS,
+                        TIMEZONE)
+from app.exceptions import (CrossShardTransferAbortedError, SameAccountError, ScheduledTransferNotFoundError,
+                            VelocityLimitExceededError)
+from app.models.scheduled_transfers import (COMPLETED, DAILY, MONTHLY, PENDING, REJECTED, WEEKLY,
+                                            ScheduledTransfer, ScheduledTransferRun)
+from app.models.sharding import ABORTED
+from app.models.sharding import COMPLETED as TX_COMPLETED
+from app.pubsub import balance_broker
+from app.services import accounts as accounts_service
+from app.services import cross_shard as cross_shard_service
+from app.services import transfers as transfer_service
+from app.sharding import ShardRouter
+from app.velocity import velocity
+
+
+def local_now() -> datetime:
+    """
+    The current time as stored in DateTime columns: naive, in the bank's timezone.
+    """
+    return datetime.now(TIMEZONE).replace(tzinfo=None)
+
+
+def next_run_after(schedule: ScheduledTransfer, now: datetime) -> datetime | None:
+    """
+    The first due time of a schedule after `now`; None for one-off transfers.
+
+    Occurrences missed while no scheduler was running are skipped, not replayed.
+    Monthly runs keep the day of the first run, or the last day of shorter months.
+    """
+    run_at = schedule.next_run_at
+    months = 0
+    while run_at <= now:
+        if schedule.frequency == DAILY:
+            run_at += timedelta(days=1)
+        elif schedule.frequency == WEEKLY:
+            run_at += timedelta(weeks=1)
+        elif schedule.frequency == MONTHLY:
+            months += 1
+            run_at = _add_months(schedule.next_run_at, months, schedule.first_run_at.day)
+        else:
+            return None
+
+    return run_at
+
+
+def create_scheduled_transfer(
+    db: Session, from_acc: int, to_acc: int, amount: int, frequency: str, first_run_at: datetime
+) -> ScheduledTransfer:
+    """
+    Schedule a one-off or recurring transfer.
+
+    Args:
+        db (Session): SQLAlchemy session to use for queries.
+        from_acc (int): Account number to debit.
+        to_acc (int): Account number to credit.
+        amount (int): Amount of every run in minor units.
+        frequency (str): "once", "daily", "weekly" or "monthly".
+        first_run_at (datetime): When the first run is due; naive times are in
+            the bank's timezone.
+
+    Returns:
+        ScheduledTransfer: The new schedule.
+
+    Raises:
+        AccountNotFoundError: If either account does not exist.
+        SameAccountError: If from_acc and to_acc are the same.
+    """
+    accounts_service.get_account_by_number(db, from_acc)
+    accounts_service.get_account_by_number(db, to_acc)
+    if from_acc == to_acc:
+        raise SameAccountError(from_acc)
+
+    if first_run_at.tzinfo is not None:
+        first_run_at = first_run_at.astimezone(TIMEZONE).replace(tzinfo=None)
+
+    schedule = ScheduledTransfer(
+        from_account_number=from_acc,
+        to_account_number=to_acc,
+        amount=amount,
+        frequency=frequency,
+        first_run_at=first_run_at,
+        next_run_at=first_run_at,
+        created_at=local_now(),
+    )
+    db.add(schedule)
+    db.commit()
+    db.refresh(schedule)
+
+    return schedule
+
+
+def list_scheduled_transfers(db: Session, account_number: int) -> list[ScheduledTransfer]:
+    """
+    The schedules debiting an account, by id.
+
+    Raises:
+        AccountNotFoundError: If no account with the given number exists.
+    """
+    accounts_service.get_account_by_number(db, account_number)
+
+    return (
+        db.query(ScheduledTransfer)
+        .filter(ScheduledTransfer.from_account_number == account_number)
+        .order_by(ScheduledTransfer.id)
+        .all()
+    )
+
+
+def get_scheduled_transfer(db: Session, account_number: int, schedule_id: int) -> ScheduledTransfer:
+    """
+    Look up a schedule debiting an account.
+
+    Raises:
+        ScheduledTransferNotFoundError: If the account has no such schedule.
+    """
+    schedule = (
+        db.query(ScheduledTransfer)
+        .filter(
+            ScheduledTransfer.from_account_number == account_number,
+            ScheduledTransfer.id == schedule_id,
+        )
+        .one_or_none()
+    )
+    if schedule is None:
+        raise ScheduledTransferNotFoundError(schedule_id)
+
+    return schedule
+
+
+def get_scheduled_transfer_runs(
+    db: Session, account_number: int, schedule_id: int, limit: int
+) -> tuple[ScheduledTransfer, list[ScheduledTransferRun]]:
+    """
+    A schedule and its most recent runs, newest first.
+
+    Raises:
+        ScheduledTransferNotFoundError: If the account has no such schedule.
+    """
+    schedule = get_scheduled_transfer(db, account_number, schedule_id)
+    runs = (
+        db.query(ScheduledTransferRun)
+        .filter(
+            ScheduledTransferRun.from_account_number == account_number,
+            ScheduledTransferRun.scheduled_transfer_id == schedule_id,
+        )
+        .order_by(ScheduledTransferRun.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+    return schedule, runs
+
+
+def cancel_scheduled_transfer(db: Session, account_number: int, schedule_id: int) -> ScheduledTransfer:
+    """
+    Stop a schedule; runs already executed are kept.
+
+    Raises:
+        ScheduledTransferNotFoundError: If the account has no such schedule.
+    """
+    schedule = get_scheduled_transfer(db, account_number, schedule_id)
+    schedule.next_run_at = None
+    db.commit()
+    db.refresh(schedule)
+
+    return schedule
+
+
+def run_due_transfers(
+    db: Session,
+    router: ShardRouter | None = None,
+    now: datetime | None = None,
+    batch_size: int = SCHEDULED_TRANSFER_BATCH_SIZE,
+) -> int:
+    """
+    Execute one batch of due scheduled transfers on one database.
+
+    Due schedules are claimed with `FOR UPDATE SKIP LOCKED`, so concurrent
+    schedulers share the work without picking the same row. Local transfers go
+    through `perform_transfer_batch`; they, their run records and the advanced
+    schedules commit together, so a run happens exactly once or not at all.
+    Transfers to another shard are recorded as pending in the same commit and
+    then executed with the two-phase protocol, at most once: the run's id is
+    the transaction id. Runs a crashed scheduler left pending are settled
+    first, see `resume_pending_runs`.
+
+    Args:
+        db (Session): Single-shard session on the database holding the schedules.
+        router (ShardRouter | None): The shard router when sharded.
+        now (datetime | None): The current local time; defaults to now.
+        batch_size (int): Maximum number of schedules claimed.
+
+    Returns:
+        int: The number of schedules claimed.
+    """
+    now = now or local_now()
+    if router is not None:
+        resume_pending_runs(db, router, now, batch_size=batch_size)
+
+    due = (
+        db.query(ScheduledTransfer)
+        .filter(ScheduledTransfer.next_run_at <= now)
+        .order_by(ScheduledTransfer.next_run_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not due:
+        db.rollback()
+        return 0
+
+    local = [
+        s for s in due
+        if router is None or not router.is_cross_shard(s.from_account_number, s.to_account_number)
+    ]
+    remote = [s for s in due if s not in local]
+
+    results, balances = transfer_service.perform_transfer_batch(
+        db, [(s.from_account_number, s.to_account_number, s.amount) for s in local]
+    )
+    counted = []
+    for schedule, result in zip(local, results):
+        if isinstance(result, Exception):
+            db.add(_record_run(schedule, now, REJECTED, error=str(result)))
+        else:
+            db.add(_record_run(schedule, now, COMPLETED, transfer_id=result.id))
+            counted.append((schedule.from_account_number, schedule.amount, result.timestamp.timestamp()))
+
+    pending = []
+    for schedule in remote:
+        run = _record_run(schedule, now, PENDING)
+        db.add(run)
+        pending.append((schedule.from_account_number, schedule.to_account_number, schedule.amount, run))
+
+    for schedule in due:
+        schedule.next_run_at = next_run_after(schedule, now)
+    try:
+        db.commit()
+    except BaseException:
+        for from_acc, amount, at in counted:
+            velocity.release(from_acc, amount, at)
+        raise
+
+    for account_number, (balance, version) in balances.items():
+        balance_broker.publish(account_number, balance, version)
+
+    for from_acc, to_acc, amount, run in pending:
+        _execute_cross_shard_run(db, router, run, to_acc, amount)
+
+    return len(due)
+
+
+def resume_pending_runs(
+    db: Session,
+    router: ShardRouter,
+    now: datetime | None = None,
+    grace_seconds: int = SCHEDULED_TRANSFER_PENDING_GRACE_SECONDS,
+    batch_size: int = SCHEDULED_TRANSFER_BATCH_SIZE,
+) -> int:
+    """
+    Settle cross-shard runs left pending by a scheduler that died mid-run.
+
+    A run pending for longer than `grace_seconds` is settled from the outcome
+    of its transaction: completed or aborted transactions complete or reject
+    the run, one that never started is executed now, and one still in doubt is
+    left to cross-shard recovery and looked at again on the next pass.
+
+    Args:
+        db (Session): Single-shard session on the database holding the schedules.
+        router (ShardRouter): The shard router.
+        now (datetime | None): The current local time; defaults to now.
+        grace_seconds (int): Age after which a pending run is considered abandoned.
+        batch_size (int): Maximum number of runs settled.
+
+    Returns:
+        int: The number of runs completed or rejected.
+    """
+    now = now or local_now()
+    stale = (
+        db.query(ScheduledTransferRun)
+        .filter(
+            ScheduledTransferRun.status == PENDING,
+            ScheduledTransferRun.executed_at <= now - timedelta(seconds=grace_seconds),
+        )
+        .order_by(ScheduledTransferRun.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    settled = 0
+    for run in stale:
+        state, transfer_id = cross_shard_service.get_cross_shard_outcome(
+            router, run.from_account_number, _txid(run)
+        )
+        if state is None:
+            schedule = db.get(ScheduledTransfer, run.scheduled_transfer_id)
+            _execute_cross_shard_run(db, router, run, schedule.to_account_number, schedule.amount)
+        elif state == TX_COMPLETED:
+            run.status, run.transfer_id = COMPLETED, transfer_id
+            db.commit()
+        elif state == ABORTED:
+            run.status, run.error = REJECTED, str(CrossShardTransferAbortedError(_txid(run)))
+            db.commit()
+        settled += run.status != PENDING
+
+    db.commit()
+    return settled
+
+
+def _execute_cross_shard_run(db: Session, router: ShardRouter, run: ScheduledTransferRun, to_acc: int, amount: int):
+    from_acc = run.from_account_number
+    try:
+        reserved_at = velocity.check_and_record(from_acc, amount)
+    except VelocityLimitExceededError as e:
+        run.status, run.error = REJECTED, str(e)
+        db.commit()
+        return
+
+    try:
+        transfer = cross_shard_service.perform_cross_shard_transfer(router, from_acc, to_acc, amount, _txid(run))
+    except IntegrityError:
+        # Another scheduler started this run's transaction; it settles the run.
+        velocity.release(from_acc, amount, reserved_at)
+        db.rollback()
+        return
+    except Exception as e:
+        velocity.release(from_acc, amount, reserved_at)
+        run.status, run.error = REJECTED, str(e)
+    else:
+        run.status, run.transfer_id = COMPLETED, transfer.id
+    db.commit()
+
+
+def _txid(run: ScheduledTransferRun) -> str:
+    # Runs live on the shard of their debited account, which coordinates the transfer.
+    return f"scheduled-run-{run.id}"
+
+
+class TransferScheduler:
+    """
+    Runs due scheduled transfers of every shard in a daemon thread.
+
+    Every worker may run one; claiming with `SKIP LOCKED` keeps them from
+    executing the same schedule twice. A full batch is followed at once by the
+    next one, so a midnight backlog drains in batches rather than waiting for
+    the next poll. When sharded, the same thread finishes or undoes interrupted
+    cross-shard transfers every `recovery_seconds`, starting with its first pass.
+    """
+
+    def __init__(
+        self,
+        router: ShardRouter,
+        batch_size: int = SCHEDULED_TRANSFER_BATCH_SIZE,
+        poll_seconds: float = SCHEDULED_TRANSFER_POLL_SECONDS,
+        recovery_seconds: float = CROSS_SHARD_RECOVERY_INTERVAL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.router = router
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.recovery_seconds = recovery_seconds
+        self.clock = clock
+        self._next_recovery: float | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def run_once(self) -> int:
+        """
+        Run one batch on every shard.
+
+        Returns:
+            int: The number of schedules claimed.
+        """
+        claimed = 0
+        for shard_id in range(self.router.shard_count):
+            with self.router.session_for_shard(shard_id) as session:
+                claimed += run_due_transfers(
+                    session, self.router if self.router.sharded else None, batch_size=self.batch_size
+                )
+
+        return claimed
+
+    def recover_if_due(self) -> int:
+        """
+        Run cross-shard recovery if sharded and `recovery_seconds` have passed since the last run.
+
+        Returns:
+            int: The number of transactions finished or aborted.
+        """
+        now = self.clock()
+        if not self.router.sharded or (self._next_recovery is not None and now < self._next_recovery):
+            return 0
+
+        self._next_recovery = now + self.recovery_seconds
+        return cross_shard_service.recover_cross_shard_transfers(self.router)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.recover_if_due()
+            except Exception:
+                # Prepared legs stay reserved until the next round retries.
+                pass
+            try:
+                busy = self.run_once() >= self.batch_size
+            except Exception:
+                # Claimed rows were rolled back and stay due; retry after a pause.
+                busy = False
+            if not busy:
+                self._stop.wait(self.poll_seconds)
+
+
+def _record_run(schedule: ScheduledTransfer, now: datetime, status: str, **outcome) -> ScheduledTransferRun:
+    return ScheduledTransferRun(
+        scheduled_transfer_id=schedule.id,
+        from_account_number=schedule.from_account_number,
+        scheduled_for=schedule.next_run_at,
+        executed_at=now,
+        status=status,
+        **outcome,
+    )
+
+
+def _add_months(start: datetime, months: int, day: int) -> datetime:
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    return start.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
@@ -1,60 +1,218 @@
+from dataclasses import dataclass
 from datetime import datetime
-from decimal import Decimal
 from pydantic import Field
+from sqlalchemy import case, func, literal, or_
+from sqlalchemy.ext.horizontal_shard import set_shard_id
 from sqlalchemy.orm import Session
 
+from app.account_index import account_index
 from app.services import accounts as accounts_service
+from app.services import cross_shard as cross_shard_service
+from app.services import outbox as outbox_service
 from app.config import TIMEZONE
 from app.exceptions import (InsufficientFundsError,
-                            SameAccountError, AccountNotFoundError)
+                            SameAccountError, AccountNotFoundError, VelocityLimitExceededError)
+from app.models.accounts import Account
 from app.models.transfers import Transfer
+from app.pubsub import balance_broker
+from app.sharding import get_shard_router
+from app.singleflight import SingleFlight
+from app.velocity import velocity
+
+
+history_reads = SingleFlight("transfer_history")
+
+
+@dataclass(frozen=True)
+class TransferSnapshot:
+    """
+    Immutable copy of a transfer row, safe to share between requests.
+    """
+
+    id: int
+    from_account_number: int
+    to_account_number: int
+    amount: int
+    timestamp: datetime
+
+
+@dataclass(frozen=True)
+class TransferHistory:
+    """
+    Immutable transfer history of an account.
+
+    Attributes:
+        version (int | None): Account version read before the transfers; None if
+            the account was created while the history was being read.
+        transfers (tuple[TransferSnapshot, ...]): Transfers, newest first.
+    """
+
+    version: int | None
+    transfers: tuple[TransferSnapshot, ...]
 
 
 def perform_transfer(
-    db: Session, from_acc: int, to_acc: int, amount: Decimal = Field(..., gt=0)
+    db: Session, from_acc: int, to_acc: int, amount: int = Field(..., gt=0)
 ) -> Transfer:
     """
     Move funds from one account to another, recording the transfer.
 
+    Accounts on the same shard are updated in one local transaction; accounts on
+    different shards go through the two-phase cross-shard protocol. A
+    "transfer.completed" outbox event is committed together with the transfer,
+    and the new balances are published to live balance streams after the commit.
+    Velocity limits are checked and the transfer counted in memory, in one
+    step, before any query; the count is released if the transfer fails.
+    Source accounts the account index knows do not exist are rejected first,
+    so they never get velocity counters.
+
     Args:
         db (Session): SQLAlchemy session to use for queries.
         from_acc (int): Account number to debit.
         to_acc (int): Account number to credit.
-        amount (Decimal): Amount to transfer; must be greater than zero.
+        amount (int): Amount to transfer in minor units; must be greater than zero.
 
     Returns:
         Transfer: The newly created Transfer ORM object, including timestamp.
 
     Raises:
+        AccountNotFoundError: If either account does not exist.
         SameAccountError: If from_acc and to_acc are the same.
         InsufficientFundsError: If the source account’s balance is less than transfer amount.
+        VelocityLimitExceededError: If the source account is over a velocity limit.
+        CrossShardTransferAbortedError: If recovery aborted a cross-shard transfer
+            that stalled while preparing.
     """
-    from_acc_validated = accounts_service.get_account_by_number(db, from_acc)
-    to_acc_validated = accounts_service.get_account_by_number(db, to_acc)
+    if not account_index.might_exist(from_acc):
+        raise AccountNotFoundError(from_acc)
 
-    if from_acc_validated.account_number == to_acc_validated.account_number:
-        raise SameAccountError(from_acc_validated.account_number)
+    reserved_at = velocity.check_and_record(from_acc, amount)
+    try:
+        from_acc_validated = accounts_service.get_account_by_number(db, from_acc)
+        to_acc_validated = accounts_service.get_account_by_number(db, to_acc)
 
-    if from_acc_validated.balance < amount:
-        raise InsufficientFundsError(from_acc_validated.balance, amount)
+        if from_acc_validated.account_number == to_acc_validated.account_number:
+            raise SameAccountError(from_acc_validated.account_number)
 
-    from_acc_validated.balance -= amount
-    to_acc_validated.balance += amount
+        router = get_shard_router(db)
+        if router is not None and router.is_cross_shard(from_acc, to_acc):
+            return cross_shard_service.perform_cross_shard_transfer(router, from_acc, to_acc, amount)
 
-    transfer = Transfer(
-        from_account_number=from_acc_validated.account_number,
-        to_account_number=to_acc_validated.account_number,
-        amount=amount,
-        timestamp=datetime.now(TIMEZONE),
-    )
+        if from_acc_validated.balance < amount:
+            raise InsufficientFundsError(from_acc_validated.balance, amount)
 
-    db.add(transfer)
-    db.commit()
+        from_acc_validated.balance -= amount
+        to_acc_validated.balance += amount
+        accounts_service.bump_version(from_acc_validated)
+        accounts_service.bump_version(to_acc_validated)
+
+        transfer = Transfer(
+            from_account_number=from_acc_validated.account_number,
+            to_account_number=to_acc_validated.account_number,
+            amount=amount,
+            timestamp=datetime.now(TIMEZONE),
+        )
+
+        db.add(transfer)
+        db.flush()
+        outbox_service.record_transfer_completed(db, transfer)
+        balances = {
+            account.account_number: (account.balance, account.version)
+            for account in (from_acc_validated, to_acc_validated)
+        }
+        db.commit()
+    except BaseException:
+        # The transfer did not happen; give its place in the velocity windows back.
+        velocity.release(from_acc, amount, reserved_at)
+        raise
     db.refresh(transfer)
 
+    for account_number, (balance, version) in balances.items():
+        balance_broker.publish(account_number, balance, version)
+
     return transfer
 
 
+def perform_transfer_batch(
+    db: Session, transfers: list[tuple[int, int, int]]
+) -> tuple[list[Transfer | Exception], dict[int, tuple[int, int]]]:
+    """
+    Apply many transfers between accounts of one database in the caller's transaction.
+
+    All accounts involved are loaded and locked with one query, in account
+    order so concurrent batches can not deadlock. Each transfer is checked
+    against the balances and velocity counts left by the ones before it,
+    exactly as `perform_transfer` would; rejected transfers change nothing.
+    Accepted transfers are counted in the velocity windows at once, at their
+    timestamp. Nothing is committed here, so the caller commits the whole batch
+    at once and, should the commit fail, gives the counts back with `velocity.release`.
+
+    Args:
+        db (Session): Single-shard session holding every account involved.
+        transfers (list[tuple[int, int, int]]): (from account, to account,
+            amount in minor units), applied in order.
+
+    Returns:
+        tuple: One Transfer or the exception that rejected it per input, in
+        order, and the new (balance, version) of every account that changed.
+    """
+    numbers = {n for from_acc, to_acc, _ in transfers for n in (from_acc, to_acc)}
+    accounts = {
+        account.account_number: account
+        for account in db.query(Account)
+        .filter(Account.account_number.in_(numbers))
+        .order_by(Account.account_number)
+        .with_for_update()
+        .all()
+    }
+
+    results: list[Transfer | Exception] = []
+    changed: dict[int, Account] = {}
+    now = datetime.now(TIMEZONE)
+    for from_acc, to_acc, amount in transfers:
+        source = accounts.get(from_acc)
+        target = accounts.get(to_acc)
+        if source is None or target is None:
+            # Unknown accounts never get velocity counters.
+            results.append(AccountNotFoundError(from_acc if source is None else to_acc))
+            continue
+        try:
+            velocity.check_and_record(from_acc, amount, now.timestamp())
+        except VelocityLimitExceededError as e:
+            results.append(e)
+            continue
+        if from_acc == to_acc:
+            error = SameAccountError(from_acc)
+        elif source.balance < amount:
+            error = InsufficientFundsError(source.balance, amount)
+        else:
+            error = None
+        if error is not None:
+            velocity.release(from_acc, amount, now.timestamp())
+            results.append(error)
+            continue
+
+        source.balance -= amount
+        target.balance += amount
+        accounts_service.bump_version(source)
+        accounts_service.bump_version(target)
+        changed[from_acc] = source
+        changed[to_acc] = target
+
+        transfer = Transfer(
+            from_account_number=from_acc, to_account_number=to_acc, amount=amount, timestamp=now
+        )
+        db.add(transfer)
+        results.append(transfer)
+
+    db.flush()
+    for transfer in results:
+        if isinstance(transfer, Transfer):
+            outbox_service.record_transfer_completed(db, transfer)
+
+    return results, {n: (account.balance, account.version) for n, account in changed.items()}
+
+
 def get_transfer_history_for_account(
     db: Session, account_number: int
 ) -> list[Transfer]:
@@ -83,3 +241,110 @@ def get_transfer_history_for_account(
         .order_by(Transfer.timestamp.desc())
         .all()
     )
+
+
+def get_statement(
+    db: Session, account_number: int, before: int | None, limit: int
+) -> list:
+    """
+    One page of an account's statement: transfers newest first, each with its
+    signed amount and the balance right after it.
+
+    Everything is computed in one SQL statement. The balance before the page is
+    the current balance minus the signed transfers newer than the page, and a
+    window sum over the page walks it back row by row. Pages are keyed on the
+    transfer id, so deeper pages only aggregate the rows above them.
+
+    Args:
+        db (Session): SQLAlchemy session to use for the query.
+        account_number (int): The account whose statement to fetch.
+        before (int | None): Only transfers with a smaller id; None for the newest page.
+        limit (int): Maximum number of rows.
+
+    Returns:
+        list: Rows with id, from_account_number, to_account_number, amount,
+        timestamp, signed_amount and balance_after (minor units), ordered by
+        id descending.
+
+    Raises:
+        AccountNotFoundError: If no account with the given number exists.
+    """
+    if not account_index.might_exist(account_number):
+        raise AccountNotFoundError(account_number)
+
+    involving = or_(
+        Transfer.from_account_number == account_number,
+        Transfer.to_account_number == account_number,
+    )
+    signed = case(
+        (Transfer.to_account_number == account_number, Transfer.amount),
+        else_=-Transfer.amount,
+    )
+
+    page_query = db.query(
+        Transfer.id,
+        Transfer.from_account_number,
+        Transfer.to_account_number,
+        Transfer.amount,
+        Transfer.timestamp,
+        signed.label("signed_amount"),
+    ).filter(involving)
+    newer = literal(0)
+    if before is not None:
+        page_query = page_query.filter(Transfer.id < before)
+        newer = (
+            db.query(func.coalesce(func.sum(signed), 0))
+            .filter(involving, Transfer.id >= before)
+            .scalar_subquery()
+        )
+    page = page_query.order_by(Transfer.id.desc()).limit(limit).subquery()
+
+    current = (
+        db.query(Account.balance).filter(Account.account_number == account_number).scalar_subquery()
+    )
+    newer_on_page = func.sum(page.c.signed_amount).over(order_by=page.c.id.desc(), rows=(None, -1))
+    balance_after = current - newer - func.coalesce(newer_on_page, 0)
+
+    query = db.query(page, balance_after.label("balance_after")).order_by(page.c.id.desc())
+    router = get_shard_router(db)
+    if router is not None:
+        # The page lives on the account's shard; a cross-shard transfer's copy
+        # on the other shard must not be merged in.
+        query = query.options(set_shard_id(router.shard_for_account(account_number)))
+
+    rows = query.all()
+    if not rows:
+        accounts_service.get_account_by_number(db, account_number)
+
+    return rows
+
+
+def read_transfer_history(db: Session, account_number: int) -> TransferHistory:
+    """
+    Read-only transfer history, coalesced with identical concurrent reads.
+
+    The account version is read before the transfers, so the history is never
+    older than the version it is labelled with.
+
+    Args:
+        db (Session): SQLAlchemy session to use for the query.
+        account_number (int): The account number whose history to fetch.
+
+    Returns:
+        TransferHistory: The account's version and transfers, newest first.
+
+    Raises:
+        AccountNotFoundError: If no account with the given number exists.
+    """
+    if not account_index.might_exist(account_number):
+        raise AccountNotFoundError(account_number)
+
+    def load() -> TransferHistory:
+        version = accounts_service.get_account_version(db, account_number)
+        transfers = tuple(
+            TransferSnapshot(t.id, t.from_account_number, t.to_account_number, t.amount, t.timestamp)
+            for t in get_transfer_history_for_account(db, account_number)
+        )
+        return TransferHistory(version, transfers)
+
+    return history_reads.do(account_number, load)
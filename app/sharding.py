@@ -0,0 +1,187 @@
+from zlib import crc32
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BindParameter, ColumnClause
+
+
+# Columns whose value decides which shard a row lives on.
+ACCOUNT_COLUMNS = {"account_number", "from_account_number", "to_account_number"}
+CUSTOMER_COLUMNS = {"customer_id"}
+EMAIL_COLUMNS = {"email"}
+
+
+class ShardRouter:
+    """
+    Map accounts, customers and transfers onto a fixed list of database shards.
+
+    Account numbers and customer ids are allocated so that ``n % shard_count`` is
+    the shard holding the row. A customer is placed by a stable hash of their
+    email and all their accounts are allocated on the same shard, so a customer
+    and their accounts can always be read from one database. A transfer row is
+    stored on the shard of each account it touches.
+
+    Attributes:
+        engines (list[Engine]): One engine per shard, indexed by shard id.
+        session_factories (list[sessionmaker]): Plain, single-shard session
+            factories used by the allocator and the cross-shard protocol.
+    """
+
+    def __init__(self, engines: list[Engine]):
+        self.engines = list(engines)
+        self.session_factories = [
+            sessionmaker(bind=shard_engine, autocommit=False, autoflush=False)
+            for shard_engine in self.engines
+        ]
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.engines)
+
+    @property
+    def sharded(self) -> bool:
+        return self.shard_count > 1
+
+    def shard_for_account(self, account_number: int) -> int:
+        return account_number % self.shard_count
+
+    def shard_for_customer(self, customer_id: int) -> int:
+        return customer_id % self.shard_count
+
+    def shard_for_email(self, email: str) -> int:
+        return crc32(email.lower().encode()) % self.shard_count
+
+    def is_cross_shard(self, from_acc: int, to_acc: int) -> bool:
+        return self.shard_for_account(from_acc) != self.shard_for_account(to_acc)
+
+    def session_for_shard(self, shard_id: int) -> Session:
+        return self.session_factories[shard_id]()
+
+    def allocate_id(self, ticket_model: type, shard_id: int) -> int:
+        """
+        Allocate a globally unique id that routes back to ``shard_id``.
+
+        A row is inserted into the shard's ticket table and its autoincrement
+        value is spread over the shards as ``ticket * shard_count + shard_id``.
+
+        Args:
+            ticket_model (type): ORM class with an autoincrement ``id`` column.
+            shard_id (int): The shard the new id must belong to.
+
+        Returns:
+            int: The allocated id.
+        """
+        with self.session_for_shard(shard_id) as session:
+            ticket = ticket_model()
+            session.add(ticket)
+            session.flush()
+            allocated = ticket.id * self.shard_count + shard_id
+            session.commit()
+
+        return allocated
+
+    def sessionmaker(self) -> sessionmaker:
+        """
+        Build the session factory used by ``get_db``.
+
+        A single shard gets an ordinary session. Several shards get a
+        ``ShardedSession`` that routes every statement from its WHERE clause and
+        every flushed row from its shard key; the router is exposed to the
+        services through ``session.info["shard_router"]``.
+        """
+        if not self.sharded:
+            return sessionmaker(bind=self.engines[0], autocommit=False, autoflush=False)
+
+        return sessionmaker(
+            class_=ShardedSession,
+            shards=dict(enumerate(self.engines)),
+            shard_chooser=self._shard_chooser,
+            identity_chooser=self._identity_chooser,
+            execute_chooser=self._execute_chooser,
+            autocommit=False,
+            autoflush=False,
+            info={"shard_router": self},
+        )
+
+    def _shard_chooser(self, mapper, instance, clause=None) -> int:
+        for column in ("account_number", "from_account_number"):
+            value = getattr(instance, column, None)
+            if value is not None:
+                return self.shard_for_account(value)
+
+        customer_id = getattr(instance, "customer_id", None)
+        if customer_id is not None:
+            return self.shard_for_customer(customer_id)
+
+        email = getattr(instance, "email", None)
+        if email is not None:
+            return self.shard_for_email(email)
+
+        raise ValueError(f"Can not choose a shard for {mapper.class_.__name__} without a shard key")
+
+    def _identity_chooser(self, mapper, primary_key, *, lazy_loaded_from, **kw) -> list[int]:
+        if lazy_loaded_from is not None:
+            return [lazy_loaded_from.identity_token]
+
+        shards = self._shards_for_column(mapper.primary_key[0].name, primary_key[0])
+        return shards or list(range(self.shard_count))
+
+    def _execute_chooser(self, orm_context) -> list[int]:
+        if orm_context.lazy_loaded_from is not None:
+            return [orm_context.lazy_loaded_from.identity_token]
+
+        shards: list[int] = []
+        for column, operator, value in _where_comparisons(orm_context.statement):
+            if operator == operators.eq:
+                values = [value]
+            elif operator == operators.in_op:
+                values = list(value)
+            else:
+                continue
+            for item in values:
+                for shard_id in self._shards_for_column(column, item):
+                    if shard_id not in shards:
+                        shards.append(shard_id)
+
+        return shards or list(range(self.shard_count))
+
+    def _shards_for_column(self, column: str, value) -> list[int]:
+        if value is None:
+            return []
+        if column in ACCOUNT_COLUMNS:
+            return [self.shard_for_account(value)]
+        if column in CUSTOMER_COLUMNS:
+            return [self.shard_for_customer(value)]
+        if column in EMAIL_COLUMNS:
+            return [self.shard_for_email(value)]
+        return []
+
+
+def _where_comparisons(statement) -> list[tuple]:
+    """
+    Collect ``(column name, operator, value)`` for every column-to-literal
+    comparison in the statement's WHERE clause.
+    """
+    whereclause = getattr(statement, "whereclause", None)
+    if whereclause is None:
+        return []
+
+    comparisons = []
+
+    def visit_binary(binary):
+        left, right = binary.left, binary.right
+        if isinstance(left, BindParameter) and isinstance(right, ColumnClause):
+            left, right = right, left
+        if isinstance(left, ColumnClause) and isinstance(right, BindParameter):
+            comparisons.append((left.name, binary.operator, right.effective_value))
+
+    visitors.traverse(whereclause, {}, {"binary": visit_binary})
+    return comparisons
+
+
+def get_shard_router(db: Session) -> ShardRouter | None:
+    """
+    Return the router of a sharded session, or None for a single database.
+    """
+    return db.info.get("shard_router")
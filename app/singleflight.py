@@ -0,0 +1,72 @@
+import threading
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls within one worker.
+
+    The first caller for a key runs the function; callers arriving while it is
+    running wait and receive the same result (or exception). Nothing is cached:
+    once the call returns the next caller runs it again. Results are handed to
+    several threads at once, so callers must return immutable data.
+
+    Attributes:
+        name (str): Label used in the stats.
+        hits (int): Calls answered by another caller's query.
+        executions (int): Calls that ran the function.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.executions = 0
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        groups[name] = self
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "executions": self.executions, "in_flight": len(self._calls)}
+
+
+groups: dict[str, SingleFlight] = {}
+
+
+def stats() -> dict:
+    return {name: group.stats() for name, group in groups.items()}
@@ -0,0 +1,86 @@
+"""
+Load historical accounts and transfers from CSV or JSON lines files.
+
+    python -m app.tools.bulk_import --accounts legacy/accounts.csv --transfers legacy/transfers.csv
+    python -m app.tools.bulk_import --transfers transfers.jsonl --rejects rejects.jsonl --name march
+
+Accounts need account_number, name, email and initial_deposit; transfers need
+from_account_number, to_account_number, amount and timestamp (ISO 8601).
+Secondary indexes of the accounts and transfers tables are dropped while
+loading and rebuilt at the end, then every balance is recomputed from the
+ledger. Progress is checkpointed per chunk under `--name`: after an
+interruption, run the same command again to continue where it stopped.
+The database must be migrated first (`python -m app.tools.migrate`). Run it
+while the API is stopped; no outbox events are written for imported rows.
+Running workers reload their account index once they see the new checkpoints.
+
+Only a single database can be loaded. On a sharded deployment an account lives
+on shard `account_number % shard_count`, while its customer lives on the shard
+of their email and every account of a customer on that same shard; legacy
+account numbers keep none of these rules, so loading them per shard would
+split customers from their accounts. Import before splitting into shards.
+"""
+import argparse
+import json
+import sys
+
+from app.config import BULK_IMPORT_CHUNK_SIZE
+from app.database import shard_router
+from app.migrations import pending_migrations
+from app.services import bulk_import as import_service
+
+
+def print_progress(progress: import_service.ImportProgress) -> None:
+    print(
+        f"{progress.kind}: {progress.rows} rows, {progress.loaded} loaded, "
+        f"{progress.rejected} rejected, {progress.rows_per_second:.0f} rows/s",
+        file=sys.stderr,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", metavar="PATH", help="accounts file (.csv or .jsonl)")
+    parser.add_argument("--transfers", metavar="PATH", help="transfers file (.csv or .jsonl)")
+    parser.add_argument("--name", default="legacy", help="checkpoint key of this import")
+    parser.add_argument("--chunk-size", type=int, default=BULK_IMPORT_CHUNK_SIZE)
+    parser.add_argument("--rejects", metavar="PATH", help="append invalid rows here as JSON lines")
+    args = parser.parse_args(argv)
+    if not args.accounts and not args.transfers:
+        parser.error("nothing to import: give --accounts and/or --transfers")
+    if shard_router.sharded:
+        parser.error(
+            "bulk import loads a single database; SHARD_URLS lists several and legacy "
+            "account numbers do not follow the shard placement, so import before sharding"
+        )
+
+    engine = shard_router.engines[0]
+    if pending_migrations(engine):
+        parser.error("the database is not migrated: run python -m app.tools.migrate first")
+    import_service.drop_deferred_indexes(engine)
+
+    results = []
+    rejects = open(args.rejects, "a", encoding="utf-8") if args.rejects else None
+    try:
+        for kind, path in ((import_service.ACCOUNTS, args.accounts), (import_service.TRANSFERS, args.transfers)):
+            if path:
+                progress = import_service.load_file(
+                    engine, args.name, kind, path, args.chunk_size, rejects, print_progress
+                )
+                results.append(progress.as_dict())
+    finally:
+        if rejects is not None:
+            rejects.close()
+
+    print("building indexes", file=sys.stderr)
+    import_service.create_deferred_indexes(engine)
+    print("recomputing balances", file=sys.stderr)
+    updated = import_service.recompute_balances(engine)
+    import_service.reset_sequences(engine)
+
+    json.dump({"files": results, "balances_recomputed": updated}, sys.stdout)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
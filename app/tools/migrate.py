@@ -0,0 +1,28 @@
+"""
+Create missing tables and apply pending schema migrations on every shard.
+
+    python -m app.tools.migrate
+
+Run once per deployment, before the API workers start; they no longer touch
+the schema on startup.
+"""
+import argparse
+import json
+
+from app.database import Base, shard_engines
+from app.migrations import run_migrations
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.parse_args(argv)
+
+    applied = {}
+    for shard_id, shard_engine in enumerate(shard_engines):
+        Base.metadata.create_all(shard_engine)
+        applied[shard_id] = run_migrations(shard_engine)
+    print(json.dumps({"applied": applied}))
+
+
+if __name__ == "__main__":
+    main()
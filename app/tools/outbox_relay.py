@@ -0,0 +1,74 @@
+"""
+Relay outbox events to a downstream sink.
+
+    python -m app.tools.outbox_relay file:/var/lib/banking/events.jsonl
+    python -m app.tools.outbox_relay http://localhost:9000/events --once
+
+One relay runs per shard, each with its own offset ("<name>-<shard>"). Failed
+batches are retried with a backoff; a relay that keeps failing stops them all
+and the process exits with status 1, for the supervisor to restart it.
+"""
+import argparse
+import sys
+import threading
+
+from app.config import OUTBOX_BATCH_SIZE, OUTBOX_MAX_FAILURES
+from app.database import shard_router
+from app.services.outbox import OutboxRelay, sink_from_url
+
+
+def build_relays(target: str, name: str, batch_size: int) -> list[OutboxRelay]:
+    sink = sink_from_url(target)
+    if not shard_router.sharded:
+        return [OutboxRelay(shard_router.session_factories[0], sink, name, batch_size)]
+
+    return [
+        OutboxRelay(factory, sink, f"{name}-{shard_id}", batch_size)
+        for shard_id, factory in enumerate(shard_router.session_factories)
+    ]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sink", help='"file:<path>", "http://..." or "queue:"')
+    parser.add_argument("--name", default="default", help="offset key of this relay")
+    parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--max-failures", type=int, default=OUTBOX_MAX_FAILURES,
+                        help="failures in a row after which the relay exits")
+    parser.add_argument("--once", action="store_true", help="drain what is there and exit")
+    args = parser.parse_args(argv)
+
+    relays = build_relays(args.sink, args.name, args.batch_size)
+    if args.once:
+        for relay in relays:
+            while relay.relay_once() == relay.batch_size:
+                pass
+        return
+
+    stop = threading.Event()
+    errors = []
+
+    def run(relay: OutboxRelay) -> None:
+        try:
+            relay.run(stop, args.poll_interval, args.max_failures)
+        except Exception as e:
+            errors.append(f"{relay.name}: {type(e).__name__}: {e}")
+            stop.set()
+
+    threads = [threading.Thread(target=run, args=(relay,), daemon=True) for relay in relays]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        stop.set()
+    if errors:
+        for error in errors:
+            print(f"outbox relay {error}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
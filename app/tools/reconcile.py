@@ -0,0 +1,40 @@
+"""
+Check every account balance against its ledger and report drift.
+
+    python -m app.tools.reconcile
+    python -m app.tools.reconcile --resume 3f2c... --workers 8
+
+Progress is checkpointed per account range on the first shard, so an
+interrupted run can be resumed with its run id.
+"""
+import argparse
+import sys
+
+from app.config import RECONCILIATION_CHUNK_SIZE, RECONCILIATION_WORKERS
+from app.database import shard_router
+from app.services import reconciliation as reconciliation_service
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--resume", metavar="RUN_ID", help="continue an interrupted run")
+    parser.add_argument("--workers", type=int, default=RECONCILIATION_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=RECONCILIATION_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    engines, session_factory = shard_router.engines, shard_router.session_factories[0]
+    run_id = args.resume or reconciliation_service.start_reconciliation(
+        engines, session_factory, args.chunk_size
+    )
+    print(f"reconciliation run {run_id}", file=sys.stderr)
+    reconciliation_service.resume_reconciliation(engines, session_factory, run_id, args.workers)
+
+    with session_factory() as session:
+        report = reconciliation_service.get_reconciliation_report(session, run_id)
+    print(report.json())
+    if report.mismatch_count or report.conservation_drift:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
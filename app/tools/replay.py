@@ -0,0 +1,234 @@
+"""
+Replay a log of transfers against a balance snapshot and report what would bounce.
+
+    python -m app.tools.replay transfers.jsonl
+    python -m app.tools.replay transfers.csv --balances snapshot.csv --output final.csv
+
+Balances are read from the database (every shard) unless a CSV snapshot of
+`account_number,balance` is given. Transfers are streamed from JSONL or CSV
+with `from_account_number`, `to_account_number` and `amount`, and applied in
+order with the rules of `perform_transfer`. Nothing is written to the database.
+"""
+import argparse
+import csv
+import json
+import sys
+from array import array
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Iterable, Iterator
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from app.database import shard_engines
+from app.models.accounts import Account
+from app.money import to_decimal, to_minor
+
+ACCOUNT_NOT_FOUND = "account_not_found"
+SAME_ACCOUNT = "same_account"
+INSUFFICIENT_FUNDS = "insufficient_funds"
+INVALID_AMOUNT = "invalid_amount"
+
+# (line number, from account, to account, amount in cents or None if invalid)
+TransferRecord = tuple[int, int, int, int | None]
+
+
+def to_cents(amount) -> int | None:
+    """
+    Convert an amount to integer cents with `to_minor`; None unless it is positive and valid.
+    """
+    try:
+        cents = to_minor(amount)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+    return cents if cents > 0 else None
+
+
+class Ledger:
+    """
+    Account balances in integer cents, held in a flat `array('q')`.
+
+    Each account number maps to a slot of the array, so replaying a transfer is
+    two dictionary lookups and two integer updates.
+    """
+
+    def __init__(self, balances: Iterable[tuple[int, int]]):
+        self.slots: dict[int, int] = {}
+        self.cents = array("q")
+        for account_number, cents in balances:
+            self.slots[account_number] = len(self.cents)
+            self.cents.append(cents)
+
+    @classmethod
+    def from_engines(cls, engines: list[Engine], chunk_size: int = 10_000) -> "Ledger":
+        """
+        Snapshot the balances of every account, streaming plain rows from each shard.
+        """
+
+        def rows() -> Iterator[tuple[int, int]]:
+            query = select(Account.account_number, Account.balance)
+            for shard_engine in engines:
+                with shard_engine.connect() as conn:
+                    result = conn.execution_options(yield_per=chunk_size).execute(query)
+                    for account_number, balance in result:
+                        yield account_number, balance
+
+        return cls(rows())
+
+    @classmethod
+    def from_csv(cls, path: str) -> "Ledger":
+        """
+        Load a snapshot written as `account_number,balance` (with a header row).
+
+        Raises:
+            ValueError: If a balance is not a valid amount, e.g. has sub-cent digits.
+        """
+
+        def rows(reader) -> Iterator[tuple[int, int]]:
+            for line, (number, balance) in enumerate(reader, start=2):
+                try:
+                    yield int(number), to_minor(balance)
+                except (InvalidOperation, ValueError) as e:
+                    raise ValueError(f"{path}:{line}: invalid balance {balance!r}") from e
+
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            return cls(rows(reader))
+
+    def replay(
+        self,
+        transfers: Iterable[TransferRecord],
+        on_reject: Callable[[int, int, int, int | None, str], None] | None = None,
+    ) -> Counter:
+        """
+        Apply transfers in order, skipping those `perform_transfer` would reject.
+
+        The checks run in the same order as the service: source exists,
+        destination exists, accounts differ, funds suffice.
+
+        Args:
+            transfers (Iterable[TransferRecord]): Parsed transfers, see `read_transfers`.
+            on_reject (Callable | None): Called with the line, accounts, cents and
+                reason of every rejected transfer.
+
+        Returns:
+            Counter: "applied" plus one count per rejection reason.
+        """
+        slots, cents = self.slots, self.cents
+        outcome = Counter()
+        applied = 0
+        for line, from_acc, to_acc, amount in transfers:
+            if amount is None:
+                reason = INVALID_AMOUNT
+            else:
+                source = slots.get(from_acc)
+                target = slots.get(to_acc)
+                if source is None or target is None:
+                    reason = ACCOUNT_NOT_FOUND
+                elif source == target:
+                    reason = SAME_ACCOUNT
+                elif cents[source] < amount:
+                    reason = INSUFFICIENT_FUNDS
+                else:
+                    cents[source] -= amount
+                    cents[target] += amount
+                    applied += 1
+                    continue
+
+            outcome[reason] += 1
+            if on_reject is not None:
+                on_reject(line, from_acc, to_acc, amount, reason)
+
+        outcome["applied"] = applied
+        return outcome
+
+    def balance(self, account_number: int) -> Decimal:
+        return to_decimal(self.cents[self.slots[account_number]])
+
+    def items(self) -> Iterator[tuple[int, Decimal]]:
+        for account_number, slot in self.slots.items():
+            yield account_number, to_decimal(self.cents[slot])
+
+
+def read_transfers(path: str, fmt: str | None = None) -> Iterator[TransferRecord]:
+    """
+    Stream transfers from a JSONL or CSV file (chosen by extension unless `fmt` is given).
+    """
+    fmt = fmt or ("csv" if path.endswith(".csv") else "jsonl")
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            reader = csv.reader(f)
+            header = next(reader)
+            src = header.index("from_account_number")
+            dst = header.index("to_account_number")
+            amt = header.index("amount")
+            for line, row in enumerate(reader, start=2):
+                yield line, int(row[src]), int(row[dst]), to_cents(row[amt])
+        else:
+            for line, raw in enumerate(f, start=1):
+                if not raw.strip():
+                    continue
+                record = json.loads(raw, parse_float=Decimal)
+                yield (
+                    line,
+                    int(record["from_account_number"]),
+                    int(record["to_account_number"]),
+                    to_cents(record["amount"]),
+                )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("transfers", help="JSONL or CSV file of transfers")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="default: from the file extension")
+    parser.add_argument("--balances", help="CSV snapshot of account_number,balance; default: the database")
+    parser.add_argument("--output", help="write final balances as CSV to this path")
+    parser.add_argument("--rejections", help="write rejected transfers as JSONL to this path")
+    args = parser.parse_args(argv)
+
+    if args.balances:
+        try:
+            ledger = Ledger.from_csv(args.balances)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        ledger = Ledger.from_engines(shard_engines)
+
+    rejections = open(args.rejections, "w") if args.rejections else None
+    try:
+        def on_reject(line, from_acc, to_acc, cents, reason):
+            rejections.write(
+                json.dumps(
+                    {
+                        "line": line,
+                        "from_account_number": from_acc,
+                        "to_account_number": to_acc,
+                        "amount": None if cents is None else str(to_decimal(cents)),
+                        "reason": reason,
+                    }
+                )
+                + "\n"
+            )
+
+        outcome = ledger.replay(
+            read_transfers(args.transfers, args.format), on_reject if rejections else None
+        )
+    finally:
+        if rejections:
+            rejections.close()
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_number", "balance"])
+            writer.writerows(ledger.items())
+
+    json.dump({"accounts": len(ledger.slots), **outcome}, sys.stdout)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Measure how many velocity checks per second one worker can run.
+
+    python -m app.tools.velocity_bench
+    python -m app.tools.velocity_bench --accounts 100000 --checks 1000000
+
+The engine is first filled with `--history` transfers spread over the last
+24 hours, then random accounts are checked (and every tenth check recorded,
+as committed transfers would be). No database is used.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from app.config import VELOCITY_LIMITS
+from app.exceptions import VelocityLimitExceededError
+from app.velocity import VelocityEngine
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--history", type=int, default=100_000, help="transfers recorded before measuring")
+    parser.add_argument("--checks", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    engine = VelocityEngine(VELOCITY_LIMITS)
+    now = time.time()
+    longest = max(VELOCITY_LIMITS)
+    for _ in range(args.history):
+        engine.record(rng.randrange(args.accounts), rng.randrange(100, 10_000), now - rng.random() * longest)
+
+    accounts = [rng.randrange(args.accounts) for _ in range(args.checks)]
+    rejected = 0
+    started = time.perf_counter()
+    for i, account_number in enumerate(accounts):
+        try:
+            engine.check(account_number, 1_000)
+        except VelocityLimitExceededError:
+            rejected += 1
+            continue
+        if i % 10 == 0:
+            engine.record(account_number, 1_000)
+    elapsed = time.perf_counter() - started
+
+    json.dump(
+        {
+            "accounts": args.accounts,
+            "checks": args.checks,
+            "rejected": rejected,
+            "seconds": round(elapsed, 3),
+            "checks_per_second": round(args.checks / elapsed),
+        },
+        sys.stdout,
+    )
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
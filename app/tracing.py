@@ -0,0 +1,429 @@
+"""
+Lightweight request tracing.
+
+Every request on a router using `TracedRoute` may be traced: a root span for
+the request with child spans for authentication, each SQL statement, the
+endpoint (the service call) and response serialization. Incoming W3C
+`traceparent` headers are honoured, so a trace started by a caller continues
+here with its sampling decision; other requests are sampled at
+TRACE_SAMPLE_RATE. Finished spans are buffered in batches of
+TRACE_EXPORT_BATCH_SIZE, which an exporter thread hands to the exporter, so
+requests never wait for it.
+
+Untraced requests pay one context variable lookup per would-be span.
+"""
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Protocol
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import TRACE_EXPORT_BATCH_SIZE, TRACE_EXPORT_MAX_BATCHES, TRACE_EXPORT_PATH, TRACE_SAMPLE_RATE
+
+TRACE_ID_HEADER = "X-Trace-Id"
+# version-trace_id-parent_id-flags, e.g. 00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# Longest SQL statement kept on a span.
+MAX_STATEMENT_LENGTH = 500
+
+
+@dataclass
+class Span:
+    """
+    One timed operation of a trace.
+
+    Attributes:
+        name (str): What was timed, e.g. "GET /accounts/1001/balance" or "sql".
+        trace_id (str): 32 hex digits shared by every span of the trace.
+        span_id (str): 16 hex digits.
+        parent_id (str | None): The enclosing span, or the caller's span for a root.
+        start (float): Epoch seconds.
+        end (float | None): Epoch seconds; None while running.
+        attributes (dict): Details such as the SQL statement or status code.
+    """
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start: float
+    end: float | None = None
+    attributes: dict = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float | None:
+        return None if self.end is None else (self.end - self.start) * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+        }
+
+
+class Exporter(Protocol):
+    def export(self, spans: list[Span]) -> None:
+        ...
+
+
+class InMemoryExporter:
+    """
+    Keep the most recent `max_spans` exported spans, for tests and debugging.
+    """
+
+    def __init__(self, max_spans: int = 10_000):
+        self.spans: deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, spans: list[Span]) -> None:
+        self.spans.extend(spans)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+class FileExporter:
+    """
+    Append spans to a file, one JSON object per line.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: list[Span]) -> None:
+        lines = "".join(json.dumps(span.as_dict(), default=str) + "\n" for span in spans)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    """
+    Read a W3C `traceparent` header.
+
+    Returns:
+        tuple[str, str, bool] | None: (trace id, parent span id, sampled), or
+        None if the header is missing or malformed.
+    """
+    if not header:
+        return None
+
+    match = TRACEPARENT.match(header.strip().lower())
+    if match is None:
+        return None
+
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Creates spans for sampled requests and exports them in batches.
+
+    The span in progress is kept in a context variable, so it follows the
+    request into threadpool-run endpoints and dependencies. Ending a span only
+    appends it to a buffer; full batches wait for the exporter thread started
+    by `start()`. If the exporter falls `max_batches` behind, the oldest batch
+    is dropped and counted; spans are diagnostics, not records.
+    """
+
+    def __init__(
+        self,
+        exporter: Exporter,
+        sample_rate: float = TRACE_SAMPLE_RATE,
+        batch_size: int = TRACE_EXPORT_BATCH_SIZE,
+        rng: Callable[[], float] = random.random,
+        max_batches: int = TRACE_EXPORT_MAX_BATCHES,
+    ):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.rng = rng
+        self._buffer: list[Span] = []
+        self._batches: deque[list[Span]] = deque(maxlen=max_batches)
+        self._cond = threading.Condition()
+        self._export_lock = threading.Lock()
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+        self.dropped = self.export_errors = 0
+
+    def configure(self, exporter: Exporter | None = None, sample_rate: float | None = None) -> None:
+        """
+        Replace the exporter and/or sample rate; buffered spans go to the old exporter first.
+        """
+        with self._export_lock:
+            self._export_pending()
+            if exporter is not None:
+                self.exporter = exporter
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+    def start(self) -> None:
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the exporter thread, then export every buffered span.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    @contextmanager
+    def start_trace(self, name: str, traceparent: str | None = None, **attributes) -> Iterator[Span | None]:
+        """
+        Run a block as the root span of a new trace, or of the caller's trace.
+
+        Yields:
+            Span | None: The root span, or None if the request is not sampled.
+        """
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = None, None, self.rng() < self.sample_rate
+        if not sampled:
+            yield None
+            return
+
+        root = Span(name, trace_id or os.urandom(16).hex(), os.urandom(8).hex(), parent_id, time.time(), attributes=attributes)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.attributes.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(root)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span | None]:
+        """
+        Run a block as a child of the current span; does nothing outside a sampled trace.
+        """
+        span = self.start_span(name, **attributes)
+        if span is None:
+            yield None
+            return
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def start_span(self, name: str, start: float | None = None, **attributes) -> Span | None:
+        """
+        Start a child of the current span without making it current; end it with `end_span`.
+        """
+        parent = _current_span.get()
+        if parent is None:
+            return None
+
+        return Span(
+            name,
+            parent.trace_id,
+            os.urandom(8).hex(),
+            parent.span_id,
+            time.time() if start is None else start,
+            attributes=attributes,
+        )
+
+    def end_span(self, span: Span | None) -> None:
+        if span is None or span.end is not None:
+            return
+
+        span.end = time.time()
+        with self._cond:
+            self._buffer.append(span)
+            if len(self._buffer) < self.batch_size:
+                return
+            self._queue_batch()
+            self._cond.notify_all()
+
+    def flush(self) -> None:
+        """
+        Export the buffered spans now, in the calling thread.
+        """
+        with self._export_lock:
+            self._export_pending()
+
+    def _queue_batch(self) -> None:
+        """
+        Move the buffer to the batches waiting for export; the caller holds `_cond`.
+        """
+        if len(self._batches) == self._batches.maxlen:
+            self.dropped += len(self._batches[0])
+        self._batches.append(self._buffer)
+        self._buffer = []
+
+    def _export_pending(self) -> None:
+        """
+        Export every waiting batch and the partial buffer; the caller holds `_export_lock`.
+        """
+        with self._cond:
+            if self._buffer:
+                self._queue_batch()
+            batches = list(self._batches)
+            self._batches.clear()
+        for batch in batches:
+            self._export(batch)
+
+    def _export(self, batch: list[Span]) -> None:
+        try:
+            self.exporter.export(batch)
+        except Exception:
+            self.export_errors += 1
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping or self._batches)
+                if self._stopping:
+                    return
+            # Taken under the export lock, so batches are exported in order even alongside `flush()`.
+            with self._export_lock:
+                with self._cond:
+                    batch = self._batches.popleft() if self._batches else None
+                if batch is not None:
+                    self._export(batch)
+
+
+tracer = Tracer(FileExporter(TRACE_EXPORT_PATH) if TRACE_EXPORT_PATH else InMemoryExporter())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    span = tracer.start_span("sql", statement=statement[:MAX_STATEMENT_LENGTH])
+    if span is not None:
+        conn.info["trace_span"] = span
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    tracer.end_span(conn.info.pop("trace_span", None))
+
+
+def _handle_error(exception_context) -> None:
+    conn = exception_context.connection
+    span = conn.info.pop("trace_span", None) if conn is not None else None
+    if span is not None:
+        span.attributes["error"] = type(exception_context.original_exception).__name__
+        tracer.end_span(span)
+
+
+def instrument_sql() -> None:
+    """
+    Trace every SQL statement run by any engine; calling it again is harmless.
+    """
+    for name, listener in (
+        ("before_cursor_execute", _before_cursor_execute),
+        ("after_cursor_execute", _after_cursor_execute),
+        ("handle_error", _handle_error),
+    ):
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+
+
+# Set by the traced endpoint to when it returned; the rest of the handler is serialization.
+_endpoint_returned: ContextVar[list | None] = ContextVar("endpoint_returned", default=None)
+
+
+def _traced_endpoint(call: Callable) -> Callable:
+    name = getattr(call, "__name__", "endpoint")
+
+    if inspect.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def traced(**values):
+            with tracer.span("endpoint", function=name):
+                result = await call(**values)
+            returned = _endpoint_returned.get()
+            if returned is not None:
+                returned.append(time.time())
+            return result
+
+    else:
+
+        @functools.wraps(call)
+        def traced(**values):
+            with tracer.span("endpoint", function=name):
+                result = call(**values)
+            returned = _endpoint_returned.get()
+            if returned is not None:
+                returned.append(time.time())
+            return result
+
+    traced.__traced__ = True
+    return traced
+
+
+class TracedRoute(APIRoute):
+    """
+    Route class tracing its requests; the trace id is returned in X-Trace-Id.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not getattr(endpoint, "__traced__", False) and not (
+            inspect.isgeneratorfunction(endpoint) or inspect.isasyncgenfunction(endpoint)
+        ):
+            endpoint = _traced_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            name = f"{request.method} {request.url.path}"
+            with tracer.start_trace(name, request.headers.get("traceparent")) as root:
+                if root is None:
+                    return await handler(request)
+
+                returned: list[float] = []
+                token = _endpoint_returned.set(returned)
+                try:
+                    response = await handler(request)
+                except Exception as e:
+                    root.attributes["status_code"] = getattr(e, "status_code", 500)
+                    raise
+                finally:
+                    _endpoint_returned.reset(token)
+
+                if returned:
+                    tracer.end_span(tracer.start_span("serialize", start=returned[-1]))
+                root.attributes["status_code"] = response.status_code
+                response.headers[TRACE_ID_HEADER] = root.trace_id
+                return response
+
+        return route_handler
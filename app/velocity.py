@@ -0,0 +1,279 @@
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from app.config import TIMEZONE, VELOCITY_BUCKETS, VELOCITY_LIMITS
+from app.exceptions import VelocityLimitExceededError
+from app.models.transfers import Transfer
+
+# Idle accounts are dropped after this many recorded transfers.
+PRUNE_EVERY = 10_000
+
+
+class SlidingWindow:
+    """
+    Transfer count and amount over the last `span` seconds, kept in a ring of
+    `buckets` buckets of `span / buckets` seconds.
+
+    Running totals are maintained as buckets expire, so reading them costs at
+    most one pass over the expired buckets.
+    """
+
+    __slots__ = ("width", "counts", "amounts", "head", "count", "amount")
+
+    def __init__(self, span: int, buckets: int):
+        self.width = span / buckets
+        self.counts = array("q", bytes(8 * buckets))
+        self.amounts = array("q", bytes(8 * buckets))
+        self.head = 0
+        self.count = 0
+        self.amount = 0
+
+    def totals(self, now: float) -> tuple[int, int]:
+        self._advance(int(now // self.width))
+        return self.count, self.amount
+
+    def add(self, at: float, amount: int) -> None:
+        bucket = int(at // self.width)
+        size = len(self.counts)
+        if bucket <= self.head - size:
+            return
+        self._advance(bucket)
+        slot = bucket % size
+        self.counts[slot] += 1
+        self.amounts[slot] += amount
+        self.count += 1
+        self.amount += amount
+
+    def remove(self, at: float, amount: int) -> None:
+        """
+        Take back a transfer added at `at`, unless its bucket has expired since.
+        """
+        bucket = int(at // self.width)
+        size = len(self.counts)
+        if bucket <= self.head - size or bucket > self.head:
+            return
+        slot = bucket % size
+        self.counts[slot] -= 1
+        self.amounts[slot] -= amount
+        self.count -= 1
+        self.amount -= amount
+
+    def _advance(self, bucket: int) -> None:
+        if bucket <= self.head:
+            return
+        size = len(self.counts)
+        if bucket - self.head >= size:
+            for slot in range(size):
+                self.counts[slot] = self.amounts[slot] = 0
+            self.count = self.amount = 0
+        else:
+            for expired in range(self.head + 1, bucket + 1):
+                slot = expired % size
+                self.count -= self.counts[slot]
+                self.amount -= self.amounts[slot]
+                self.counts[slot] = self.amounts[slot] = 0
+        self.head = bucket
+
+
+class AccountVelocity:
+    """
+    The windows of one account and the time of its latest transfer.
+    """
+
+    __slots__ = ("windows", "last")
+
+    def __init__(self, windows: list[SlidingWindow], last: float):
+        self.windows = windows
+        self.last = last
+
+
+class VelocityEngine:
+    """
+    Per-account limits on outgoing transfers over sliding windows, in memory.
+
+    `check_and_record` runs before a transfer touches the database: under one
+    lock it raises if the transfer would break a limit or counts it, so
+    concurrent transfers can not all pass against the same totals. A transfer
+    that then fails is taken back with `release`. `record` adds a transfer
+    counted elsewhere, e.g. while rebuilding.
+
+    Counters are rebuilt from recent transfers at startup, in the background
+    while the worker already serves transfers. They are per worker:
+    each worker counts the transfers it committed itself since it started.
+    """
+
+    def __init__(
+        self,
+        limits: dict[int, tuple[int, int]] = VELOCITY_LIMITS,
+        buckets: int = VELOCITY_BUCKETS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.limits = sorted(limits.items())
+        self.buckets = buckets
+        self.clock = clock
+        self.longest = max(limits)
+        self._accounts: dict[int, AccountVelocity] = {}
+        self._lock = threading.Lock()
+        # Transfers recorded while `rebuild` runs, added to the rebuilt counters.
+        self._during_rebuild: list[tuple[int, int, float]] | None = None
+        self._recorded = 0
+        self.rejections = 0
+
+    def check(self, account_number: int, amount: int, pending: tuple[int, int] = (0, 0)) -> None:
+        """
+        Raise if one more transfer of `amount` would exceed a limit.
+
+        Args:
+            account_number (int): The debited account.
+            amount (int): The amount in minor units.
+            pending (tuple[int, int]): Count and amount of transfers accepted
+                but not yet recorded, e.g. earlier items of the same batch.
+
+        Raises:
+            VelocityLimitExceededError: Naming the first window and limit exceeded.
+        """
+        now = self.clock()
+        with self._lock:
+            self._check(account_number, amount, now, pending)
+
+    def check_and_record(self, account_number: int, amount: int, at: float | None = None) -> float:
+        """
+        Raise if one more transfer of `amount` would exceed a limit, otherwise count it.
+
+        Args:
+            account_number (int): The debited account.
+            amount (int): The amount in minor units.
+            at (float | None): The transfer's time in epoch seconds; now by default.
+
+        Returns:
+            float: The time the transfer was counted at, to pass to `release`.
+
+        Raises:
+            VelocityLimitExceededError: Naming the first window and limit exceeded.
+        """
+        at = self.clock() if at is None else at
+        with self._lock:
+            self._check(account_number, amount, at)
+            self._record(account_number, amount, at)
+        return at
+
+    def release(self, account_number: int, amount: int, at: float) -> None:
+        """
+        Take back a transfer counted by `check_and_record` that did not commit.
+        """
+        with self._lock:
+            account = self._accounts.get(account_number)
+            if account is not None:
+                for window in account.windows:
+                    window.remove(at, amount)
+            if self._during_rebuild is not None and (account_number, amount, at) in self._during_rebuild:
+                self._during_rebuild.remove((account_number, amount, at))
+
+    def record(self, account_number: int, amount: int, at: float | None = None) -> None:
+        """
+        Count a committed transfer from the account, at `at` (epoch seconds) or now.
+        """
+        at = self.clock() if at is None else at
+        with self._lock:
+            self._record(account_number, amount, at)
+
+    def rebuild(self, engines: list[Engine], chunk_size: int = 10_000) -> int:
+        """
+        Replace the counters with the transfers of the longest window, streamed
+        from every shard.
+
+        The worker keeps checking against its current counters meanwhile; the
+        new ones are built aside and swapped in with the transfers recorded
+        since the rebuild started added to them, so none is lost.
+
+        Returns:
+            int: The number of transfers counted.
+        """
+        until = datetime.now(TIMEZONE).replace(tzinfo=None)
+        query = select(Transfer.from_account_number, Transfer.amount, Transfer.timestamp).where(
+            Transfer.timestamp >= until - timedelta(seconds=self.longest), Transfer.timestamp < until
+        )
+        with self._lock:
+            self._during_rebuild = []
+        rebuilt: dict[int, AccountVelocity] = {}
+        counted = 0
+        try:
+            for shard_id, shard_engine in enumerate(engines):
+                with shard_engine.connect() as conn:
+                    result = conn.execution_options(yield_per=chunk_size).execute(query)
+                    for account_number, amount, timestamp in result:
+                        # A cross-shard transfer is stored on both shards; count it on the debited side.
+                        if account_number % len(engines) != shard_id:
+                            continue
+                        self._add(rebuilt, account_number, amount, timestamp.replace(tzinfo=TIMEZONE).timestamp())
+                        counted += 1
+
+            with self._lock:
+                for account_number, amount, at in self._during_rebuild:
+                    self._add(rebuilt, account_number, amount, at)
+                self._accounts = rebuilt
+        finally:
+            with self._lock:
+                self._during_rebuild = None
+
+        return counted
+
+    def reset(self) -> None:
+        with self._lock:
+            self._accounts = {}
+        self.rejections = 0
+
+    def stats(self) -> dict:
+        return {
+            "accounts": len(self._accounts),
+            "limits": {span: {"count": count, "amount": amount} for span, (count, amount) in self.limits},
+            "rejections": self.rejections,
+        }
+
+    def _check(self, account_number: int, amount: int, now: float, pending: tuple[int, int] = (0, 0)) -> None:
+        account = self._accounts.get(account_number)
+        if account is None:
+            totals = [(0, 0)] * len(self.limits)
+        else:
+            totals = [window.totals(now) for window in account.windows]
+
+        for (span, (max_count, max_amount)), (count, total) in zip(self.limits, totals):
+            if count + pending[0] + 1 > max_count:
+                self.rejections += 1
+                raise VelocityLimitExceededError(account_number, span, "count")
+            if total + pending[1] + amount > max_amount:
+                self.rejections += 1
+                raise VelocityLimitExceededError(account_number, span, "amount")
+
+    def _record(self, account_number: int, amount: int, at: float) -> None:
+        self._add(self._accounts, account_number, amount, at)
+        if self._during_rebuild is not None:
+            self._during_rebuild.append((account_number, amount, at))
+
+        self._recorded += 1
+        if self._recorded % PRUNE_EVERY == 0:
+            self._prune(self.clock())
+
+    def _add(self, accounts: dict[int, AccountVelocity], account_number: int, amount: int, at: float) -> None:
+        account = accounts.get(account_number)
+        if account is None:
+            account = accounts[account_number] = AccountVelocity(
+                [SlidingWindow(span, self.buckets) for span, _ in self.limits], at
+            )
+        for window in account.windows:
+            window.add(at, amount)
+        account.last = max(account.last, at)
+
+    def _prune(self, now: float) -> None:
+        idle = [n for n, account in self._accounts.items() if account.last < now - self.longest]
+        for account_number in idle:
+            del self._accounts[account_number]
+
+
+velocity = VelocityEngine()
@@ -4,5 +4,6 @@ set -e
 # Run tests
 pytest --cov=app --cov-report=term-missing -vv
 
-# Start the app
+# Create or migrate the schema, then start the app
+python -m app.tools.migrate
 uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
@@ -4,8 +4,10 @@ import pytest
 from fastapi import HTTPException, status
 
 from app.authentication.oauth import get_current_user
+from app.authentication.revocation import RevocationFilter, revocations
 from app.authentication.token import create_access_token
 from app.config import ALGORITHM, SECRET_KEY
+from app.models.login import RevokedToken
 
 
 def test_create_access_token_default_expiry():
@@ -61,3 +63,57 @@ def test_get_current_user_invalid_token():
     
     assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert "could not validate credentials" in exc.value.detail.lower()
+
+
+def test_create_access_token_has_unique_jti():
+    first = jwt.decode(create_access_token({"sub": "dan"}), SECRET_KEY, algorithms=[ALGORITHM])
+    second = jwt.decode(create_access_token({"sub": "dan"}), SECRET_KEY, algorithms=[ALGORITHM])
+    assert first["jti"] != second["jti"]
+
+
+def test_get_current_user_rejects_revoked_token():
+    token = create_access_token({"sub": "erin"}, expires_delta=timedelta(minutes=1))
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    revocations.add(claims["jti"], claims["exp"])
+
+    with pytest.raises(HTTPException) as exc:
+        get_current_user(token)
+
+    assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_token_is_verified_once_per_request(client, monkeypatch):
+    client.app.dependency_overrides.pop(get_current_user, None)
+    token = create_access_token({"sub": "frank"}, expires_delta=timedelta(minutes=1))
+    real_decode = jwt.decode
+    calls = []
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+    # admission control, profiling and authentication all look at the token
+    resp = client.get("/accounts/9999/balance", headers={"Authorization": f"Bearer {token}", "X-Profile": "1"})
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert calls == [token]
+
+
+def test_revocation_filter_syncs_and_forgets_expired(db_session):
+    now = 1_000_000
+    revocation_filter = RevocationFilter(clock=lambda: now)
+    revocation_filter.add("local", now - 1)
+    db_session.add_all(
+        [
+            RevokedToken(jti="live", expires_at=now + 60, revoked_at=datetime.now()),
+            RevokedToken(jti="expired", expires_at=now - 60, revoked_at=datetime.now()),
+        ]
+    )
+    db_session.commit()
+
+    revocation_filter.sync(db_session)
+
+    assert revocation_filter.is_revoked("live")
+    assert not revocation_filter.is_revoked("expired")
+    assert not revocation_filter.is_revoked("local")
@@ -1,18 +1,27 @@
 from decimal import Decimal
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-from app.database import Base
+from app.account_index import account_index
+from app.audit import audit_log
+from app.circuit_breaker import db_breaker
+from app.database import Base, get_db
 from app.main import app
+from app.memory import memory_tracer
 from app.models.accounts import Customer, CustomerInput
+from app.profiling import profiler
+from app.ratelimit import admission
+from app.readiness import readiness
+from app.velocity import velocity
 
 # in‐memory SQLite for fast, ephemeral state
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -34,6 +43,13 @@ def clear_tables(create_test_db):
         sess.execute(tbl.delete())
     sess.commit()
     sess.close()
+    velocity.reset()
+    account_index.reset()
+    db_breaker.reset()
+    audit_log.reset()
+    profiler.reset()
+    memory_tracer.reset()
+    readiness.reset()
 
 
 # Provide a clean session to each test
@@ -55,8 +71,10 @@ def client(db_session, monkeypatch):
         finally:
             pass
 
-    monkeypatch.setattr("app.database.get_db", _get_test_db)
-    return TestClient(app)
+    app.dependency_overrides[get_db] = _get_test_db
+    admission.reset()
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
 
 
 @pytest.fixture
@@ -69,3 +87,16 @@ def mock_customer_input():
     return CustomerInput(
         name="Bob", email="bob@example.com", initial_deposit=Decimal("100.0")
     )
+
+
+# Count the SQL statements sent to the test database
+@pytest.fixture
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
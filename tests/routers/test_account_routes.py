@@ -1,9 +1,13 @@
+import asyncio
+import msgpack
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import status
 from sqlalchemy.exc import SQLAlchemyError
 
+import app.routers.accounts as accounts_router
 from app.authentication.oauth import get_current_user
+from app.pubsub import balance_broker
 from app.services import accounts as account_service
 
 
@@ -86,3 +90,125 @@ def test_get_balance_returns_500_response(client, monkeypatch):
     assert resp.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     body = resp.json()
     assert "internal server error" in body["detail"].lower()
+
+
+def test_get_balance_etag_and_not_modified(client: TestClient):
+    payload = {"name": "Erin", "email": "erin@example.com", "initial_deposit": 20.0}
+    acct_no = client.post("/accounts/", json=payload).json()["account_number"]
+
+    first = client.get(f"/accounts/{acct_no}/balance")
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+
+    resp = client.get(f"/accounts/{acct_no}/balance", headers={"If-None-Match": etag})
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+    assert resp.headers["etag"] == etag
+    assert resp.content == b""
+
+    stale = client.get(f"/accounts/{acct_no}/balance", headers={"If-None-Match": '"balance-0-0"'})
+    assert stale.status_code == status.HTTP_200_OK
+    assert stale.headers["etag"] == etag
+
+
+def test_get_balance_msgpack(client: TestClient):
+    payload = {"name": "Finn", "email": "finn@example.com", "initial_deposit": 12.5}
+    acct_no = client.post("/accounts/", json=payload).json()["account_number"]
+
+    resp = client.get(f"/accounts/{acct_no}/balance", headers={"Accept": "application/msgpack"})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(resp.content) == {"account_number": acct_no, "balance": 1250}
+
+    # Each representation has its own ETag.
+    json_etag = client.get(f"/accounts/{acct_no}/balance").headers["etag"]
+    assert resp.headers["etag"] != json_etag
+    not_modified = client.get(
+        f"/accounts/{acct_no}/balance",
+        headers={"Accept": "application/msgpack", "If-None-Match": resp.headers["etag"]},
+    )
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_stream_balance_account_not_found(client: TestClient):
+    resp = client.get("/accounts/9999/balance/stream")
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert balance_broker.stats()["subscribers"] == 0
+
+
+def test_stream_balance_subscriber_limit(client: TestClient, monkeypatch):
+    monkeypatch.setattr(balance_broker, "max_subscribers", 0)
+    resp = client.get("/accounts/1/balance/stream")
+    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+def test_balance_events_initial_update_and_heartbeat():
+    class ConnectedRequest:
+        async def is_disconnected(self):
+            return False
+
+    async def scenario():
+        sub = balance_broker.subscribe(7)
+        events = accounts_router.balance_events(
+            ConnectedRequest(), sub, {"account_number": 7, "balance": 500}, heartbeat_seconds=0.01
+        )
+        first = await events.__anext__()
+        heartbeat = await events.__anext__()
+        balance_broker.publish(7, 600, 2)
+        update = await events.__anext__()
+        await events.aclose()
+        return first, heartbeat, update
+
+    first, heartbeat, update = asyncio.run(scenario())
+
+    assert first == 'event: balance\ndata: {"account_number": 7, "balance": "5.00"}\n\n'
+    assert heartbeat == ": heartbeat\n\n"
+    assert '"balance": "6.00"' in update
+    assert balance_broker.stats()["subscribers"] == 0
+
+
+def test_get_balances_reports_missing_per_item(client: TestClient):
+    first = client.post("/accounts/", json={"name": "Ann", "email": "ann@example.com", "initial_deposit": 10.0})
+    second = client.post("/accounts/", json={"name": "Ben", "email": "ben@example.com", "initial_deposit": 20.0})
+    a1, a2 = first.json()["account_number"], second.json()["account_number"]
+
+    resp = client.post("/accounts/balances", json={"account_numbers": [a2, 9999, a1]})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["balances"] == [
+        {"account_number": a2, "balance": "20.00", "error": None},
+        {"account_number": 9999, "balance": None, "error": "Account 9999 not found"},
+        {"account_number": a1, "balance": "10.00", "error": None},
+    ]
+
+
+def test_get_balances_msgpack(client: TestClient):
+    first = client.post("/accounts/", json={"name": "Ann", "email": "ann@example.com", "initial_deposit": 10.0})
+    a1 = first.json()["account_number"]
+
+    resp = client.post(
+        "/accounts/balances",
+        content=msgpack.packb({"account_numbers": [a1, 9999]}),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"},
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert msgpack.unpackb(resp.content)["balances"] == [
+        {"account_number": a1, "balance": 1000, "error": None},
+        {"account_number": 9999, "balance": None, "error": "Account 9999 not found"},
+    ]
+
+
+def test_get_balances_caps_batch_size(client: TestClient):
+    resp = client.post("/accounts/balances", json={"account_numbers": list(range(201))})
+    assert resp.status_code == 422
+
+    resp = client.post("/accounts/balances", json={"account_numbers": []})
+    assert resp.status_code == 422
+
+
+def test_get_balances_returns_500_response(client, monkeypatch):
+    def fake_get_balances(db, numbers):
+        raise SQLAlchemyError("simulated read failure")
+
+    monkeypatch.setattr(account_service, "get_balances", fake_get_balances)
+
+    resp = client.post("/accounts/balances", json={"account_numbers": [1]})
+    assert resp.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
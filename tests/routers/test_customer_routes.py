@@ -0,0 +1,90 @@
+from decimal import Decimal
+import pytest
+from fastapi.testclient import TestClient
+from fastapi import status
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.authentication.oauth import get_current_user
+from app.models.accounts import Account
+from app.services import customers as customers_service
+
+
+@pytest.fixture(autouse=True)
+def override_auth(client: TestClient):
+    client.app.dependency_overrides[get_current_user] = lambda: {"sub": "testuser"}
+    yield
+    client.app.dependency_overrides.pop(get_current_user, None)
+
+
+def create_account(client: TestClient, name: str, email: str, deposit: Decimal) -> dict:
+    resp = client.post(
+        "/accounts/",
+        json={"name": name, "email": email, "initial_deposit": str(deposit)},
+    )
+    assert resp.status_code == status.HTTP_201_CREATED
+    return resp.json()
+
+
+def test_list_customer_accounts_happy_path(client: TestClient):
+    first = create_account(client, "Alice", "alice@example.com", Decimal("10.00"))
+    second = create_account(client, "Alice", "alice@example.com", Decimal("20.00"))
+
+    resp = client.get(f"/customers/{first['customer_id']}/accounts", params={"limit": 1})
+    assert resp.status_code == status.HTTP_200_OK
+    page = resp.json()
+    assert page["email"] == "alice@example.com"
+    assert page["accounts"] == [{"account_number": first["account_number"], "balance": "10.00"}]
+    assert page["next_after"] == first["account_number"]
+
+    resp = client.get(
+        f"/customers/{first['customer_id']}/accounts",
+        params={"after": page["next_after"], "limit": 1},
+    )
+    assert resp.json()["accounts"][0]["account_number"] == second["account_number"]
+
+
+def test_list_customer_accounts_not_found(client: TestClient):
+    resp = client.get("/customers/9999/accounts")
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert resp.json()["detail"] == "Customer 9999 not found"
+
+
+def test_search_customers_happy_path(client: TestClient):
+    create_account(client, "Bob", "bob@example.com", Decimal("5.00"))
+    create_account(client, "Carol", "carol@example.com", Decimal("6.00"))
+
+    resp = client.get("/customers/", params={"email": "bo"})
+    assert resp.status_code == status.HTTP_200_OK
+    body = resp.json()
+    assert [c["email"] for c in body["customers"]] == ["bob@example.com"]
+    assert body["customers"][0]["accounts"][0]["balance"] == "5.00"
+    assert body["next_after"] is None
+
+
+def test_search_customers_rejects_oversized_page(client: TestClient):
+    resp = client.get("/customers/", params={"email": "a", "limit": 10_000})
+    assert resp.status_code == 422
+
+
+def test_search_customers_500(client: TestClient, monkeypatch):
+    monkeypatch.setattr(
+        customers_service,
+        "search_customers_by_email",
+        lambda db, email, after, limit: (_ for _ in ()).throw(SQLAlchemyError("simulated db error")),
+    )
+    resp = client.get("/customers/", params={"email": "a"})
+    assert resp.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+def test_customer_listings_include_zero_balance_accounts(client: TestClient, db_session):
+    drained = create_account(client, "Dave", "dave@example.com", Decimal("7.00"))
+    db_session.get(Account, drained["account_number"]).balance = 0
+    db_session.commit()
+
+    resp = client.get(f"/customers/{drained['customer_id']}/accounts")
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["accounts"] == [{"account_number": drained["account_number"], "balance": "0.00"}]
+
+    resp = client.get("/customers/", params={"email": "dave"})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["customers"][0]["accounts"][0]["balance"] == "0.00"
@@ -0,0 +1,41 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.authentication.oauth import get_current_user
+from app.models.accounts import Account
+
+
+@pytest.fixture(autouse=True)
+def override_auth(client: TestClient):
+    client.app.dependency_overrides[get_current_user] = lambda: {"sub": "testuser"}
+    yield
+    client.app.dependency_overrides.pop(get_current_user, None)
+
+
+def test_reconciliation_runs_in_background_and_reports(client: TestClient, db_session):
+    payload = {"name": "Rae", "email": "rae@example.com", "initial_deposit": "40.00"}
+    acct_no = client.post("/accounts/", json=payload).json()["account_number"]
+    db_session.get(Account, acct_no).balance = 4100
+    db_session.commit()
+
+    started = client.post("/internal/reconciliation")
+    assert started.status_code == status.HTTP_202_ACCEPTED
+    run_id = started.json()["run_id"]
+
+    report = client.get(f"/internal/reconciliation/{run_id}").json()
+    assert report["status"] == "completed"
+    assert report["mismatch_count"] == 1
+    assert report["mismatches"][0]["expected"] == "40.00"
+    assert report["conservation_drift"] == "1.00"
+
+
+def test_reconciliation_unknown_run(client: TestClient):
+    assert client.get("/internal/reconciliation/nope").status_code == status.HTTP_404_NOT_FOUND
+    assert client.post("/internal/reconciliation", params={"resume": "nope"}).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_database_state(client: TestClient):
+    data = client.get("/internal/database").json()
+    assert data["breaker"]["state"] == "closed"
+    assert data["timeouts_ms"]["get_balance"] == {"statement": 500, "lock": 200}
@@ -3,6 +3,7 @@ from fastapi import status
 
 import app.routers.login as login_router
 import app.services.login as login_service
+from app.authentication.token import create_access_token
 
 
 def make_form(username: str, password: str):
@@ -59,3 +60,16 @@ def test_login_invalid_password(client: TestClient, monkeypatch):
     # Assert
     assert resp.status_code == status.HTTP_403_FORBIDDEN
     assert resp.json()["detail"] == "Invalid password"
+
+
+def test_revoke_rejects_token_afterwards(client: TestClient):
+    token = create_access_token({"sub": "admin"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/accounts/1/balance", headers=headers).status_code == status.HTTP_404_NOT_FOUND
+
+    resp = client.post("/login/revoke", headers=headers)
+    assert resp.status_code == status.HTTP_204_NO_CONTENT
+
+    assert client.get("/accounts/1/balance", headers=headers).status_code == status.HTTP_401_UNAUTHORIZED
+    assert client.post("/login/revoke", headers=headers).status_code == status.HTTP_401_UNAUTHORIZED
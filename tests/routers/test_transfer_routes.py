@@ -1,11 +1,18 @@
+from datetime import datetime
 from decimal import Decimal
+import msgpack
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import status
 from sqlalchemy.exc import SQLAlchemyError
 
+import app.services.scheduled_transfers as scheduled_service
 import app.services.transfers as transfer_service
+from app.audit import DatabaseAuditSink, audit_log
 from app.authentication.oauth import get_current_user
+from app.exceptions import CrossShardTransferAbortedError
+from app.models.audit import AuditRecord
+from app.velocity import velocity
 
 
 @pytest.fixture(autouse=True)
@@ -57,6 +64,32 @@ def test_transfer_funds_same_account(client: TestClient):
     assert "same account" in resp.json()["detail"].lower()
 
 
+def test_transfer_funds_rejects_fractional_cents(client: TestClient):
+    acc1 = create_account(client, "Dora", "dora@example.com", Decimal("100"))
+    acc2 = create_account(client, "Ed", "ed@example.com", Decimal("100"))
+    resp = client.post(
+        BASE + "/", json=make_transfer_payload(acc1, acc2, Decimal("10.005"))
+    )
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_transfer_funds_msgpack_body(client: TestClient):
+    acc1 = create_account(client, "Gus", "gus@example.com", Decimal("100"))
+    acc2 = create_account(client, "Hal", "hal@example.com", Decimal("100"))
+
+    for amount in (1234, "12.34"):
+        resp = client.post(
+            BASE + "/",
+            content=msgpack.packb({"from_account_number": acc1, "to_account_number": acc2, "amount": amount}),
+            headers={"Content-Type": "application/msgpack"},
+        )
+        assert resp.status_code == status.HTTP_201_CREATED
+        assert resp.json()["amount"] == "12.34"
+
+    bad = client.post(BASE + "/", content=b"\xc1", headers={"Content-Type": "application/msgpack"})
+    assert bad.status_code == status.HTTP_400_BAD_REQUEST
+
+
 def test_transfer_funds_insufficient(client: TestClient):
     a1 = create_account(client, "Dave", "dave@example.com", Decimal("20.00"))
     a2 = create_account(client, "Eve", "eve@example.com", Decimal("10.00"))
@@ -86,6 +119,17 @@ def test_transfer_funds_500(client: TestClient, monkeypatch):
     assert "internal server error" in resp.json()["detail"].lower()
 
 
+def test_transfer_funds_aborted_by_recovery_409(client: TestClient, monkeypatch):
+    monkeypatch.setattr(
+        transfer_service,
+        "perform_transfer",
+        lambda db, f, t, a: (_ for _ in ()).throw(CrossShardTransferAbortedError("abc123")),
+    )
+    resp = client.post(BASE + "/", json=make_transfer_payload(1, 2, Decimal("1.00")))
+    assert resp.status_code == status.HTTP_409_CONFLICT
+    assert "aborted by recovery" in resp.json()["detail"]
+
+
 def test_get_history_happy_path(client: TestClient):
     a1 = create_account(client, "Frank", "frank@example.com", Decimal("100.00"))
     a2 = create_account(client, "Grace", "grace@example.com", Decimal("50.00"))
@@ -108,6 +152,34 @@ def test_get_history_empty(client: TestClient):
     assert resp.json() == []
 
 
+def test_get_history_etag_changes_after_transfer(client: TestClient):
+    a = create_account(client, "Ivy", "ivy@example.com", Decimal("10.00"))
+    b = create_account(client, "Jack", "jack@example.com", Decimal("10.00"))
+    etag = client.get(f"{BASE}/{a}/transfer_history").headers["etag"]
+
+    resp = client.get(f"{BASE}/{a}/transfer_history", headers={"If-None-Match": etag})
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+
+    client.post(BASE + "/", json=make_transfer_payload(b, a, Decimal("1.00")))
+    resp = client.get(f"{BASE}/{a}/transfer_history", headers={"If-None-Match": etag})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["etag"] != etag
+    assert len(resp.json()) == 1
+
+
+def test_get_history_msgpack(client: TestClient):
+    acc1 = create_account(client, "Ivy", "ivy@example.com", Decimal("100"))
+    acc2 = create_account(client, "Jo", "jo@example.com", Decimal("100"))
+    client.post(BASE + "/", json=make_transfer_payload(acc1, acc2, Decimal("2.50")))
+
+    resp = client.get(f"{BASE}/{acc1}/transfer_history", headers={"Accept": "application/msgpack"})
+    assert resp.status_code == status.HTTP_200_OK
+    [entry] = msgpack.unpackb(resp.content)
+    assert entry["amount"] == 250
+    assert isinstance(entry["timestamp"], float)
+    assert resp.headers["vary"] == "Accept"
+
+
 def test_get_history_account_not_found(client: TestClient):
     resp = client.get(f"{BASE}/9999/transfer_history")
     assert resp.status_code == status.HTTP_404_NOT_FOUND
@@ -123,3 +195,100 @@ def test_get_history_500(client: TestClient, monkeypatch):
     resp = client.get(f"{BASE}/1/transfer_history")
     assert resp.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     assert "internal server error" in resp.json()["detail"].lower()
+
+
+def test_get_statement_pages(client: TestClient):
+    a = create_account(client, "Kim", "kim@example.com", Decimal("100.00"))
+    b = create_account(client, "Lee", "lee@example.com", Decimal("0.01"))
+    for amount in ("10.00", "5.00", "1.00"):
+        client.post(BASE + "/", json=make_transfer_payload(a, b, Decimal(amount)))
+
+    first = client.get(f"{BASE}/{a}/statement", params={"limit": 2}).json()
+    assert [e["balance_after"] for e in first["entries"]] == ["84.00", "85.00"]
+    assert first["next_before"] == first["entries"][-1]["id"]
+
+    rest = client.get(f"{BASE}/{a}/statement", params={"limit": 2, "before": first["next_before"]}).json()
+    assert [e["signed_amount"] for e in rest["entries"]] == ["-10.00"]
+    assert rest["next_before"] is None
+
+
+def test_get_statement_account_not_found(client: TestClient):
+    resp = client.get(f"{BASE}/9999/statement")
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_schedule_transfer_list_runs_and_cancel(client: TestClient, db_session):
+    acc1 = create_account(client, "Kim", "kim@example.com", Decimal("100"))
+    acc2 = create_account(client, "Lou", "lou@example.com", Decimal("0.01"))
+
+    resp = client.post(
+        BASE + "/scheduled",
+        json={
+            "from_account_number": acc1,
+            "to_account_number": acc2,
+            "amount": "25.00",
+            "frequency": "daily",
+            "first_run_at": "2025-01-01T08:00:00",
+        },
+    )
+    assert resp.status_code == status.HTTP_201_CREATED
+    schedule = resp.json()
+    assert schedule["amount"] == "25.00"
+    assert schedule["next_run_at"] == "2025-01-01T08:00:00"
+
+    scheduled_service.run_due_transfers(db_session, now=datetime(2025, 1, 1, 9))
+
+    runs = client.get(f"{BASE}/{acc1}/scheduled/{schedule['id']}/runs").json()
+    assert [run["status"] for run in runs["runs"]] == ["completed"]
+    assert runs["scheduled_transfer"]["next_run_at"] == "2025-01-02T08:00:00"
+
+    assert [s["id"] for s in client.get(f"{BASE}/{acc1}/scheduled").json()] == [schedule["id"]]
+    cancelled = client.delete(f"{BASE}/{acc1}/scheduled/{schedule['id']}")
+    assert cancelled.json()["next_run_at"] is None
+    assert client.delete(f"{BASE}/{acc2}/scheduled/{schedule['id']}").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_transfer_funds_over_velocity_limit(client: TestClient, monkeypatch):
+    acc1 = create_account(client, "Max", "max@example.com", Decimal("100"))
+    acc2 = create_account(client, "Ned", "ned@example.com", Decimal("100"))
+    monkeypatch.setattr(velocity, "limits", [(60, (1, 1_000_000))])
+
+    first = client.post(BASE + "/", json=make_transfer_payload(acc1, acc2, Decimal("1")))
+    assert first.status_code == status.HTTP_201_CREATED
+    second = client.post(BASE + "/", json=make_transfer_payload(acc1, acc2, Decimal("1")))
+    assert second.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert "limit" in second.json()["detail"]
+
+
+def test_transfers_and_history_reads_are_audited(client: TestClient, db_session, monkeypatch):
+    monkeypatch.setattr(audit_log, "sink", DatabaseAuditSink(db_session.get_bind()))
+    client.app.dependency_overrides[get_current_user] = lambda: "teller7"
+    acc1 = create_account(client, "Ivy", "ivy@example.com", Decimal("100"))
+    acc2 = create_account(client, "Jon", "jon@example.com", Decimal("100"))
+
+    client.post(BASE + "/", json=make_transfer_payload(acc1, acc2, Decimal("10")))
+    client.post(BASE + "/", json=make_transfer_payload(acc1, acc1, Decimal("10")))
+    client.get(f"{BASE}/{acc1}/transfer_history")
+    audit_log.flush()
+
+    rows = db_session.query(AuditRecord).order_by(AuditRecord.id).all()
+    assert [(r.subject, r.action, r.resource, r.status_code) for r in rows] == [
+        ("teller7", "account.create", str(acc1), 201),
+        ("teller7", "account.create", str(acc2), 201),
+        ("teller7", "transfer.create", f"{acc1}->{acc2}", 201),
+        ("teller7", "transfer.create", f"{acc1}->{acc1}", 400),
+        ("teller7", "transfer.history", str(acc1), 200),
+    ]
+
+
+def test_not_modified_history_read_is_audited_as_304(client: TestClient, db_session, monkeypatch):
+    monkeypatch.setattr(audit_log, "sink", DatabaseAuditSink(db_session.get_bind()))
+    acc1 = create_account(client, "Kim", "kim@example.com", Decimal("100"))
+
+    etag = client.get(f"{BASE}/{acc1}/transfer_history").headers["etag"]
+    resp = client.get(f"{BASE}/{acc1}/transfer_history", headers={"If-None-Match": etag})
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+    audit_log.flush()
+
+    rows = db_session.query(AuditRecord).filter(AuditRecord.action == "transfer.history").order_by(AuditRecord.id)
+    assert [r.status_code for r in rows] == [200, 304]
@@ -1,10 +1,11 @@
-from decimal import Decimal
+from dataclasses import FrozenInstanceError
 import pytest
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.query import Query
 
+from app.account_index import account_index
 from app.exceptions import AccountNotFoundError
-from app.models.accounts import Customer
+from app.models.accounts import Account, Customer
 from app.services import accounts as service
 
 
@@ -67,16 +68,16 @@ def test_create_account_success_customer_exists(db_session, mock_customer_record
     db_session.refresh(mock_customer_record)
 
     resp = service.create_account_for_customer(
-        db_session, mock_customer_record, Decimal("100.00")
+        db_session, mock_customer_record, 10000
     )
     assert resp.account_number is not None
-    assert resp.balance == Decimal("100.00")
+    assert resp.balance == 10000
 
 
 def test_get_account_by_number_success(db_session, mock_customer_input):
 
     cust = service.create_customer(db_session, mock_customer_input)
-    acct = service.create_account_for_customer(db_session, cust, Decimal("50.0"))
+    acct = service.create_account_for_customer(db_session, cust, 5000)
 
     resp = service.get_account_by_number(db_session, acct.account_number)
 
@@ -88,3 +89,57 @@ def test_get_account_by_number_success(db_session, mock_customer_input):
 def test_get_account_not_found(db_session):
     with pytest.raises(AccountNotFoundError):
         service.get_account_by_number(db_session, 999999)
+
+
+def test_get_balances_single_query(db_session, mock_customer_input, count_queries):
+    cust = service.create_customer(db_session, mock_customer_input)
+    numbers = [
+        service.create_account_for_customer(db_session, cust, n).account_number
+        for n in (5, 6, 7)
+    ]
+    count_queries.clear()
+
+    balances = service.get_balances(db_session, numbers + [numbers[0], 424242])
+
+    assert balances == dict(zip(numbers, [5, 6, 7]))
+    assert len(count_queries) == 1
+
+
+def test_read_account_returns_immutable_snapshot(db_session, mock_customer_input):
+    cust = service.create_customer(db_session, mock_customer_input)
+    acct = service.create_account_for_customer(db_session, cust, 4200)
+
+    snapshot = service.read_account(db_session, acct.account_number)
+    assert snapshot.balance == 4200
+    assert snapshot.customer_id == cust.customer_id
+    with pytest.raises(FrozenInstanceError):
+        snapshot.balance = 0
+
+
+def test_read_account_not_found(db_session):
+    with pytest.raises(AccountNotFoundError):
+        service.read_account(db_session, 999999)
+
+
+def test_account_index_rejects_unknown_accounts_without_a_query(
+    db_session, mock_customer_input, count_queries, monkeypatch
+):
+    cust = service.create_customer(db_session, mock_customer_input)
+    highest = service.create_account_for_customer(db_session, cust, 100).account_number + 10
+    db_session.add(Account(account_number=highest, customer_id=cust.customer_id, balance=0, initial_deposit=0))
+    db_session.commit()
+    monkeypatch.setattr(account_index, "margin", 0)
+    account_index.sync([db_session.get_bind()])
+    missing = highest - 5
+    count_queries.clear()
+
+    with pytest.raises(AccountNotFoundError):
+        service.get_account_by_number(db_session, missing)
+    assert service.get_account_version(db_session, missing) is None
+    assert count_queries == []
+
+    # Accounts created by this worker are usable at once, even below the trusted range.
+    db_session.add(Account(account_number=missing, customer_id=cust.customer_id, balance=7, initial_deposit=7))
+    db_session.commit()
+    account_index.add(missing)
+    assert service.get_account_by_number(db_session, missing).balance == 7
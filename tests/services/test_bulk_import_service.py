@@ -0,0 +1,98 @@
+import io
+import json
+
+import pytest
+
+from app.models.accounts import Account, Customer
+from app.models.imports import ImportCheckpoint
+from app.models.transfers import Transfer
+from app.services import bulk_import as import_service
+
+ACCOUNTS_CSV = """account_number,name,email,initial_deposit
+501,Ann,ann@example.com,100.00
+502,Ben,ben@example.com,50.50
+503,Ann,ann@example.com,10
+504,Cy,not-an-email,10
+501,Dup,dup@example.com,10
+"""
+
+
+def write_transfers(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+
+def transfer(f, t, amount, ts="2020-01-01T10:00:00"):
+    return {"from_account_number": f, "to_account_number": t, "amount": amount, "timestamp": ts}
+
+
+@pytest.fixture
+def engine(db_session):
+    engine = db_session.get_bind()
+    import_service.drop_deferred_indexes(engine)
+    yield engine
+    import_service.create_deferred_indexes(engine)
+
+
+def test_import_accounts_and_transfers_then_recompute_balances(engine, db_session, tmp_path):
+    accounts = tmp_path / "accounts.csv"
+    accounts.write_text(ACCOUNTS_CSV)
+    transfers = tmp_path / "transfers.jsonl"
+    write_transfers(
+        transfers,
+        [
+            transfer(501, 502, "20.00"),
+            transfer(502, 503, "0.50", "2020-01-02T10:00:00+00:00"),
+            transfer(501, 999, "1.00"),
+            transfer(501, 501, "1.00"),
+            transfer(501, 502, "1.005"),
+        ],
+    )
+    rejects = io.StringIO()
+    reports = []
+
+    loaded = import_service.load_file(engine, "test", "accounts", str(accounts), 2, rejects, reports.append)
+    moved = import_service.load_file(engine, "test", "transfers", str(transfers), 2, rejects)
+    import_service.create_deferred_indexes(engine)
+    assert import_service.recompute_balances(engine) == 3
+
+    assert (loaded.rows, loaded.loaded, loaded.rejected) == (5, 3, 2)
+    assert (moved.rows, moved.loaded, moved.rejected) == (5, 2, 3)
+    assert len(reports) == 3
+    assert [json.loads(line)["row"] for line in rejects.getvalue().splitlines()] == [4, 5, 3, 4, 5]
+
+    balances = dict(db_session.query(Account.account_number, Account.balance).all())
+    assert balances == {501: 8000, 502: 7000, 503: 1050}
+    assert db_session.query(Customer).count() == 2
+    assert db_session.query(Transfer).count() == 2
+
+
+def test_interrupted_import_resumes_after_the_last_committed_chunk(engine, db_session, tmp_path, monkeypatch):
+    accounts = tmp_path / "accounts.csv"
+    accounts.write_text(ACCOUNTS_CSV)
+    import_service.load_file(engine, "test", "accounts", str(accounts))
+    transfers = tmp_path / "transfers.csv"
+    transfers.write_text(
+        "from_account_number,to_account_number,amount,timestamp\n"
+        + "".join(f"501,502,{i}.00,2020-01-01T10:00:00\n" for i in range(1, 8))
+    )
+
+    write = import_service._write_transfers
+    calls = []
+
+    def flaky_write(conn, rows):
+        calls.append(len(rows))
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        write(conn, rows)
+
+    monkeypatch.setattr(import_service, "_write_transfers", flaky_write)
+    with pytest.raises(KeyboardInterrupt):
+        import_service.load_file(engine, "test", "transfers", str(transfers), chunk_size=2)
+    assert db_session.query(Transfer).count() == 4
+
+    monkeypatch.setattr(import_service, "_write_transfers", write)
+    progress = import_service.load_file(engine, "test", "transfers", str(transfers), chunk_size=2)
+
+    assert (progress.resumed_at, progress.rows, progress.loaded) == (4, 7, 7)
+    assert sorted(a for (a,) in db_session.query(Transfer.amount).all()) == [i * 100 for i in range(1, 8)]
+    assert db_session.get(ImportCheckpoint, "test:transfers").rows == 7
@@ -0,0 +1,214 @@
+from decimal import Decimal
+import pytest
+from sqlalchemy import create_engine
+
+import app.services.accounts as account_service
+import app.services.cross_shard as cross_shard_service
+import app.services.transfers as transfer_service
+from app.database import Base
+from app.exceptions import CrossShardTransferAbortedError, InsufficientFundsError
+from app.models.accounts import Account, CustomerInput
+from app.models.sharding import ABORTED, COMPLETED, PREPARED, PreparedLeg, ShardTransaction
+from app.models.transfers import Transfer
+from app.money import to_minor
+from app.services.scheduled_transfers import TransferScheduler
+from app.sharding import ShardRouter
+
+
+class Crash(BaseException):
+    """Simulates the process dying between two steps of the protocol."""
+
+
+@pytest.fixture
+def router(tmp_path):
+    engines = [create_engine(f"sqlite:///{tmp_path}/shard{i}.db") for i in range(2)]
+    for shard_engine in engines:
+        Base.metadata.create_all(shard_engine)
+    yield ShardRouter(engines)
+    for shard_engine in engines:
+        shard_engine.dispose()
+
+
+@pytest.fixture
+def sharded_session(router):
+    sess = router.sessionmaker()()
+    try:
+        yield sess
+    finally:
+        sess.close()
+
+
+def open_account(db, email: str, deposit: str) -> int:
+    cust = account_service.create_customer(
+        db, CustomerInput(name=email, email=email, initial_deposit=Decimal(deposit))
+    )
+    return account_service.create_account_for_customer(db, cust, to_minor(deposit)).account_number
+
+
+@pytest.fixture
+def accounts_on_two_shards(router, sharded_session):
+    """
+    Open accounts until there is one on shard 0 and one on shard 1, 100 each.
+    """
+    by_shard = {}
+    i = 0
+    while len(by_shard) < 2:
+        number = open_account(sharded_session, f"user{i}@example.com", "100.00")
+        by_shard.setdefault(router.shard_for_account(number), number)
+        i += 1
+    return by_shard[0], by_shard[1]
+
+
+def balance_on_shard(router, account_number: int) -> int:
+    with router.session_for_shard(router.shard_for_account(account_number)) as s:
+        return s.get(Account, account_number).balance
+
+
+def test_allocated_numbers_route_to_owning_shard(router, sharded_session):
+    number = open_account(sharded_session, "carol@example.com", "10.00")
+    shard_id = router.shard_for_account(number)
+
+    assert shard_id == router.shard_for_email("carol@example.com")
+    with router.session_for_shard(shard_id) as s:
+        assert s.get(Account, number) is not None
+    with router.session_for_shard(1 - shard_id) as s:
+        assert s.get(Account, number) is None
+
+    assert account_service.get_account_by_number(sharded_session, number).balance == 1000
+
+
+def test_same_shard_transfer_is_local(router, sharded_session):
+    first = open_account(sharded_session, "dave@example.com", "50.00")
+    cust = account_service.get_account_by_number(sharded_session, first).customer
+    second = account_service.create_account_for_customer(sharded_session, cust, 500).account_number
+
+    transfer_service.perform_transfer(sharded_session, first, second, 2000)
+
+    assert balance_on_shard(router, first) == 3000
+    assert balance_on_shard(router, second) == 2500
+    with router.session_for_shard(1 - router.shard_for_account(first)) as s:
+        assert s.query(Transfer).count() == 0
+        assert s.query(ShardTransaction).count() == 0
+
+
+def test_cross_shard_transfer_commits_on_both_shards(router, sharded_session, accounts_on_two_shards):
+    a, b = accounts_on_two_shards
+
+    record = transfer_service.perform_transfer(sharded_session, a, b, 4000)
+
+    assert record.amount == 4000
+    assert balance_on_shard(router, a) == 6000
+    assert balance_on_shard(router, b) == 14000
+    for account_number in (a, b):
+        history = transfer_service.get_transfer_history_for_account(sharded_session, account_number)
+        assert [(t.from_account_number, t.to_account_number) for t in history] == [(a, b)]
+    statement = transfer_service.get_statement(sharded_session, b, None, 10)
+    assert [(r.signed_amount, r.balance_after) for r in statement] == [(4000, 14000)]
+    # debit side: reserved at prepare, history at commit; credit side: commit only
+    assert account_service.get_account_version(sharded_session, a) == 3
+    assert account_service.get_account_version(sharded_session, b) == 2
+    with router.session_for_shard(0) as s:
+        assert s.query(ShardTransaction.state).scalar() == COMPLETED
+
+
+def test_cross_shard_insufficient_funds_aborts(router, sharded_session, accounts_on_two_shards):
+    a, b = accounts_on_two_shards
+
+    with pytest.raises(InsufficientFundsError):
+        transfer_service.perform_transfer(sharded_session, a, b, 50000)
+
+    assert balance_on_shard(router, a) == 10000
+    assert balance_on_shard(router, b) == 10000
+    with router.session_for_shard(0) as s:
+        assert s.query(ShardTransaction.state).scalar() == ABORTED
+
+
+def test_recovery_aborts_undecided_transfer(router, accounts_on_two_shards, monkeypatch):
+    a, b = accounts_on_two_shards
+
+    def crash(*args, **kwargs):
+        raise Crash()
+
+    monkeypatch.setattr(cross_shard_service, "_decide", crash)
+    with pytest.raises(Crash):
+        cross_shard_service.perform_cross_shard_transfer(router, a, b, 3000)
+    monkeypatch.undo()
+
+    # funds are reserved while the transfer is in doubt
+    assert balance_on_shard(router, a) == 7000
+
+    assert cross_shard_service.recover_cross_shard_transfers(router, grace_seconds=0) == 1
+    assert balance_on_shard(router, a) == 10000
+    assert balance_on_shard(router, b) == 10000
+    for shard_id in range(2):
+        with router.session_for_shard(shard_id) as s:
+            assert s.query(PreparedLeg).filter(PreparedLeg.state == PREPARED).count() == 0
+            assert s.query(Transfer).count() == 0
+
+
+def test_recovery_completes_decided_transfer(router, accounts_on_two_shards, monkeypatch):
+    a, b = accounts_on_two_shards
+    real_commit_leg = cross_shard_service._commit_leg
+
+    def crash_after_first_leg(router_, shard_id, txid, account_number):
+        real_commit_leg(router_, shard_id, txid, account_number)
+        raise Crash()
+
+    monkeypatch.setattr(cross_shard_service, "_commit_leg", crash_after_first_leg)
+    with pytest.raises(Crash):
+        cross_shard_service.perform_cross_shard_transfer(router, a, b, 3000)
+    monkeypatch.undo()
+
+    # recent undecided transfers are left alone, decided ones are rolled forward
+    assert cross_shard_service.recover_cross_shard_transfers(router) == 1
+    assert balance_on_shard(router, a) == 7000
+    assert balance_on_shard(router, b) == 13000
+    for shard_id in range(2):
+        with router.session_for_shard(shard_id) as s:
+            assert s.query(Transfer).count() == 1
+    with router.session_for_shard(0) as s:
+        assert s.query(ShardTransaction.state).scalar() == COMPLETED
+
+
+def test_transfer_aborted_by_recovery_while_preparing(router, accounts_on_two_shards, monkeypatch):
+    a, b = accounts_on_two_shards
+    real_prepare_leg = cross_shard_service._prepare_leg
+
+    def stall_then_recover(router_, tx, coordinator, account_number):
+        real_prepare_leg(router_, tx, coordinator, account_number)
+        if account_number == b:
+            # another worker's recovery gives up on the stalled transaction
+            cross_shard_service.recover_cross_shard_transfers(router_, grace_seconds=0)
+
+    monkeypatch.setattr(cross_shard_service, "_prepare_leg", stall_then_recover)
+    with pytest.raises(CrossShardTransferAbortedError):
+        cross_shard_service.perform_cross_shard_transfer(router, a, b, 3000)
+
+    assert balance_on_shard(router, a) == 10000
+    assert balance_on_shard(router, b) == 10000
+
+
+def test_scheduler_runs_recovery_periodically(router, accounts_on_two_shards, monkeypatch):
+    a, b = accounts_on_two_shards
+    real_commit_leg = cross_shard_service._commit_leg
+
+    def crash_after_first_leg(router_, shard_id, txid, account_number):
+        real_commit_leg(router_, shard_id, txid, account_number)
+        raise Crash()
+
+    monkeypatch.setattr(cross_shard_service, "_commit_leg", crash_after_first_leg)
+    with pytest.raises(Crash):
+        cross_shard_service.perform_cross_shard_transfer(router, a, b, 3000)
+    monkeypatch.undo()
+
+    now = [0.0]
+    scheduler = TransferScheduler(router, recovery_seconds=30, clock=lambda: now[0])
+    assert scheduler.recover_if_due() == 1
+    assert balance_on_shard(router, b) == 13000
+
+    calls = []
+    monkeypatch.setattr(cross_shard_service, "recover_cross_shard_transfers", lambda r: calls.append(r) or 0)
+    scheduler.recover_if_due()
+    now[0] = 30.0
+    scheduler.recover_if_due()
+    assert calls == [router]
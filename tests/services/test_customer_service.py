@@ -0,0 +1,75 @@
+from decimal import Decimal
+import pytest
+
+from app.exceptions import CustomerNotFoundError
+from app.models.accounts import CustomerInput
+from app.services import accounts as account_service
+from app.services import customers as service
+
+
+def make_customer(db, email: str, accounts: int):
+    cust = account_service.create_customer(
+        db, CustomerInput(name=email, email=email, initial_deposit=Decimal("1"))
+    )
+    for i in range(accounts):
+        account_service.create_account_for_customer(db, cust, (10 + i) * 100)
+    return cust
+
+
+def test_get_customer_accounts_pages_by_account_number(db_session):
+    cust = make_customer(db_session, "ann@example.com", 5)
+    make_customer(db_session, "ben@example.com", 2)
+
+    _, first = service.get_customer_accounts(db_session, cust.customer_id, limit=3)
+    _, second = service.get_customer_accounts(
+        db_session, cust.customer_id, after=first[-1].account_number, limit=3
+    )
+
+    numbers = [a.account_number for a in first + second]
+    assert numbers == sorted(numbers)
+    assert len(numbers) == 5
+    assert all(a.customer_id == cust.customer_id for a in first + second)
+
+
+def test_get_customer_accounts_uses_two_statements(db_session, count_queries):
+    customer_id = make_customer(db_session, "ann@example.com", 20).customer_id
+    db_session.expire_all()
+    count_queries.clear()
+
+    customer, accounts = service.get_customer_accounts(db_session, customer_id, limit=50)
+    [a.balance for a in accounts]
+    customer.email
+
+    assert len(accounts) == 20
+    assert len(count_queries) == 2
+
+
+def test_get_customer_accounts_not_found(db_session):
+    with pytest.raises(CustomerNotFoundError):
+        service.get_customer_accounts(db_session, 12345)
+
+
+def test_search_by_prefix_loads_accounts_in_fixed_statements(db_session, count_queries):
+    for name in ("amy", "anna", "anton", "bob"):
+        make_customer(db_session, f"{name}@example.com", 3)
+    db_session.expire_all()
+    count_queries.clear()
+
+    customers = service.search_customers_by_email(db_session, "an")
+    balances = [a.balance for c in customers for a in c.accounts]
+
+    assert [c.email for c in customers] == ["anna@example.com", "anton@example.com"]
+    assert len(balances) == 6
+    assert len(count_queries) == 2
+
+
+def test_search_keyset_pagination_and_literal_prefix(db_session):
+    for name in ("a_1", "ab1", "ac1"):
+        make_customer(db_session, f"{name}@example.com", 0)
+
+    # "_" is matched literally, not as a LIKE wildcard
+    assert [c.email for c in service.search_customers_by_email(db_session, "a_")] == ["a_1@example.com"]
+
+    page = service.search_customers_by_email(db_session, "a", limit=2)
+    rest = service.search_customers_by_email(db_session, "a", after=page[-1].email, limit=2)
+    assert [c.email for c in page + rest] == ["a_1@example.com", "ab1@example.com", "ac1@example.com"]
@@ -1,4 +1,9 @@
-from app.services.login import hash_password, verify_password, verify_username
+from datetime import datetime
+
+from app.authentication.revocation import revocations
+from app.config import TIMEZONE
+from app.models.login import RevokedToken
+from app.services.login import hash_password, revoke_token, verify_password, verify_username
 
 def test_verify_username_match():
     assert verify_username("alice", "alice") is True
@@ -24,3 +29,15 @@ def test_verify_password_wrong():
     plain = "MyPassw0rd"
     hashed = hash_password(plain)
     assert verify_password("NotMyPassword", hashed) is False
+
+
+def test_concurrent_revocation_of_the_same_token_is_a_no_op(db_session, monkeypatch):
+    # Another logout stores the token between this one's lookup and insert.
+    db_session.add(RevokedToken(jti="abc", expires_at=2_000_000_000, revoked_at=datetime.now(TIMEZONE)))
+    db_session.commit()
+    monkeypatch.setattr(db_session, "get", lambda model, key: None)
+
+    revoke_token(db_session, "abc", 2_000_000_000)
+
+    assert revocations.is_revoked("abc")
+    assert db_session.query(RevokedToken).count() == 1
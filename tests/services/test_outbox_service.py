@@ -0,0 +1,160 @@
+import json
+import logging
+import threading
+from decimal import Decimal
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import app.services.accounts as account_service
+import app.services.outbox as outbox_service
+import app.services.transfers as transfer_service
+from app.exceptions import InsufficientFundsError
+from app.models.outbox import OutboxEvent, OutboxOffset
+
+
+@pytest.fixture
+def session_factory(db_session):
+    return sessionmaker(bind=db_session.get_bind())
+
+
+@pytest.fixture
+def two_accounts(db_session, mock_customer_input):
+    cust = account_service.create_customer(db_session, mock_customer_input)
+    acct1 = account_service.create_account_for_customer(db_session, cust, 20000)
+    acct2 = account_service.create_account_for_customer(db_session, cust, 5000)
+    return acct1.account_number, acct2.account_number
+
+
+class FailingSink:
+    def publish(self, events):
+        raise ConnectionError("sink down")
+
+
+class FlakySink:
+    """Fails the first `failures` publishes, then stops the relay once one succeeds."""
+
+    def __init__(self, failures: int, stop: threading.Event):
+        self.failures = failures
+        self.stop = stop
+        self.published = []
+
+    def publish(self, events):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("sink down")
+        self.published.extend(events)
+        self.stop.set()
+
+
+def test_events_written_with_account_and_transfer(db_session, two_accounts):
+    acct1, acct2 = two_accounts
+    tx = transfer_service.perform_transfer(db_session, acct1, acct2, 7500)
+
+    events = db_session.query(OutboxEvent).order_by(OutboxEvent.id).all()
+    assert [e.event_type for e in events] == [
+        outbox_service.ACCOUNT_CREATED,
+        outbox_service.ACCOUNT_CREATED,
+        outbox_service.TRANSFER_COMPLETED,
+    ]
+    payload = json.loads(events[-1].payload)
+    assert payload["transfer_id"] == tx.id
+    assert payload["from_account_number"] == acct1
+    assert Decimal(payload["amount"]) == Decimal("75")
+
+
+def test_rejected_transfer_writes_no_event(db_session, two_accounts):
+    acct1, acct2 = two_accounts
+    with pytest.raises(InsufficientFundsError):
+        transfer_service.perform_transfer(db_session, acct2, acct1, 50000)
+
+    assert db_session.query(OutboxEvent).filter_by(
+        event_type=outbox_service.TRANSFER_COMPLETED
+    ).count() == 0
+
+
+def test_relay_publishes_in_order_and_resumes(db_session, session_factory, two_accounts):
+    acct1, acct2 = two_accounts
+    sink = outbox_service.QueueSink()
+
+    relay = outbox_service.OutboxRelay(session_factory, sink, batch_size=2)
+    assert relay.relay_once() == 2
+    assert relay.relay_once() == 0
+
+    transfer_service.perform_transfer(db_session, acct1, acct2, 100)
+
+    # a fresh relay with the same name continues from the stored offset
+    resumed = outbox_service.OutboxRelay(session_factory, sink, batch_size=2)
+    assert resumed.relay_once() == 1
+
+    ids = [sink.queue.get_nowait()["id"] for _ in range(3)]
+    assert ids == sorted(ids)
+    assert db_session.get(OutboxOffset, "default").last_event_id == ids[-1]
+
+
+def test_failed_publish_does_not_advance_offset(db_session, session_factory, two_accounts):
+    relay = outbox_service.OutboxRelay(session_factory, FailingSink())
+    with pytest.raises(ConnectionError):
+        relay.relay_once()
+
+    sink = outbox_service.QueueSink()
+    assert outbox_service.OutboxRelay(session_factory, sink).relay_once() == 2
+
+
+def test_relay_retries_after_failures_with_backoff(session_factory, two_accounts, caplog):
+    stop = threading.Event()
+    sink = FlakySink(failures=2, stop=stop)
+    relay = outbox_service.OutboxRelay(session_factory, sink)
+
+    with caplog.at_level(logging.ERROR, logger=outbox_service.__name__):
+        relay.run(stop, poll_interval=0.001)
+
+    assert len(sink.published) == 2
+    assert len(caplog.records) == 2
+    assert "failed 2 times in a row" in caplog.records[-1].getMessage()
+
+
+def test_relay_gives_up_after_max_failures(session_factory, two_accounts):
+    relay = outbox_service.OutboxRelay(session_factory, FailingSink())
+
+    with pytest.raises(ConnectionError):
+        relay.run(threading.Event(), poll_interval=0.001, max_failures=3)
+
+
+def test_relay_tool_exits_non_zero_when_a_relay_stops(session_factory, two_accounts, monkeypatch, capsys):
+    from app.tools import outbox_relay
+
+    monkeypatch.setattr(
+        outbox_relay, "build_relays", lambda target, name, batch_size: [
+            outbox_service.OutboxRelay(session_factory, FailingSink(), name, batch_size)
+        ]
+    )
+    with pytest.raises(SystemExit) as exc:
+        outbox_relay.main(["queue:", "--poll-interval", "0.001", "--max-failures", "2"])
+
+    assert exc.value.code == 1
+    assert "sink down" in capsys.readouterr().err
+
+
+def test_relay_waits_on_gap_until_grace_expires(db_session, session_factory, two_accounts):
+    first, second = db_session.query(OutboxEvent).order_by(OutboxEvent.id).all()
+    db_session.delete(first)
+    db_session.commit()
+
+    waiting = outbox_service.OutboxRelay(
+        session_factory, outbox_service.QueueSink(), gap_grace_seconds=60
+    )
+    assert waiting.relay_once() == 0
+
+    skipping = outbox_service.OutboxRelay(
+        session_factory, outbox_service.QueueSink(), gap_grace_seconds=0
+    )
+    assert skipping.relay_once() == 1
+
+
+def test_file_sink_appends_json_lines(tmp_path, session_factory, two_accounts):
+    path = tmp_path / "events.jsonl"
+    relay = outbox_service.OutboxRelay(session_factory, outbox_service.sink_from_url(f"file:{path}"))
+    relay.relay_once()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["type"] for line in lines] == [outbox_service.ACCOUNT_CREATED] * 2
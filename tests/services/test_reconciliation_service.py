@@ -0,0 +1,92 @@
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+import app.services.accounts as account_service
+import app.services.reconciliation as reconciliation_service
+import app.services.transfers as transfer_service
+from app.database import Base
+from app.exceptions import ReconciliationRunNotFoundError
+from app.models.accounts import Account, CustomerInput
+from app.models.reconciliation import COMPLETED, ReconciliationRange
+
+
+@pytest.fixture
+def bank(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bank.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        cust = account_service.create_customer(
+            db, CustomerInput(name="Ann", email="ann@example.com", initial_deposit=Decimal("1"))
+        )
+        numbers = [
+            account_service.create_account_for_customer(db, cust, 10000).account_number
+            for _ in range(5)
+        ]
+        transfer_service.perform_transfer(db, numbers[0], numbers[1], 1250)
+        transfer_service.perform_transfer(db, numbers[1], numbers[4], 25)
+    return engine, factory, numbers
+
+
+def run(engine, factory, chunk_size=2):
+    run_id = reconciliation_service.start_reconciliation([engine], factory, chunk_size)
+    reconciliation_service.resume_reconciliation([engine], factory, run_id, workers=2)
+    with factory() as session:
+        return reconciliation_service.get_reconciliation_report(session, run_id)
+
+
+def test_consistent_ledger_reports_no_drift(bank):
+    engine, factory, numbers = bank
+
+    report = run(engine, factory)
+
+    assert report.status == COMPLETED
+    assert report.ranges_done == report.ranges_total == 3
+    assert report.accounts == 5
+    assert report.total_balance == Decimal("500.00")
+    assert report.conservation_drift == 0
+    assert report.mismatches == []
+
+
+def test_lost_update_is_reported(bank):
+    engine, factory, numbers = bank
+    with engine.begin() as conn:
+        conn.execute(
+            update(Account).where(Account.account_number == numbers[1]).values(balance=10000)
+        )
+
+    report = run(engine, factory)
+
+    assert [(m.account_number, m.expected) for m in report.mismatches] == [(numbers[1], Decimal("112.25"))]
+    assert report.conservation_drift == Decimal("-12.25")
+
+
+def test_resume_checks_only_pending_ranges(bank, monkeypatch):
+    engine, factory, numbers = bank
+    run_id = reconciliation_service.start_reconciliation([engine], factory, 2)
+    with factory() as session:
+        first = session.query(ReconciliationRange).order_by(ReconciliationRange.range_start).first()
+        first.accounts, first.total_balance, first.total_initial_deposits = 2, 0, 0
+        first.in_flight, first.mismatches = 0, "[]"
+        first.checked_at = datetime.now()
+        session.commit()
+
+    checked = []
+    real_check = reconciliation_service.check_range
+    monkeypatch.setattr(
+        reconciliation_service,
+        "check_range",
+        lambda conn, start, end: checked.append(start) or real_check(conn, start, end),
+    )
+    reconciliation_service.resume_reconciliation([engine], factory, run_id, workers=1)
+
+    assert sorted(checked) == [numbers[2], numbers[4]]
+
+
+def test_unknown_run(bank):
+    engine, factory, _ = bank
+    with pytest.raises(ReconciliationRunNotFoundError):
+        reconciliation_service.resume_reconciliation([engine], factory, "missing")
@@ -0,0 +1,132 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+
+import app.services.accounts as account_service
+import app.services.cross_shard as cross_shard_service
+import app.services.scheduled_transfers as scheduled_service
+from app.database import Base
+from app.exceptions import SameAccountError
+from app.models.accounts import Account, CustomerInput
+from app.models.scheduled_transfers import (COMPLETED, PENDING, REJECTED, ScheduledTransfer,
+                                            ScheduledTransferRun)
+from app.models.transfers import Transfer
+from app.sharding import ShardRouter
+
+
+class Crash(BaseException):
+    """Simulates the scheduler dying after recording a run as pending."""
+
+
+@pytest.fixture
+def two_accounts(db_session, mock_customer_input):
+    cust = account_service.create_customer(db_session, mock_customer_input)
+    acct1 = account_service.create_account_for_customer(db_session, cust, 10000)
+    acct2 = account_service.create_account_for_customer(db_session, cust, 0)
+    return acct1.account_number, acct2.account_number
+
+
+def test_next_run_after_skips_missed_runs_and_keeps_month_day():
+    monthly = ScheduledTransfer(
+        frequency="monthly", first_run_at=datetime(2025, 1, 31), next_run_at=datetime(2025, 1, 31)
+    )
+    assert scheduled_service.next_run_after(monthly, datetime(2025, 1, 31)) == datetime(2025, 2, 28)
+    monthly.next_run_at = datetime(2025, 2, 28)
+    assert scheduled_service.next_run_after(monthly, datetime(2025, 2, 28)) == datetime(2025, 3, 31)
+
+    daily = ScheduledTransfer(
+        frequency="daily", first_run_at=datetime(2025, 1, 1), next_run_at=datetime(2025, 1, 1, 9)
+    )
+    assert scheduled_service.next_run_after(daily, datetime(2025, 1, 5, 12)) == datetime(2025, 1, 6, 9)
+
+    once = ScheduledTransfer(frequency="once", first_run_at=datetime(2025, 1, 1), next_run_at=datetime(2025, 1, 1))
+    assert scheduled_service.next_run_after(once, datetime(2025, 1, 1)) is None
+
+
+def test_create_rejects_same_account(db_session, two_accounts):
+    a, _ = two_accounts
+    with pytest.raises(SameAccountError):
+        scheduled_service.create_scheduled_transfer(db_session, a, a, 100, "once", datetime(2025, 1, 1))
+
+
+def test_run_due_transfers_executes_batch_and_records_outcomes(db_session, two_accounts):
+    a, b = two_accounts
+    weekly = scheduled_service.create_scheduled_transfer(db_session, a, b, 6000, "weekly", datetime(2025, 1, 1))
+    once = scheduled_service.create_scheduled_transfer(db_session, a, b, 6000, "once", datetime(2025, 1, 1, 1))
+    later = scheduled_service.create_scheduled_transfer(db_session, a, b, 100, "once", datetime(2025, 2, 1))
+
+    claimed = scheduled_service.run_due_transfers(db_session, now=datetime(2025, 1, 2))
+
+    assert claimed == 2
+    runs = {run.scheduled_transfer_id: run for run in db_session.query(ScheduledTransferRun).all()}
+    assert runs[weekly.id].status == COMPLETED
+    assert runs[weekly.id].transfer_id == db_session.query(Transfer).one().id
+    assert runs[once.id].status == REJECTED
+    assert "Insufficient funds" in runs[once.id].error
+    assert later.id not in runs
+
+    db_session.refresh(weekly)
+    db_session.refresh(once)
+    assert weekly.next_run_at == datetime(2025, 1, 8)
+    assert once.next_run_at is None
+    assert account_service.get_account_by_number(db_session, b).balance == 6000
+
+    # Nothing is due again until next week.
+    assert scheduled_service.run_due_transfers(db_session, now=datetime(2025, 1, 3)) == 0
+
+
+def test_cancel_stops_schedule(db_session, two_accounts):
+    a, b = two_accounts
+    schedule = scheduled_service.create_scheduled_transfer(db_session, a, b, 100, "daily", datetime(2025, 1, 1))
+
+    scheduled_service.cancel_scheduled_transfer(db_session, a, schedule.id)
+
+    assert scheduled_service.run_due_transfers(db_session, now=datetime(2025, 1, 2)) == 0
+
+
+def test_cross_shard_run_left_pending_by_a_crash_is_resumed(tmp_path, monkeypatch):
+    router = ShardRouter([create_engine(f"sqlite:///{tmp_path}/shard{i}.db") for i in range(2)])
+    for shard_engine in router.engines:
+        Base.metadata.create_all(shard_engine)
+    by_shard = {}
+    i = 0
+    with router.sessionmaker()() as db:
+        while len(by_shard) < 2:
+            email = f"user{i}@example.com"
+            i += 1
+            cust = account_service.create_customer(
+                db, CustomerInput(name=email, email=email, initial_deposit=Decimal("100.00"))
+            )
+            number = account_service.create_account_for_customer(db, cust, 10000).account_number
+            by_shard.setdefault(router.shard_for_account(number), number)
+        a, b = by_shard[0], by_shard[1]
+        schedule_id = scheduled_service.create_scheduled_transfer(db, a, b, 3000, "once", datetime(2025, 1, 1)).id
+
+    def crash(*args, **kwargs):
+        raise Crash()
+
+    monkeypatch.setattr(cross_shard_service, "perform_cross_shard_transfer", crash)
+    with router.session_for_shard(0) as db, pytest.raises(Crash):
+        scheduled_service.run_due_transfers(db, router, now=datetime(2025, 1, 1))
+    monkeypatch.undo()
+
+    with router.session_for_shard(0) as db:
+        # The schedule moved on and the run is left pending; it is not stale yet.
+        assert db.get(ScheduledTransfer, schedule_id).next_run_at is None
+        scheduled_service.run_due_transfers(db, router, now=datetime(2025, 1, 1, 0, 1))
+        assert db.query(ScheduledTransferRun.status).scalar() == PENDING
+
+        scheduled_service.run_due_transfers(db, router, now=datetime(2025, 1, 1, 1))
+        run = db.query(ScheduledTransferRun).one()
+        assert run.status == COMPLETED
+        assert run.transfer_id == db.query(Transfer.id).scalar()
+        assert db.get(Account, a).balance == 7000
+
+        # A settled run is never executed again.
+        assert scheduled_service.resume_pending_runs(db, router, now=datetime(2025, 1, 2)) == 0
+    with router.session_for_shard(1) as db:
+        assert db.get(Account, b).balance == 13000
+    for shard_engine in router.engines:
+        shard_engine.dispose()
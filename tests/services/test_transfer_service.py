@@ -1,12 +1,13 @@
 from datetime import datetime
-from decimal import Decimal
 import pytest
 
 import app.services.accounts as account_service
 import app.services.transfers as transfer_service
+from app.account_index import account_index
 from app.exceptions import (AccountNotFoundError, InsufficientFundsError,
-                            SameAccountError)
+                            SameAccountError, VelocityLimitExceededError)
 from app.models.transfers import Transfer
+from app.velocity import velocity
 
 
 @pytest.fixture
@@ -18,34 +19,46 @@ def two_accounts(db_session, mock_customer_input):
     """
     cust = account_service.create_customer(db_session, mock_customer_input)
     acct1 = account_service.create_account_for_customer(
-        db_session, cust, Decimal("200")
+        db_session, cust, 20000
     )
-    acct2 = account_service.create_account_for_customer(db_session, cust, Decimal("50"))
+    acct2 = account_service.create_account_for_customer(db_session, cust, 5000)
     return acct1, acct2
 
 
 def test_perform_transfer_success(db_session, two_accounts):
     acct1, acct2 = two_accounts
     tx = transfer_service.perform_transfer(
-        db_session, acct1.account_number, acct2.account_number, Decimal("75")
+        db_session, acct1.account_number, acct2.account_number, 7500
     )
 
     a1 = account_service.get_account_by_number(db_session, acct1.account_number)
     a2 = account_service.get_account_by_number(db_session, acct2.account_number)
 
-    assert a1.balance == Decimal("125")
-    assert a2.balance == Decimal("125")
+    assert a1.balance == 12500
+    assert a2.balance == 12500
 
     assert isinstance(tx, Transfer)
-    assert tx.amount == Decimal("75")
+    assert tx.amount == 7500
     assert isinstance(tx.timestamp, datetime)
 
 
+def test_perform_transfer_bumps_both_versions(db_session, two_accounts):
+    acct1, acct2 = two_accounts
+    before = [account_service.get_account_version(db_session, a.account_number) for a in two_accounts]
+
+    transfer_service.perform_transfer(
+        db_session, acct1.account_number, acct2.account_number, 1000
+    )
+
+    after = [account_service.get_account_version(db_session, a.account_number) for a in two_accounts]
+    assert after == [v + 1 for v in before]
+
+
 def test_same_account_error(db_session, two_accounts):
     acct1, _ = two_accounts
     with pytest.raises(SameAccountError):
         transfer_service.perform_transfer(
-            db_session, acct1.account_number, acct1.account_number, Decimal("10")
+            db_session, acct1.account_number, acct1.account_number, 1000
         )
 
 
@@ -55,24 +68,49 @@ def test_insufficient_funds_error(db_session, two_accounts):
 
     with pytest.raises(InsufficientFundsError):
         transfer_service.perform_transfer(
-            db_session, acct2.account_number, acct1.account_number, Decimal("100")
+            db_session, acct2.account_number, acct1.account_number, 10000
         )
 
 
+def test_failed_transfer_does_not_count_towards_velocity(db_session, two_accounts, monkeypatch):
+    acct1, acct2 = two_accounts
+    monkeypatch.setattr(velocity, "limits", [(60, (1, 1_000_000))])
+
+    with pytest.raises(InsufficientFundsError):
+        transfer_service.perform_transfer(db_session, acct2.account_number, acct1.account_number, 10000)
+    transfer_service.perform_transfer(db_session, acct2.account_number, acct1.account_number, 1000)
+
+    with pytest.raises(VelocityLimitExceededError):
+        transfer_service.perform_transfer(db_session, acct2.account_number, acct1.account_number, 1000)
+
+
 def test_perform_transfer_account_not_found(db_session):
     # no accounts in DB yet
     with pytest.raises(AccountNotFoundError):
-        transfer_service.perform_transfer(db_session, 9999, 8888, Decimal("10"))
+        transfer_service.perform_transfer(db_session, 9999, 8888, 1000)
+
+
+def test_unknown_source_account_gets_no_velocity_counters(db_session, two_accounts, monkeypatch):
+    acct1, _ = two_accounts
+    monkeypatch.setattr(account_index, "margin", 0)
+    account_index.sync([db_session.get_bind()])
+
+    with pytest.raises(AccountNotFoundError):
+        transfer_service.perform_transfer(db_session, acct1.account_number - 1, acct1.account_number, 1000)
+    results, _ = transfer_service.perform_transfer_batch(db_session, [(4, acct1.account_number, 1000)])
+
+    assert isinstance(results[0], AccountNotFoundError)
+    assert velocity.stats()["accounts"] == 0
 
 
 def test_get_transfer_history(db_session, two_accounts):
     acct1, acct2 = two_accounts
     # make two transfers
     tx1 = transfer_service.perform_transfer(
-        db_session, acct1.account_number, acct2.account_number, Decimal("10")
+        db_session, acct1.account_number, acct2.account_number, 1000
     )
     tx2 = transfer_service.perform_transfer(
-        db_session, acct2.account_number, acct1.account_number, Decimal("5")
+        db_session, acct2.account_number, acct1.account_number, 500
     )
 
     history = transfer_service.get_transfer_history_for_account(
@@ -80,6 +118,62 @@ def test_get_transfer_history(db_session, two_accounts):
     )
 
     assert len(history) == 2
-    assert history[0].amount == Decimal("5")
-    assert history[1].amount == Decimal("10")
+    assert history[0].amount == 500
+    assert history[1].amount == 1000
     assert all(isinstance(rec, Transfer) for rec in history)
+
+
+def test_perform_transfer_publishes_committed_balances(db_session, two_accounts, monkeypatch):
+    acct1, acct2 = two_accounts
+    published = []
+    monkeypatch.setattr(
+        transfer_service.balance_broker, "publish", lambda n, b, v: published.append((n, b, v))
+    )
+
+    transfer_service.perform_transfer(
+        db_session, acct1.account_number, acct2.account_number, 7500
+    )
+
+    assert published == [
+        (acct1.account_number, 12500, 2),
+        (acct2.account_number, 12500, 2),
+    ]
+
+
+def test_get_statement_running_balance_and_pages(db_session, two_accounts):
+    acct1, acct2 = two_accounts
+    a, b = acct1.account_number, acct2.account_number
+    transfer_service.perform_transfer(db_session, a, b, 1010)
+    transfer_service.perform_transfer(db_session, b, a, 300)
+    transfer_service.perform_transfer(db_session, a, b, 2000)
+
+    first = transfer_service.get_statement(db_session, a, None, 2)
+    assert [r.signed_amount for r in first] == [-2000, 300]
+    assert [r.balance_after for r in first] == [17290, 19290]
+
+    rest = transfer_service.get_statement(db_session, a, first[-1].id, 2)
+    assert [(r.signed_amount, r.balance_after) for r in rest] == [(-1010, 18990)]
+
+
+def test_get_statement_account_not_found(db_session):
+    with pytest.raises(AccountNotFoundError):
+        transfer_service.get_statement(db_session, 999999, None, 10)
+
+
+def test_perform_transfer_batch_applies_in_order_and_rejects_per_item(db_session, two_accounts):
+    acct1, acct2 = two_accounts
+    a, b = acct1.account_number, acct2.account_number
+
+    results, balances = transfer_service.perform_transfer_batch(
+        db_session, [(a, b, 15000), (a, b, 10000), (b, a, 1000), (a, a, 100), (a, 424242, 100)]
+    )
+    db_session.commit()
+
+    assert isinstance(results[0], Transfer)
+    assert isinstance(results[1], InsufficientFundsError)
+    assert isinstance(results[2], Transfer)
+    assert isinstance(results[3], SameAccountError)
+    assert isinstance(results[4], AccountNotFoundError)
+    assert {n: balance for n, (balance, _) in balances.items()} == {a: 6000, b: 19000}
+    assert balances[a][1] == balances[b][1] == 2
+    assert db_session.query(Transfer).count() == 2
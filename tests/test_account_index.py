@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from app.account_index import AccountIndex
+from app.models.accounts import Account, Customer
+from app.models.imports import ImportCheckpoint
+
+
+def add_accounts(db_session, numbers):
+    customer = Customer(name="Bob", email="bob@example.com")
+    db_session.add(customer)
+    db_session.flush()
+    for n in numbers:
+        db_session.add(Account(account_number=n, customer_id=customer.customer_id, balance=0, initial_deposit=0))
+    db_session.commit()
+
+
+def test_everything_might_exist_until_loaded():
+    index = AccountIndex(margin=0)
+    assert index.might_exist(1)
+    assert index.might_exist(123456789)
+
+
+def test_sync_rejects_only_numbers_below_the_trusted_range(db_session):
+    add_accounts(db_session, [1, 2, 3, 5, 8, 13, 21])
+    index = AccountIndex(margin=5)
+
+    assert index.sync([db_session.get_bind()]) == 7
+    assert index.stats()["trusted_up_to"] == [16]
+    assert index.might_exist(13)
+    assert not index.might_exist(4)
+    assert not index.might_exist(0)
+    assert not index.might_exist(-3)
+    # Within the margin or above it, the database decides.
+    assert index.might_exist(17)
+    assert index.might_exist(10_000)
+    assert index.stats()["rejections"] == 3
+
+
+def test_sync_loads_only_new_numbers_and_add_is_immediate(db_session):
+    add_accounts(db_session, [1, 2, 3])
+    index = AccountIndex(margin=0)
+    index.sync([db_session.get_bind()])
+    assert index.stats()["trusted_up_to"] == [3]
+
+    db_session.add(Account(account_number=2_000, customer_id=1, balance=0, initial_deposit=0))
+    db_session.commit()
+    assert index.sync([db_session.get_bind()]) == 1
+    assert index.might_exist(2_000)
+    assert not index.might_exist(1_999)
+
+    index.add(1_500)
+    assert index.might_exist(1_500)
+    assert index.stats()["bitmap_bytes"] >= 2_000 // 8
+
+
+def test_sync_reloads_a_shard_after_an_import_below_the_trusted_range(db_session):
+    add_accounts(db_session, [100, 101, 102])
+    index = AccountIndex(margin=0)
+    index.sync([db_session.get_bind()])
+    assert not index.might_exist(7)
+
+    # As written by a bulk import chunk: a historical number and its checkpoint.
+    db_session.add(Account(account_number=7, customer_id=1, balance=0, initial_deposit=0))
+    db_session.add(ImportCheckpoint(name="legacy:accounts", rows=1, loaded=1, rejected=0, updated_at=datetime(2024, 1, 1)))
+    db_session.commit()
+
+    assert index.sync([db_session.get_bind()]) == 4
+    assert index.might_exist(7)
+    assert not index.might_exist(8)
+    assert index.sync([db_session.get_bind()]) == 0
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import time
+
+from app.audit import AUDIT_STATE_KEY, AuditEntry, AuditLog, AuditMiddleware, FileAuditSink
+
+
+class ListSink:
+    def __init__(self, failures: int = 0):
+        self.batches = []
+        self.failures = failures
+
+    def write(self, events):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.batches.append([e.action for e in events])
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_flush_writes_in_batches_and_retries_failed_batches_in_order():
+    log = AuditLog(max_queue=10, batch_size=2)
+    log.sink = ListSink(failures=1)
+    for action in "abcde":
+        log.record("teller", action)
+
+    assert log.flush() == 0
+    assert log.stats()["write_errors"] == 1
+    assert log.flush() == 5
+    assert log.sink.batches == [["a", "b"], ["c", "d"], ["e"]]
+    assert log.stats()["queue_depth"] == 0
+
+
+def test_full_queue_drops_after_waiting_or_at_once():
+    for policy in ("block", "drop"):
+        log = AuditLog(max_queue=2, policy=policy, enqueue_timeout=0.01)
+        assert log.record("teller", "a")
+        assert log.record("teller", "b")
+        assert not log.record("teller", "c")
+        assert log.stats()["dropped"] == 1
+
+
+def test_middleware_drops_at_once_when_the_queue_is_full():
+    log = AuditLog(max_queue=1, policy="block", enqueue_timeout=5)
+    log.record("teller", "a")
+
+    async def endpoint(scope, receive, send):
+        scope["state"][AUDIT_STATE_KEY] = AuditEntry("teller", "b", None)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    started = time.monotonic()
+    asyncio.run(AuditMiddleware(endpoint, log)({"type": "http", "state": {}}, None, send))
+
+    assert time.monotonic() - started < 1
+    assert log.stats()["dropped"] == 1
+
+
+def test_stats_report_depth_and_writer_lag():
+    clock = FakeClock()
+    log = AuditLog(clock=clock)
+    log.record("teller", "a")
+    clock.now += 2.5
+    log.record("teller", "b")
+
+    stats = log.stats()
+    assert (stats["queue_depth"], stats["lag_seconds"], stats["enqueued"]) == (2, 2.5, 2)
+
+
+def test_stop_writes_everything_queued():
+    log = AuditLog(batch_size=100, flush_seconds=60)
+    sink = ListSink()
+    log.start(sink)
+    for i in range(250):
+        log.record("teller", str(i))
+    log.stop()
+
+    assert sum(len(batch) for batch in sink.batches) == 250
+    assert log.stats()["written"] == 250
+
+
+def test_file_sink_rotates(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    log = AuditLog(batch_size=1)
+    log.sink = FileAuditSink(str(path), max_bytes=150, backups=2)
+    for i in range(6):
+        log.record("teller", "transfer.create", f"{i}->9")
+    log.flush()
+
+    assert json.loads(path.read_text().splitlines()[-1])["resource"] == "5->9"
+    assert (tmp_path / "audit.jsonl.1").exists()
+    assert (tmp_path / "audit.jsonl.2").exists()
+    assert not (tmp_path / "audit.jsonl.3").exists()
@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, db_breaker, instrument_engine
+from app.config import DEFAULT_DB_TIMEOUTS, DB_TIMEOUTS
+from app.database import get_db
+from app.exceptions import DatabaseUnavailableError
+
+
+class FakeClock:
+    def __init__(self, now: float = 100.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_after_reset():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10, clock=clock)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now += 4
+    with pytest.raises(DatabaseUnavailableError) as exc:
+        breaker.allow()
+    assert exc.value.retry_after == 6
+
+    clock.now += 6
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(DatabaseUnavailableError):
+        breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now += 10
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.allow()
+    assert breaker.stats()["trips"] == 2
+    assert breaker.stats()["rejections"] == 2
+
+
+def test_engine_events_feed_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+    unreachable = create_engine("sqlite:////nonexistent/dir/bank.db")
+    instrument_engine(unreachable, breaker)
+
+    for _ in range(2):
+        with pytest.raises(OperationalError):
+            with unreachable.connect():
+                pass
+    assert breaker.state == OPEN
+
+    healthy = create_engine("sqlite://")
+    instrument_engine(healthy, breaker)
+    breaker.state = HALF_OPEN
+    with healthy.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert breaker.state == CLOSED
+
+
+def request_for(endpoint: str) -> SimpleNamespace:
+    return SimpleNamespace(scope={"route": SimpleNamespace(name=endpoint)})
+
+
+def test_get_db_applies_endpoint_timeouts():
+    sessions = get_db(request_for("get_balance"))
+    assert next(sessions).info["db_timeouts"] == DB_TIMEOUTS["get_balance"]
+    sessions.close()
+
+    sessions = get_db(request_for("search_customers"))
+    assert next(sessions).info["db_timeouts"] == DEFAULT_DB_TIMEOUTS
+    sessions.close()
+
+
+def test_get_db_fails_fast_while_breaker_is_open():
+    for _ in range(db_breaker.failure_threshold):
+        db_breaker.record_failure()
+
+    with pytest.raises(HTTPException) as exc:
+        next(get_db(request_for("get_balance")))
+    assert exc.value.status_code == 503
+    assert int(exc.value.headers["Retry-After"]) >= 1
@@ -1,25 +1,55 @@
+import json
+import subprocess
+import sys
+
 from fastapi.testclient import TestClient
 
+# Budget for `import app.main` in a fresh interpreter, and modules it must leave to first use.
+IMPORT_BUDGET_SECONDS = 3.0
+LAZY_MODULES = ("passlib", "bcrypt", "jwt", "cryptography", "jose")
+
 
-def test_startup_event_calls_create_all(monkeypatch):
+def test_startup_leaves_the_schema_alone(monkeypatch):
     # Import here so we patch before the handler is bound
     import app.main  # registers the startup event
-    from app.database import Base, engine
+    from app.database import Base
+    from app.readiness import readiness
 
     called = []
-    # Patch Base.metadata.create_all
-    monkeypatch.setattr(
-        Base.metadata,
-        "create_all",
-        lambda eng: called.append(eng),
-    )
+    monkeypatch.setattr(Base.metadata, "create_all", lambda eng: called.append(eng))
 
     # Now instantiate the TestClient, which triggers startup
-    with TestClient(app.main.app):
-        pass
+    with TestClient(app.main.app) as client:
+        response = client.get("/ready")
+
+    # The database is unreachable here, so the worker never becomes ready
+    assert called == []
+    assert response.status_code == 503
+    assert set(response.json()["checks"]) == {"database_pool", "velocity", "account_index", "revocations"}
+    readiness.reset()
+
+
+def test_import_stays_within_budget_and_loads_auth_lazily():
+    code = (
+        "import json, sys, time; started = time.perf_counter(); import app.main; "
+        "print(json.dumps([time.perf_counter() - started, sorted(sys.modules)]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    seconds, modules = json.loads(result.stdout)
+
+    # -X importtime lines: "import time: self [us] | cumulative | module"
+    slowest = sorted(
+        (line.split("|") for line in result.stderr.splitlines()[1:] if line.startswith("import time:")),
+        key=lambda fields: int(fields[1]),
+        reverse=True,
+    )[:15]
+    profile = "\n".join(f"{int(cumulative) / 1e6:7.3f}s {name.rstrip()}" for _, cumulative, name in slowest)
+    assert seconds < IMPORT_BUDGET_SECONDS, f"import app.main took {seconds:.2f}s:\n{profile}"
+    eager = [name for name in modules if name.split(".")[0] in LAZY_MODULES]
+    assert not eager, f"imported at startup: {eager}"
 
-    # Assert our fake was called exactly once with the real engine
-    assert called == [engine]
 
 def test_landing_page_happy_path(client):
     response = client.get("/")
@@ -0,0 +1,72 @@
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.authentication.token import create_access_token
+from app.exceptions import MemoryTracingInactiveError
+from app.memory import MemoryTracer, memory_tracer
+
+
+def auth_headers() -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}"}
+
+
+class Blob:
+    pass
+
+
+def test_snapshot_reports_growth_since_the_previous_one():
+    tracer = MemoryTracer()
+    with pytest.raises(MemoryTracingInactiveError):
+        tracer.snapshot()
+
+    tracer.start(frames=5)
+    try:
+        kept = [Blob() for _ in range(2_000)]
+        report = tracer.snapshot(limit=10)
+        again = tracer.snapshot(limit=10)
+    finally:
+        tracer.stop()
+
+    assert len(report["top_allocations"]) <= 10
+    assert any(__file__ in line for stat in report["growth"] for line in stat["traceback"])
+    blobs = next(entry for entry in report["object_counts"] if entry["type"].endswith(".Blob"))
+    assert blobs["diff"] == len(kept)
+    assert all(not entry["type"].endswith(".Blob") for entry in again["object_counts"])
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracing_stops_by_itself():
+    tracer = MemoryTracer(max_seconds=0.01)
+    tracer.start()
+    tracer._timer.join(1)
+
+    assert not tracer.tracing
+    assert tracer.stats()["started_at"] is None
+
+
+def test_peak_memory_is_recorded_per_request_while_tracing(client: TestClient):
+    payload = {"name": "Ann", "email": "ann@example.com", "initial_deposit": "10.00"}
+    account_number = client.post("/accounts/", json=payload, headers=auth_headers()).json()["account_number"]
+    client.get(f"/transfers/{account_number}/transfer_history", headers=auth_headers())
+    assert memory_tracer.stats()["requests"] == {}
+
+    started = client.post("/internal/memory/tracing", params={"frames": 3}, headers=auth_headers()).json()
+    assert started["tracing"] and started["frames"] == 3
+    assert client.post("/internal/memory/tracing", params={"frames": 100}, headers=auth_headers()).status_code == 422
+
+    client.get(f"/transfers/{account_number}/transfer_history", headers=auth_headers())
+    client.get(f"/transfers/{account_number}/statement", headers=auth_headers())
+    snapshot = client.post("/internal/memory/snapshots", params={"limit": 5}, headers=auth_headers()).json()
+    state = client.get("/internal/memory", headers=auth_headers()).json()
+    stopped = client.delete("/internal/memory/tracing", headers=auth_headers()).json()
+
+    assert len(snapshot["top_allocations"]) <= 5
+    assert set(state["requests"]) == {"get_transfer_history", "get_statement"}
+    history = state["requests"]["get_transfer_history"]
+    assert history["count"] == 1
+    assert history["recent"][0]["peak_bytes"] == history["max_peak_bytes"] > 0
+    assert history["recent"][0]["overlapped"] is False
+    assert not stopped["tracing"]
+    assert client.post("/internal/memory/snapshots", headers=auth_headers()).status_code == 409
@@ -0,0 +1,124 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from app.database import Base
+from app.migrations import MIGRATIONS, pending_migrations, run_migrations
+from app.models.accounts import Account
+
+
+def test_migrations_are_noops_on_fresh_schema_and_run_once():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+
+    assert run_migrations(engine) == [name for name, _ in MIGRATIONS]
+    assert run_migrations(engine) == []
+
+
+def test_migrations_add_indexes_to_existing_tables():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_accounts_customer_id_account_number")
+
+    run_migrations(engine)
+
+    names = {ix["name"] for ix in inspect(engine).get_indexes("accounts")}
+    assert "ix_accounts_customer_id_account_number" in names
+
+
+def test_migrations_add_version_column_to_existing_accounts():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO accounts (account_number, balance) VALUES (1, 5)")
+        conn.exec_driver_sql("ALTER TABLE accounts DROP COLUMN version")
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT version FROM accounts").scalar() == 1
+
+
+def test_migrations_backfill_initial_deposit_from_ledger():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO accounts (account_number, balance) VALUES (1, 70), (2, 30)")
+        conn.exec_driver_sql(
+            "INSERT INTO transfers (from_account_number, to_account_number, amount, timestamp) "
+            "VALUES (1, 2, 25, '2025-01-01')"
+        )
+        conn.exec_driver_sql("ALTER TABLE accounts DROP COLUMN initial_deposit")
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT account_number, initial_deposit FROM accounts ORDER BY 1").all()
+    assert [(n, float(v)) for n, v in rows] == [(1, 95.0), (2, 5.0)]
+
+
+def test_migrations_convert_decimal_money_to_minor_units():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE transfers")
+        conn.exec_driver_sql(
+            "CREATE TABLE transfers (id INTEGER PRIMARY KEY, from_account_number INTEGER, "
+            "to_account_number INTEGER, amount NUMERIC(10, 2), timestamp DATETIME)"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO transfers (from_account_number, to_account_number, amount, timestamp) "
+            "VALUES (1, 2, 12.34, '2025-01-01')"
+        )
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT amount FROM transfers").scalar() == 1234
+
+
+def test_migrate_tool_creates_the_schema_on_every_shard(monkeypatch, capsys):
+    from app.tools import migrate
+
+    engines = [create_engine("sqlite://"), create_engine("sqlite://")]
+    monkeypatch.setattr(migrate, "shard_engines", engines)
+
+    migrate.main([])
+
+    applied = json.loads(capsys.readouterr().out)["applied"]
+    assert applied == {"0": [name for name, _ in MIGRATIONS], "1": [name for name, _ in MIGRATIONS]}
+    assert all("accounts" in inspect(e).get_table_names() for e in engines)
+
+
+def test_bulk_import_tool_requires_a_migrated_database(monkeypatch, tmp_path):
+    from app.sharding import ShardRouter
+    from app.tools import bulk_import
+
+    engine = create_engine("sqlite://")
+    monkeypatch.setattr(bulk_import, "shard_router", ShardRouter([engine]))
+    accounts = tmp_path / "accounts.csv"
+    accounts.write_text("account_number,name,email,initial_deposit\n")
+
+    assert pending_migrations(engine) == [name for name, _ in MIGRATIONS]
+    with pytest.raises(SystemExit):
+        bulk_import.main(["--accounts", str(accounts)])
+    assert "accounts" not in inspect(engine).get_table_names()
+
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    assert pending_migrations(engine) == []
+
+
+def test_bulk_import_tool_refuses_a_sharded_deployment(monkeypatch, tmp_path, capsys):
+    from app.sharding import ShardRouter
+    from app.tools import bulk_import
+
+    monkeypatch.setattr(bulk_import, "shard_router", ShardRouter([create_engine("sqlite://"), create_engine("sqlite://")]))
+    accounts = tmp_path / "accounts.csv"
+    accounts.write_text("account_number,name,email,initial_deposit\n")
+
+    with pytest.raises(SystemExit):
+        bulk_import.main(["--accounts", str(accounts)])
+    assert "import before sharding" in capsys.readouterr().err
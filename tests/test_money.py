@@ -0,0 +1,17 @@
+from decimal import Decimal
+
+import pytest
+
+from app.money import to_decimal, to_minor
+
+
+def test_to_minor_and_back():
+    assert to_minor(Decimal("123.45")) == 12345
+    assert to_minor(Decimal("100.0")) == 10000
+    assert to_decimal(12345) == Decimal("123.45")
+    assert str(to_decimal(500)) == "5.00"
+
+
+def test_to_minor_rejects_fractional_minor_units():
+    with pytest.raises(ValueError):
+        to_minor(Decimal("1.234"))
@@ -0,0 +1,18 @@
+import msgpack
+
+from app.negotiation import decode_msgpack_body, wants_msgpack
+
+
+def test_wants_msgpack_only_when_preferred():
+    assert wants_msgpack("application/msgpack")
+    assert wants_msgpack("application/x-msgpack, application/json;q=0.5")
+    assert not wants_msgpack(None)
+    assert not wants_msgpack("*/*")
+    assert not wants_msgpack("application/json, application/msgpack;q=0.5")
+    assert not wants_msgpack("application/msgpack;q=0")
+
+
+def test_decode_msgpack_body_reads_integer_money_as_minor_units():
+    body = msgpack.packb({"from_account_number": 1, "to_account_number": 2, "amount": 1005})
+    assert decode_msgpack_body(body)["amount"] == "10.05"
+    assert decode_msgpack_body(msgpack.packb({"amount": "10.05"}))["amount"] == "10.05"
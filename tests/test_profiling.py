@@ -0,0 +1,89 @@
+import cProfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.authentication.token import create_access_token
+from app.config import USERNAME
+from app.profiling import PROFILE_ID_HEADER, build_report, frame_name, profiler
+from app.services import accounts as accounts_service
+
+
+def auth_headers(subject: str = USERNAME, **extra) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': subject})}", **extra}
+
+
+@pytest.fixture
+def account_number(client: TestClient) -> int:
+    payload = {"name": "Ann", "email": "ann@example.com", "initial_deposit": "10.00"}
+    return client.post("/accounts/", json=payload, headers=auth_headers()).json()["account_number"]
+
+
+def test_frame_names():
+    code = accounts_service.read_account.__code__
+    assert frame_name((code.co_filename, code.co_firstlineno, code.co_name)) == "app.services.accounts.read_account"
+    assert frame_name(("~", 0, "<built-in method time.sleep>")) == "<built-in method time.sleep>"
+    assert frame_name(("/usr/lib/python3/json/decoder.py", 332, "decode")) == "decoder.py:332(decode)"
+
+
+def test_build_report_has_service_frames_and_call_tree(db_session):
+    def endpoint():
+        try:
+            accounts_service.get_account_by_number(db_session, 1)
+        except Exception:
+            pass
+
+    profile = cProfile.Profile()
+    profile.runcall(endpoint)
+    report = build_report(profile, endpoint.__code__)
+
+    assert report["top_frames"][0]["function"] == "app.services.accounts.get_account_by_number"
+    assert all(frame["function"].startswith("app.services.") for frame in report["top_frames"])
+    tree = report["call_tree"]
+    assert tree["function"].endswith("endpoint")
+    assert tree["children"][0]["function"] == "app.services.accounts.get_account_by_number"
+    assert build_report(profile, accounts_service.create_customer.__code__)["call_tree"] is None
+
+
+def test_admin_can_profile_a_request(client: TestClient, account_number: int):
+    response = client.get(f"/accounts/{account_number}/balance", headers=auth_headers(**{"X-Profile": "1"}))
+
+    assert response.status_code == 200
+    profile_id = response.headers[PROFILE_ID_HEADER]
+    report = client.get(f"/internal/profiles/{profile_id}", headers=auth_headers()).json()
+    assert report["mode"] == "requested"
+    assert report["path"] == f"/accounts/{account_number}/balance"
+    assert report["status_code"] == 200
+    assert report["wall_ms"] >= report["endpoint_wall_ms"] > 0
+    assert report["cpu_ms"] > 0
+    assert "app.services.accounts.read_account" in [frame["function"] for frame in report["top_frames"]]
+    assert report["call_tree"]["function"] == "app.routers.accounts.get_balance"
+
+    listing = client.get("/internal/profiles", headers=auth_headers()).json()
+    assert listing["profiler"]["requested"] == 1
+    assert listing["reports"][0]["id"] == profile_id
+    assert "call_tree" not in listing["reports"][0]
+
+
+def test_profile_flag_is_ignored_for_other_users(client: TestClient, account_number: int):
+    response = client.get(
+        f"/accounts/{account_number}/balance", params={"profile": "1"}, headers=auth_headers("testuser")
+    )
+
+    assert response.status_code == 200
+    assert PROFILE_ID_HEADER not in response.headers
+    assert profiler.summaries() == []
+
+
+def test_sampled_requests_are_kept_in_a_ring_buffer(client: TestClient, account_number: int, monkeypatch):
+    monkeypatch.setattr(profiler, "sample_every", 2)
+    monkeypatch.setattr(profiler, "_reports", type(profiler._reports)(maxlen=2))
+
+    for _ in range(6):
+        response = client.get(f"/accounts/{account_number}/balance", headers=auth_headers())
+        assert PROFILE_ID_HEADER not in response.headers
+
+    stats = profiler.stats()
+    assert (stats["sampled"], stats["kept"], stats["capacity"]) == (3, 2, 2)
+    assert all(report["mode"] == "sampled" for report in profiler.summaries())
+    assert client.get("/internal/profiles/unknown", headers=auth_headers()).status_code == 404
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+
+from app.pubsub import BalanceBroker, PostgresNotifyBackend, SubscriberLimitError
+
+
+class BrokenBackend:
+    def start(self, deliver):
+        pass
+
+    def publish(self, message):
+        raise ConnectionError("backend down")
+
+    def stop(self):
+        pass
+
+
+def test_publish_reaches_only_matching_subscribers():
+    async def scenario():
+        broker = BalanceBroker()
+        mine = broker.subscribe(1)
+        other = broker.subscribe(2)
+
+        broker.publish(1, "10.00", 2)
+        message = await asyncio.wait_for(mine.queue.get(), timeout=1)
+
+        assert message == {"account_number": 1, "balance": "10.00", "version": 2}
+        assert other.queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_keeps_latest_balance_only():
+    async def scenario():
+        broker = BalanceBroker()
+        sub = broker.subscribe(1)
+
+        for version, balance in enumerate(("1.00", "2.00", "3.00"), start=2):
+            broker.publish(1, balance, version)
+        await asyncio.sleep(0)
+
+        assert sub.queue.qsize() == 1
+        assert (await sub.queue.get())["balance"] == "3.00"
+
+    asyncio.run(scenario())
+
+
+def test_subscriber_cap_and_unsubscribe():
+    async def scenario():
+        broker = BalanceBroker(max_subscribers=1)
+        sub = broker.subscribe(1)
+        with pytest.raises(SubscriberLimitError):
+            broker.subscribe(2)
+
+        broker.unsubscribe(sub)
+        broker.subscribe(2)
+        assert broker.stats()["subscribers"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_backend_failure_is_counted_not_raised():
+    broker = BalanceBroker(backend=BrokenBackend())
+    broker.publish(1, "1.00", 2)
+    assert broker.stats()["publish_failures"] == 1
+
+
+def test_subscriber_drops_balances_older_than_the_last_one_taken():
+    async def scenario():
+        broker = BalanceBroker()
+        sub = broker.subscribe(1)
+
+        # Two commits published in the reverse of their commit order.
+        broker.publish(1, "3.00", 3)
+        broker.publish(1, "2.00", 2)
+        await asyncio.sleep(0)
+        assert (await sub.queue.get())["balance"] == "3.00"
+
+        broker.publish(1, "2.00", 2)
+        await asyncio.sleep(0)
+        assert sub.queue.empty()
+
+        # A balance read directly at version 4 supersedes anything up to it.
+        broker.publish(1, "4.00", 4)
+        await asyncio.sleep(0)
+        sub.advance(4)
+        assert sub.queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_listener_closes_its_connection_when_listening_fails():
+    class FailingConnection:
+        autocommit = False
+        closed = 0
+
+        def cursor(self):
+            raise ConnectionError("server closed the connection")
+
+        def close(self):
+            self.closed += 1
+
+    class DetachedRaw:
+        def __init__(self):
+            self.dbapi_connection = FailingConnection()
+            connections.append(self.dbapi_connection)
+
+        def detach(self):
+            pass
+
+    class Engine:
+        def raw_connection(self):
+            if len(connections) == 1:
+                backend.stop()
+            return DetachedRaw()
+
+    connections = []
+    backend = PostgresNotifyBackend(Engine(), poll_seconds=0)
+    backend._listen(lambda message: None)
+
+    assert len(connections) == 2
+    assert all(conn.closed == 1 for conn in connections)
@@ -0,0 +1,162 @@
+"""
+Query plan regression tests: the hot service queries must keep using their indexes.
+
+Each operation runs against a seeded database; every statement it sends is
+EXPLAINed and must search the large tables through the expected indexes,
+never scan them in full, and (on PostgreSQL) expect a bounded number of rows.
+The tests run on SQLite; set QUERY_PLAN_DATABASE_URL to a scratch PostgreSQL
+database to check its plans too.
+"""
+import os
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models.accounts import Account, Customer, CustomerInput
+from app.models.transfers import Transfer
+from app.query_plans import (SCAN, SEARCH, captured_statements, explain, parse_postgres_plan, plan_diff,
+                             plan_problems)
+from app.services import accounts as accounts_service
+from app.services import transfers as transfers_service
+
+ACCOUNTS = 5_000
+TRANSFERS = 50_000
+# Largest row estimate of any step; an account has about 20 transfers per side.
+MAX_ROWS = 1_000
+
+ACCOUNTS_PK = ("accounts_pkey", "ix_accounts_account_number")
+FROM_INDEX = ("ix_transfers_from_account_number_id",)
+TO_INDEX = ("ix_transfers_to_account_number_id",)
+
+URLS = ["sqlite://"] + ([os.environ["QUERY_PLAN_DATABASE_URL"]] if os.environ.get("QUERY_PLAN_DATABASE_URL") else [])
+
+
+@pytest.fixture(scope="module", params=URLS, ids=lambda url: url.split(":")[0])
+def plan_engine(request):
+    engine = create_engine(request.param)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Customer),
+            [{"customer_id": n, "name": f"Customer {n}", "email": f"customer{n}@example.com"} for n in range(1, ACCOUNTS + 1)],
+        )
+        conn.execute(
+            insert(Account),
+            [
+                {"account_number": n, "customer_id": n, "balance": 100_000, "initial_deposit": 100_000, "version": 1}
+                for n in range(1, ACCOUNTS + 1)
+            ],
+        )
+        conn.execute(
+            insert(Transfer),
+            [
+                {
+                    "from_account_number": i % ACCOUNTS + 1,
+                    "to_account_number": (i + 1 + i // ACCOUNTS) % ACCOUNTS + 1,
+                    "amount": 100,
+                    "timestamp": datetime(2024, 1, 1),
+                }
+                for i in range(TRANSFERS)
+            ],
+        )
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+HOT_QUERIES = {
+    "balance": (lambda db: accounts_service.read_account(db, 42), [("accounts", ACCOUNTS_PK)]),
+    "balances": (lambda db: accounts_service.get_balances(db, [1, 42, 4_999]), [("accounts", ACCOUNTS_PK)]),
+    "account_validation": (lambda db: accounts_service.get_account_by_number(db, 42), [("accounts", ACCOUNTS_PK)]),
+    "account_version": (lambda db: accounts_service.get_account_version(db, 42), [("accounts", ACCOUNTS_PK)]),
+    "customer_by_email": (
+        lambda db: accounts_service.create_customer(
+            db, CustomerInput(name="Customer 42", email="customer42@example.com", initial_deposit=Decimal("1"))
+        ),
+        [("customers", ("ix_customers_email",))],
+    ),
+    "history_first_page": (
+        lambda db: transfers_service.get_statement(db, 42, None, 20),
+        [("transfers", FROM_INDEX), ("transfers", TO_INDEX), ("accounts", ACCOUNTS_PK)],
+    ),
+    "history_deeper_page": (
+        lambda db: transfers_service.get_statement(db, 42, TRANSFERS // 2, 20),
+        [("transfers", FROM_INDEX), ("transfers", TO_INDEX), ("accounts", ACCOUNTS_PK)],
+    ),
+    "history_export": (
+        lambda db: transfers_service.get_transfer_history_for_account(db, 42),
+        [("transfers", FROM_INDEX), ("transfers", TO_INDEX)],
+    ),
+}
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_its_indexes(plan_engine, name):
+    operation, uses = HOT_QUERIES[name]
+    with Session(plan_engine) as db, captured_statements(plan_engine) as statements:
+        operation(db)
+        db.rollback()
+
+    assert statements
+    with plan_engine.connect() as conn:
+        plans = [explain(conn, statement, parameters) for statement, parameters in statements]
+    # Each expected index may be used by any of the operation's statements.
+    for table, names in uses:
+        if not any(not plan_problems(plan, [(table, names)], frozenset()) for plan in plans):
+            pytest.fail(f"{name}: no search of {table} using {' or '.join(names)}\n\n"
+                        + "\n\n".join(plan_diff(plan, uses) for plan in plans))
+    for plan in plans:
+        problems = plan_problems(plan, [], max_rows=MAX_ROWS)
+        assert not problems, f"{name}: " + "; ".join(problems) + "\n\n" + plan_diff(plan, uses)
+
+
+def test_full_scan_is_reported_with_a_plan_diff(plan_engine):
+    with plan_engine.connect() as conn:
+        plan = explain(conn, "SELECT * FROM transfers WHERE amount = 100")
+
+    problems = plan_problems(plan, [("transfers", FROM_INDEX)])
+    diff = plan_diff(plan, [("transfers", FROM_INDEX)])
+
+    assert problems[0].startswith("full scan:")
+    assert problems[1] == "no search of transfers using ix_transfers_from_account_number_id"
+    assert "-SEARCH transfers USING ix_transfers_from_account_number_id" in diff
+    assert "+SCAN transfers" in diff
+
+
+def test_postgres_plan_is_parsed_into_steps():
+    document = [{"Plan": {
+        "Node Type": "Limit", "Plan Rows": 20, "Plans": [
+            {"Node Type": "Bitmap Heap Scan", "Relation Name": "transfers", "Plan Rows": 40,
+             "Recheck Cond": "((from_account_number = 42) OR (to_account_number = 42))", "Plans": [
+                {"Node Type": "BitmapOr", "Plan Rows": 40, "Plans": [
+                    {"Node Type": "Bitmap Index Scan", "Index Name": "ix_transfers_from_account_number_id",
+                     "Plan Rows": 20, "Index Cond": "(from_account_number = 42)"},
+                    {"Node Type": "Bitmap Index Scan", "Index Name": "ix_transfers_to_account_number_id",
+                     "Plan Rows": 20, "Index Cond": "(to_account_number = 42)"},
+                ]},
+            ]},
+            {"Node Type": "Index Scan", "Relation Name": "accounts", "Index Name": "accounts_pkey", "Plan Rows": 5000},
+            {"Node Type": "Seq Scan", "Relation Name": "customers", "Plan Rows": 5000},
+        ],
+    }}]
+
+    plan = parse_postgres_plan("SELECT ...", document)
+
+    assert [(s.operation, s.table, s.index, s.estimated_rows) for s in plan.steps] == [
+        (SEARCH, "transfers", None, 40),
+        (SEARCH, "transfers", "ix_transfers_from_account_number_id", 20),
+        (SEARCH, "transfers", "ix_transfers_to_account_number_id", 20),
+        (SCAN, "accounts", "accounts_pkey", 5000),
+        (SCAN, "customers", None, 5000),
+    ]
+    assert plan_problems(plan, [("transfers", FROM_INDEX), ("transfers", TO_INDEX)], max_rows=MAX_ROWS) == [
+        f"full scan: {plan.steps[3].detail}",
+        f"full scan: {plan.steps[4].detail}",
+        "estimated 5000 rows, expected at most 1000",
+    ]
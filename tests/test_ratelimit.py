@@ -0,0 +1,129 @@
+import asyncio
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.authentication.oauth import get_current_user
+from app.authentication.token import create_access_token
+from app.ratelimit import (AdmissionRejected, ConcurrencyLimiter, RateLimiter, admission,
+                           endpoint_class, request_subject)
+from app.readiness import readiness
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, burst=2, clock=clock)
+
+    assert limiter.check("alice") == 0
+    assert limiter.check("alice") == 0
+    assert limiter.check("alice") == pytest.approx(0.5)
+    # another subject has its own bucket
+    assert limiter.check("bob") == 0
+
+    clock.now = 0.5
+    assert limiter.check("alice") == 0
+
+
+def test_rate_limiter_bounds_tracked_subjects():
+    limiter = RateLimiter(rate=1, burst=1, max_subjects=2, clock=FakeClock())
+    for subject in ("a", "b", "c"):
+        limiter.check(subject)
+    assert limiter.subjects() == 2
+
+
+def test_endpoint_classes():
+    assert endpoint_class("POST", "/login/") == "login"
+    assert endpoint_class("GET", "/accounts/1/balance") == "reads"
+    assert endpoint_class("POST", "/accounts/balances") == "reads"
+    assert endpoint_class("POST", "/transfers/") == "writes"
+    assert endpoint_class("GET", "/accounts/1/balance/stream") is None
+    assert endpoint_class("GET", "/internal/limits") is None
+    assert endpoint_class("GET", "/ready") is None
+    assert endpoint_class("GET", "/") is None
+
+
+def test_request_subject_uses_token_subject_or_client():
+    token = create_access_token({"sub": "carol"})
+    scope = {"headers": [(b"authorization", f"Bearer {token}".encode())], "client": ("10.0.0.1", 1)}
+    assert request_subject(scope) == "carol"
+
+    scope = {"headers": [(b"authorization", b"Bearer junk")], "client": ("10.0.0.1", 1)}
+    assert request_subject(scope) == "ip:10.0.0.1"
+
+
+def test_concurrency_limiter_queues_then_sheds():
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, max_queue=1, queue_timeout=0.05)
+        await limiter.acquire()
+
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+
+        with pytest.raises(AdmissionRejected) as full:
+            await limiter.acquire()
+        assert full.value.reason == "queue full"
+
+        with pytest.raises(AdmissionRejected) as timeout:
+            await waiter
+        assert timeout.value.reason == "queue timeout"
+
+        limiter.release()
+        await limiter.acquire()
+        assert limiter.active == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def authed(client: TestClient):
+    client.app.dependency_overrides[get_current_user] = lambda: "testuser"
+    yield client
+    client.app.dependency_overrides.pop(get_current_user, None)
+
+
+def test_middleware_rate_limits_with_retry_after(authed: TestClient, monkeypatch):
+    monkeypatch.setattr(admission, "rate_limiter", RateLimiter(rate=0.1, burst=1))
+
+    assert authed.get("/accounts/9999/balance").status_code == status.HTTP_404_NOT_FOUND
+    resp = authed.get("/accounts/9999/balance")
+
+    assert resp.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert resp.headers["retry-after"] == "10"
+    assert authed.get("/internal/limits").json()["rejections"]["rate_limited"] == 1
+
+
+def test_middleware_sheds_load_when_class_is_saturated(authed: TestClient, monkeypatch):
+    monkeypatch.setitem(admission.limiters, "writes", ConcurrencyLimiter(limit=0, max_queue=0))
+
+    resp = authed.post("/transfers/", json={"from_account_number": 1, "to_account_number": 2, "amount": "1"})
+
+    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert resp.headers["retry-after"] == "1"
+    # reads are limited separately
+    assert authed.get("/accounts/9999/balance").status_code == status.HTTP_404_NOT_FOUND
+    stats = authed.get("/internal/limits").json()
+    assert stats["rejections"]["queue_full"] == 1
+    assert stats["endpoint_classes"]["reads"]["active"] == 0
+
+
+def test_readiness_probe_is_never_rejected(authed: TestClient, monkeypatch):
+    monkeypatch.setattr(admission, "rate_limiter", RateLimiter(rate=0.1, burst=1))
+    for name in admission.limiters:
+        monkeypatch.setitem(admission.limiters, name, ConcurrencyLimiter(limit=0, max_queue=0))
+    readiness.register({"noop": lambda: None})
+    readiness.warm_up()
+
+    for _ in range(3):
+        assert authed.get("/ready").status_code == status.HTTP_200_OK
+    assert authed.get("/internal/limits").json()["rejections"] == {
+        "rate_limited": 0, "queue_full": 0, "queue_timeout": 0
+    }
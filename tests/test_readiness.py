@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+
+from app.readiness import OK, PENDING, Readiness, readiness, warm_pool
+
+
+def test_failed_steps_are_retried_until_ready(db_session):
+    engine = db_session.get_bind()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise ConnectionError("refused")
+
+    ready = Readiness(retry_seconds=0.01)
+    ready.register({"pool": lambda: warm_pool([engine]), "cache": flaky})
+    assert ready.stats()["checks"] == {"pool": PENDING, "cache": PENDING}
+
+    assert not ready.warm_up()
+    assert ready.stats()["checks"] == {"pool": OK, "cache": "ConnectionError: refused"}
+    assert ready.warm_up()
+    assert ready.warm_up()
+    assert len(attempts) == 2
+    assert ready.stats()["ready_after_seconds"] >= 0
+
+
+def test_ready_endpoint_reports_warm_up(client: TestClient, db_session):
+    engine = db_session.get_bind()
+    assert client.get("/ready").status_code == 503
+
+    readiness.start({"pool": lambda: warm_pool([engine])})
+    readiness._thread.join(1)
+    response = client.get("/ready")
+
+    assert response.status_code == 200
+    assert response.json()["checks"] == {"pool": OK}
@@ -0,0 +1,88 @@
+import json
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.services.accounts as account_service
+from app.database import Base
+from app.models.accounts import CustomerInput
+from app.tools import replay
+
+
+def test_to_cents_rejects_like_transfer_input():
+    assert replay.to_cents("12.34") == 1234
+    assert replay.to_cents(Decimal("5")) == 500
+    assert replay.to_cents("0") is None
+    assert replay.to_cents("-1") is None
+    assert replay.to_cents("0.001") is None
+    assert replay.to_cents("abc") is None
+
+
+def test_replay_applies_in_order_with_service_rules():
+    ledger = replay.Ledger([(1, 1000), (2, 0)])
+    rejected = []
+
+    outcome = ledger.replay(
+        [
+            (1, 2, 1, 1),      # insufficient: account 2 is empty
+            (2, 1, 2, 600),
+            (3, 2, 1, 100),    # now funded by line 2
+            (4, 1, 1, 1),
+            (5, 1, 9, 1),
+            (6, 1, 2, None),
+        ],
+        lambda line, *rest: rejected.append((line, rest[-1])),
+    )
+
+    assert outcome == {
+        "applied": 2,
+        replay.INSUFFICIENT_FUNDS: 1,
+        replay.SAME_ACCOUNT: 1,
+        replay.ACCOUNT_NOT_FOUND: 1,
+        replay.INVALID_AMOUNT: 1,
+    }
+    assert [line for line, _ in rejected] == [1, 4, 5, 6]
+    assert ledger.balance(1) == Decimal("5.00")
+    assert ledger.balance(2) == Decimal("5.00")
+
+
+def test_cli_reads_database_snapshot_and_jsonl(tmp_path, capsys):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bank.db'}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    cust = account_service.create_customer(
+        db, CustomerInput(name="Ann", email="ann@example.com", initial_deposit=Decimal("1"))
+    )
+    a = account_service.create_account_for_customer(db, cust, 1000).account_number
+    b = account_service.create_account_for_customer(db, cust, 100).account_number
+    db.close()
+
+    log = tmp_path / "transfers.jsonl"
+    log.write_text(
+        "\n".join(
+            json.dumps({"from_account_number": f, "to_account_number": t, "amount": amt})
+            for f, t, amt in [(a, b, "2.50"), (b, a, "9.00")]
+        )
+    )
+    snapshot = replay.Ledger.from_engines([engine])
+    assert snapshot.balance(a) == Decimal("10.00")
+
+    balances = tmp_path / "balances.csv"
+    balances.write_text(f"account_number,balance\n{a},10.00\n{b},1.00\n")
+    output = tmp_path / "final.csv"
+    rejections = tmp_path / "rejected.jsonl"
+    replay.main([str(log), "--balances", str(balances), "--output", str(output), "--rejections", str(rejections)])
+
+    assert json.loads(capsys.readouterr().out) == {"accounts": 2, "applied": 1, "insufficient_funds": 1}
+    assert output.read_text().splitlines()[1:] == [f"{a},7.50", f"{b},3.50"]
+    assert json.loads(rejections.read_text())["line"] == 2
+
+
+def test_snapshot_with_sub_cent_balance_is_rejected(tmp_path):
+    balances = tmp_path / "balances.csv"
+    balances.write_text("account_number,balance\n1,10.00\n2,0.005\n")
+
+    with pytest.raises(ValueError, match=":3: invalid balance"):
+        replay.Ledger.from_csv(str(balances))
@@ -0,0 +1,54 @@
+import threading
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight("test-shared")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ("balance", 100)
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do(1, slow)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do(1, slow))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    while flight.stats()["hits"] < 3:
+        pass
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert calls == [1]
+    assert results == [("balance", 100)] * 4
+    assert flight.stats() == {"hits": 3, "executions": 1, "in_flight": 0}
+
+
+def test_sequential_calls_are_not_cached():
+    flight = SingleFlight("test-sequential")
+    counter = iter(range(10))
+
+    assert flight.do("k", lambda: next(counter)) == 0
+    assert flight.do("k", lambda: next(counter)) == 1
+    assert flight.stats()["hits"] == 0
+
+
+def test_error_is_raised_and_key_released():
+    flight = SingleFlight("test-error")
+
+    def boom():
+        raise ValueError("db down")
+
+    with pytest.raises(ValueError):
+        flight.do("k", boom)
+    assert flight.do("k", lambda: "ok") == "ok"
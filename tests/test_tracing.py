@@ -0,0 +1,121 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.authentication.token import create_access_token
+from app.tracing import FileExporter, InMemoryExporter, Tracer, parse_traceparent, tracer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+@pytest.fixture
+def exporter():
+    previous = (tracer.exporter, tracer.sample_rate)
+    exporter = InMemoryExporter()
+    tracer.configure(exporter, sample_rate=1.0)
+    yield exporter
+    tracer.configure(*previous)
+
+
+def auth_headers(**extra) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}", **extra}
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-00f067aa0ba902b7-01") == (TRACE_ID, "00f067aa0ba902b7", True)
+    assert parse_traceparent(f"00-{TRACE_ID}-00f067aa0ba902b7-00")[2] is False
+    assert parse_traceparent("00-xyz-00f067aa0ba902b7-01") is None
+    assert parse_traceparent(f"00-{'0' * 32}-00f067aa0ba902b7-01") is None
+    assert parse_traceparent(None) is None
+
+
+def test_request_is_traced_with_child_spans(client: TestClient, exporter: InMemoryExporter):
+    create = client.post(
+        "/accounts/", json={"name": "Ann", "email": "ann@example.com", "initial_deposit": 10}, headers=auth_headers()
+    )
+    account_number = create.json()["account_number"]
+    tracer.flush()
+    exporter.clear()
+
+    resp = client.get(f"/accounts/{account_number}/balance", headers=auth_headers())
+    tracer.flush()
+
+    assert resp.status_code == 200
+    spans = list(exporter.spans)
+    root = next(s for s in spans if s.parent_id is None)
+    assert root.name == f"GET /accounts/{account_number}/balance"
+    assert root.attributes["status_code"] == 200
+    assert resp.headers["X-Trace-Id"] == root.trace_id
+
+    children = [s for s in spans if s is not root]
+    assert {s.trace_id for s in children} == {root.trace_id}
+    names = [s.name for s in children]
+    assert {"auth", "endpoint", "sql", "serialize"} <= set(names)
+    endpoint = next(s for s in children if s.name == "endpoint")
+    assert endpoint.parent_id == root.span_id
+    assert any(s.parent_id == endpoint.span_id and "accounts" in s.attributes["statement"] for s in children if s.name == "sql")
+    for span in spans:
+        assert root.start <= span.start <= span.end <= root.end
+
+
+def test_incoming_traceparent_is_continued(client: TestClient, exporter: InMemoryExporter):
+    headers = auth_headers(traceparent=f"00-{TRACE_ID}-00f067aa0ba902b7-01")
+    resp = client.get("/accounts/424242/balance", headers=headers)
+    tracer.flush()
+
+    assert resp.status_code == 404
+    root = next(s for s in exporter.spans if s.trace_id == TRACE_ID and s.parent_id == "00f067aa0ba902b7")
+    assert root.attributes["status_code"] == 404
+    assert root.attributes["error"] == "HTTPException"
+
+
+def test_unsampled_requests_record_nothing(client: TestClient, exporter: InMemoryExporter):
+    tracer.configure(sample_rate=0.0)
+    resp = client.get("/accounts/424242/balance", headers=auth_headers())
+    client.get("/accounts/424242/balance", headers=auth_headers(traceparent=f"00-{TRACE_ID}-00f067aa0ba902b7-00"))
+    tracer.flush()
+
+    assert "X-Trace-Id" not in resp.headers
+    assert not exporter.spans
+
+
+def test_spans_are_exported_in_batches_by_the_exporter_thread(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    batch_tracer = Tracer(FileExporter(str(path)), sample_rate=1.0, batch_size=3)
+    batch_tracer.start()
+
+    with batch_tracer.start_trace("job"):
+        with batch_tracer.span("step"):
+            pass
+    assert not path.exists()
+
+    with batch_tracer.start_trace("job"):
+        pass
+    deadline = time.monotonic() + 5
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(path.read_text().splitlines()) == 3
+
+    with batch_tracer.start_trace("job"):
+        pass
+    batch_tracer.stop()
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [s["name"] for s in spans] == ["step", "job", "job", "job"]
+    assert spans[0]["parent_id"] == spans[1]["span_id"]
+
+
+def test_ending_a_span_never_exports_and_a_backlog_drops_the_oldest_batch():
+    class FailingExporter:
+        def export(self, spans):
+            raise OSError("disk full")
+
+    batch_tracer = Tracer(FailingExporter(), sample_rate=1.0, batch_size=1, max_batches=2)
+    for _ in range(3):
+        with batch_tracer.start_trace("job"):
+            pass
+
+    assert batch_tracer.dropped == 1
+    batch_tracer.flush()
+    assert batch_tracer.export_errors == 2
@@ -0,0 +1,127 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from app.config import TIMEZONE
+from app.exceptions import VelocityLimitExceededError
+from app.models.transfers import Transfer
+from app.tools import velocity_bench
+from app.velocity import SlidingWindow, VelocityEngine
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_sliding_window_expires_old_buckets():
+    window = SlidingWindow(60, 12)
+    window.add(1000, 5)
+    window.add(1030, 7)
+
+    assert window.totals(1030) == (2, 12)
+    assert window.totals(1062) == (1, 7)
+    assert window.totals(2000) == (0, 0)
+
+
+def test_check_enforces_count_and_amount_per_window():
+    clock = FakeClock()
+    engine = VelocityEngine({60: (2, 1000), 3600: (3, 10_000)}, buckets=12, clock=clock)
+    engine.record(1, 400)
+    engine.record(1, 400)
+
+    with pytest.raises(VelocityLimitExceededError) as exc:
+        engine.check(1, 100)
+    assert (exc.value.window_seconds, exc.value.limit) == (60, "count")
+
+    clock.now += 120
+    engine.check(1, 100)
+    engine.record(1, 100)
+    with pytest.raises(VelocityLimitExceededError) as exc:
+        engine.check(1, 100)
+    assert (exc.value.window_seconds, exc.value.limit) == (3600, "count")
+
+    # Other accounts are unaffected; pending batch items count too.
+    engine.check(2, 900)
+    with pytest.raises(VelocityLimitExceededError) as exc:
+        engine.check(2, 900, pending=(1, 200))
+    assert exc.value.limit == "amount"
+    assert engine.stats()["rejections"] == 3
+
+
+def test_check_and_record_admits_concurrent_transfers_up_to_the_limit():
+    engine = VelocityEngine({60: (5, 1_000_000)}, buckets=12, clock=FakeClock())
+    accepted = []
+    start = threading.Barrier(20)
+
+    def transfer():
+        start.wait()
+        try:
+            engine.check_and_record(1, 100)
+        except VelocityLimitExceededError:
+            return
+        accepted.append(1)
+
+    threads = [threading.Thread(target=transfer) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(accepted) == 5
+    assert engine.stats()["rejections"] == 15
+
+
+def test_release_gives_back_a_failed_transfer():
+    clock = FakeClock()
+    engine = VelocityEngine({60: (1, 1000)}, buckets=12, clock=clock)
+    at = engine.check_and_record(1, 400)
+    with pytest.raises(VelocityLimitExceededError):
+        engine.check_and_record(1, 400)
+
+    engine.release(1, 400, at)
+    engine.check_and_record(1, 400)
+
+
+def test_rebuild_counts_recent_transfers(db_session):
+    engine = VelocityEngine({60: (1, 10_000)}, buckets=12)
+    db_session.add(
+        Transfer(from_account_number=7, to_account_number=8, amount=500, timestamp=datetime.now(TIMEZONE))
+    )
+    db_session.commit()
+
+    assert engine.rebuild([db_session.get_bind()]) == 1
+    with pytest.raises(VelocityLimitExceededError):
+        engine.check(7, 1)
+    engine.check(8, 1)
+
+
+def test_rebuild_keeps_transfers_recorded_while_it_runs(db_session):
+    engine = VelocityEngine({60: (2, 10_000)}, buckets=12)
+    db_session.add(
+        Transfer(from_account_number=7, to_account_number=8, amount=500, timestamp=datetime.now(TIMEZONE))
+    )
+    db_session.commit()
+    engine.record(7, 500)
+
+    class ServingMeanwhile:
+        # The worker keeps enforcing its counters and commits another transfer
+        # while the rebuild streams the shard.
+        def connect(self):
+            with pytest.raises(VelocityLimitExceededError):
+                engine.check(7, 1, pending=(1, 0))
+            engine.record(7, 500)
+            return db_session.get_bind().connect()
+
+    assert engine.rebuild([ServingMeanwhile()]) == 1
+    with pytest.raises(VelocityLimitExceededError):
+        engine.check(7, 1)
+
+
+def test_velocity_bench_reports_throughput(capsys):
+    velocity_bench.main(["--accounts", "10", "--history", "10", "--checks", "100"])
+    assert '"checks_per_second"' in capsys.readouterr().out